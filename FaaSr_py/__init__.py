@@ -1,15 +1,36 @@
+import importlib
 import logging
 import sys
 
 from .config.debug_config import global_config
 from .config.logger_classes import FaaSrFilter, JsonFormatter
 from .config.s3_log_sender import S3LogSender
-from .engine.executor import Executor
-from .engine.faasr_payload import FaaSrPayload
-from .engine.scheduler import Scheduler
-from .helpers.faasr_start_invoke_helper import (faasr_func_dependancy_install,
-                                                faasr_get_github_raw)
-from .s3_api import faasr_log
+
+# loaded on first access (PEP 562), so that processes which never use them
+# (user function processes, the RPC server) don't import boto3, requests,
+# jsonschema, etc. -- name: module it is defined in
+_LAZY_ATTRS = {
+    "Executor": ".engine.executor",
+    "FaaSrPayload": ".engine.faasr_payload",
+    "Scheduler": ".engine.scheduler",
+    "faasr_func_dependancy_install": ".helpers.faasr_start_invoke_helper",
+    "faasr_get_github_raw": ".helpers.faasr_start_invoke_helper",
+    "faasr_log": ".s3_api",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
 
 logger = logging.getLogger()
 logger.setLevel(logging.NOTSET)
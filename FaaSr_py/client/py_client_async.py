@@ -0,0 +1,281 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from FaaSr_py.client.py_client_stubs import _rpc
+from FaaSr_py.helpers.exceptions import FaaSrRequestError, FaaSrRPCError
+from FaaSr_py.helpers.shared_memory import (attach_shared_buffer,
+                                            create_shared_buffer)
+
+# number of FaaSr calls a user function can have in flight at once
+# (matches the default concurrency of the RPC server)
+MAX_PENDING_CALLS = 32
+
+__all__ = [
+    "faasr_put_file_future",
+    "faasr_get_file_future",
+    "faasr_delete_file_future",
+    "faasr_get_folder_list_future",
+    "faasr_log_future",
+    "faasr_rank_future",
+    "faasr_get_s3_creds_future",
+    "faasr_put_bytes_future",
+    "faasr_get_bytes_future",
+    "faasr_put_file_async",
+    "faasr_get_file_async",
+    "faasr_delete_file_async",
+    "faasr_get_folder_list_async",
+    "faasr_log_async",
+    "faasr_rank_async",
+    "faasr_get_s3_creds_async",
+    "faasr_put_bytes_async",
+    "faasr_get_bytes_async",
+]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns the thread pool running background FaaSr calls (created on first use)
+
+    Every pool thread keeps its own keep-alive connection to the RPC server
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_PENDING_CALLS, thread_name_prefix="faasr-client"
+            )
+    return _executor
+
+
+def _call(procedure_id, arguments):
+    """
+    Sends a FaaSr call to the RPC server
+
+    Arguments:
+        procedure_id: str -- name of the FaaSr function
+        arguments: dict -- arguments of the FaaSr function
+    Returns:
+        dict -- data returned by the call
+    Raises:
+        FaaSrRPCError -- the server could not be reached
+        FaaSrRequestError -- the call failed
+    """
+    request_json = {"ProcedureID": procedure_id, "Arguments": arguments}
+    try:
+        response = _rpc().post("/faasr-action", request_json)
+    except Exception as e:
+        raise FaaSrRPCError(f"{procedure_id}: request to FaaSr RPC failed -- {e}")
+    if not isinstance(response, dict):
+        raise FaaSrRPCError(f"{procedure_id}: invalid response from FaaSr RPC")
+    if not response.get("Success", False):
+        raise FaaSrRequestError(procedure_id, response.get("Message"))
+    return response.get("Data") or {}
+
+
+def _put_bytes(data, remote_file, server_name, remote_folder):
+    view = memoryview(data).cast("B")
+    shm = create_shared_buffer(view.nbytes)
+    try:
+        shm.buf[: view.nbytes] = view
+        _call(
+            "faasr_put_shared",
+            {
+                "shm_name": shm.name,
+                "size": view.nbytes,
+                "remote_file": str(remote_file),
+                "server_name": server_name,
+                "remote_folder": str(remote_folder),
+            },
+        )
+    finally:
+        view.release()
+        shm.close()
+        shm.unlink()
+    return True
+
+
+def _get_bytes(remote_file, server_name, remote_folder):
+    data = _call(
+        "faasr_get_shared",
+        {
+            "remote_file": str(remote_file),
+            "server_name": server_name,
+            "remote_folder": str(remote_folder),
+        },
+    )
+    try:
+        shm = attach_shared_buffer(data["shm_name"])
+    except (KeyError, OSError) as e:
+        raise FaaSrRPCError(f"faasr_get_shared: cannot read shared memory -- {e}")
+    # the client owns the block once the server has filled it
+    try:
+        return bytes(shm.buf[: data["size"]])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _submit(func, *args):
+    return _get_executor().submit(func, *args)
+
+
+def _submit_call(procedure_id, arguments, result):
+    return _submit(lambda: result(_call(procedure_id, arguments)))
+
+
+def faasr_put_file_future(
+    local_file, remote_file, server_name="", local_folder=".", remote_folder="."
+):
+    """
+    Uploads a file to the FaaSr server in the background
+
+    Returns:
+        Future -- resolves to True
+    """
+    arguments = {
+        "local_file": str(local_file),
+        "remote_file": str(remote_file),
+        "server_name": server_name,
+        "local_folder": str(local_folder),
+        "remote_folder": str(remote_folder),
+    }
+    return _submit_call("faasr_put_file", arguments, lambda data: True)
+
+
+def faasr_get_file_future(
+    local_file, remote_file, server_name="", local_folder=".", remote_folder="."
+):
+    """
+    Downloads a file from the FaaSr server in the background
+
+    Returns:
+        Future -- resolves to True
+    """
+    arguments = {
+        "local_file": str(local_file),
+        "remote_file": str(remote_file),
+        "server_name": server_name,
+        "local_folder": str(local_folder),
+        "remote_folder": str(remote_folder),
+    }
+    return _submit_call("faasr_get_file", arguments, lambda data: True)
+
+
+def faasr_delete_file_future(remote_file, server_name="", remote_folder=""):
+    """
+    Deletes a file from the FaaSr server in the background
+
+    Returns:
+        Future -- resolves to True
+    """
+    arguments = {
+        "remote_file": str(remote_file),
+        "server_name": server_name,
+        "remote_folder": str(remote_folder),
+    }
+    return _submit_call("faasr_delete_file", arguments, lambda data: True)
+
+
+def faasr_get_folder_list_future(server_name="", prefix=""):
+    """
+    Gets the list of files on the FaaSr server in the background
+
+    Returns:
+        Future -- resolves to list[str]
+    """
+    arguments = {"server_name": server_name, "prefix": str(prefix)}
+    return _submit_call(
+        "faasr_get_folder_list", arguments, lambda data: data["folder_list"]
+    )
+
+
+def faasr_log_future(log_message):
+    """
+    Logs a message to the FaaSr server log in the background
+
+    Returns:
+        Future -- resolves to True
+    """
+    if not log_message:
+        raise ValueError("faasr_log called with empty log_message")
+    arguments = {"log_message": log_message}
+    return _submit_call("faasr_log", arguments, lambda data: True)
+
+
+def faasr_rank_future():
+    """
+    Gets the rank and max rank of the current function in the background
+
+    Returns:
+        Future -- resolves to dict
+    """
+    return _submit_call("faasr_rank", {}, lambda data: data)
+
+
+def faasr_get_s3_creds_future(server_name=""):
+    """
+    Gets S3 credentials from the server in the background
+
+    Returns:
+        Future -- resolves to dict
+    """
+    arguments = {"server_name": server_name}
+    return _submit_call("faasr_get_s3_creds", arguments, lambda data: data["s3_creds"])
+
+
+def faasr_put_bytes_future(data, remote_file, server_name="", remote_folder="."):
+    """
+    Uploads an in-memory buffer to the FaaSr server in the background
+    (data must not be modified until the future resolves)
+
+    Returns:
+        Future -- resolves to True
+    """
+    return _submit(_put_bytes, data, remote_file, server_name, remote_folder)
+
+
+def faasr_get_bytes_future(remote_file, server_name="", remote_folder="."):
+    """
+    Downloads a file from the FaaSr server into memory in the background
+
+    Returns:
+        Future -- resolves to bytes
+    """
+    return _submit(_get_bytes, remote_file, server_name, remote_folder)
+
+
+def _as_async(future_func):
+    """
+    Wraps a *_future function into an awaitable *_async function
+
+    The call still runs on a background thread (see _get_executor); awaiting it
+    does not block the event loop, but each pending call holds a pool thread,
+    so at most MAX_PENDING_CALLS calls are in flight at once
+    """
+
+    @functools.wraps(future_func)
+    async def async_func(*args, **kwargs):
+        # already loaded by the running event loop; not imported at module
+        # level since most user functions never use it
+        import asyncio
+
+        return await asyncio.wrap_future(future_func(*args, **kwargs))
+
+    async_func.__name__ = future_func.__name__.replace("_future", "_async")
+    async_func.__qualname__ = async_func.__name__
+    return async_func
+
+
+faasr_put_file_async = _as_async(faasr_put_file_future)
+faasr_get_file_async = _as_async(faasr_get_file_future)
+faasr_delete_file_async = _as_async(faasr_delete_file_future)
+faasr_get_folder_list_async = _as_async(faasr_get_folder_list_future)
+faasr_log_async = _as_async(faasr_log_future)
+faasr_rank_async = _as_async(faasr_rank_future)
+faasr_get_s3_creds_async = _as_async(faasr_get_s3_creds_future)
+faasr_put_bytes_async = _as_async(faasr_put_bytes_future)
+faasr_get_bytes_async = _as_async(faasr_get_bytes_future)
@@ -1,6 +1,20 @@
 import sys
 
-import requests
+from FaaSr_py.client.rpc_client import RPCClient
+from FaaSr_py.helpers.shared_memory import (attach_shared_buffer,
+                                            create_shared_buffer)
+
+_client = None
+
+
+def _rpc():
+    """
+    Returns the keep-alive client for the RPC server (created on first use)
+    """
+    global _client
+    if _client is None:
+        _client = RPCClient.from_env()
+    return _client
 
 
 def faasr_put_file(
@@ -19,9 +33,8 @@ def faasr_put_file(
             "remote_folder": str(remote_folder),
         },
     }
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         if response.get("Success", False):
             return True
         else:
@@ -52,9 +65,8 @@ def faasr_get_file(
             "remote_folder": str(remote_folder),
         },
     }
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         if response.get("Success", False):
             return True
         else:
@@ -69,6 +81,81 @@ def faasr_get_file(
         sys.exit(1)
 
 
+def faasr_put_bytes(data, remote_file, server_name="", remote_folder="."):
+    """
+    Uploads an in-memory buffer (bytes, bytearray, numpy array, ...) to the
+    FaaSr server. The buffer is copied once into shared memory and only its
+    handle is sent over RPC
+    """
+    view = memoryview(data).cast("B")
+    shm = create_shared_buffer(view.nbytes)
+    try:
+        shm.buf[: view.nbytes] = view
+        request_json = {
+            "ProcedureID": "faasr_put_shared",
+            "Arguments": {
+                "shm_name": shm.name,
+                "size": view.nbytes,
+                "remote_file": str(remote_file),
+                "server_name": server_name,
+                "remote_folder": str(remote_folder),
+            },
+        }
+        response = _rpc().post("/faasr-action", request_json)
+    except Exception as e:
+        err_msg = f'{{"faasr_put_bytes": "Failed to send buffer to FaaSr RPC -- {e}"}}'
+        print(err_msg)
+        sys.exit(1)
+    finally:
+        view.release()
+        shm.close()
+        shm.unlink()
+
+    if response.get("Success", False):
+        return True
+    err_msg = '{"faasr_put_bytes": "Request to FaaSr RPC failed"}'
+    print(err_msg)
+    sys.exit(1)
+
+
+def faasr_get_bytes(remote_file, server_name="", remote_folder="."):
+    """
+    Downloads a file from the FaaSr server into memory. The server writes the
+    file into shared memory, so no temp file or serialization is involved
+
+    Returns:
+        bytes -- contents of the file
+    """
+    request_json = {
+        "ProcedureID": "faasr_get_shared",
+        "Arguments": {
+            "remote_file": str(remote_file),
+            "server_name": server_name,
+            "remote_folder": str(remote_folder),
+        },
+    }
+    try:
+        response = _rpc().post("/faasr-action", request_json)
+        if not response.get("Success", False):
+            err_msg = '{"faasr_get_bytes": "Request to FaaSr RPC failed"}'
+            print(err_msg)
+            sys.exit(1)
+        shm = attach_shared_buffer(response["Data"]["shm_name"])
+    except Exception as e:
+        err_msg = (
+            f'{{"faasr_get_bytes": "Failed to parse response from FaaSr RPC -- {e}"}}'
+        )
+        print(err_msg)
+        sys.exit(1)
+
+    # the client owns the block once the server has filled it
+    try:
+        return bytes(shm.buf[: response["Data"]["size"]])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
 def faasr_delete_file(remote_file, server_name="", remote_folder=""):
     """
     Deletes a file from the FaaSr server
@@ -81,9 +168,8 @@ def faasr_delete_file(remote_file, server_name="", remote_folder=""):
             "remote_folder": str(remote_folder),
         },
     }
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         if response.get("Success", False):
             return True
         else:
@@ -110,9 +196,8 @@ def faasr_log(log_message):
         "ProcedureID": "faasr_log",
         "Arguments": {"log_message": log_message},
     }
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         if response.get("Success", False):
             return True
         else:
@@ -133,9 +218,8 @@ def faasr_get_folder_list(server_name="", prefix=""):
         "ProcedureID": "faasr_get_folder_list",
         "Arguments": {"server_name": server_name, "prefix": str(prefix)},
     }
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         return response["Data"]["folder_list"]
     except Exception as e:
         err_msg = f"{{py_client_stub: failed to get folder list from server -- {e}}}"
@@ -148,9 +232,8 @@ def faasr_rank():
     Get the rank and max rank of the current function as a namedtuple (rank, max_rank)
     """
     request_json = {"ProcedureID": "faasr_rank", "Arguments": {}}
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         return response["Data"]
     except Exception as e:
         err_msg = f"{{py_client_stub: failed to get rank from server -- {e}}}"
@@ -166,9 +249,8 @@ def faasr_get_s3_creds():
         dict -- S3 credentials
     """
     request_json = {"ProcedureID": "faasr_get_s3_creds", "Arguments": {}}
-    r = requests.post("http://127.0.0.1:8000/faasr-action", json=request_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-action", request_json)
         return response["Data"]["s3_creds"]
     except Exception as e:
         err_msg = (
@@ -178,6 +260,152 @@ def faasr_get_s3_creds():
         sys.exit(1)
 
 
+class FaaSrBatch:
+    """
+    Queues FaaSr calls and sends them to the server in one request
+
+    Use through faasr_batch():
+
+        with faasr_batch(concurrent=True) as batch:
+            batch.faasr_get_file("a.csv", "a.csv")
+            batch.faasr_log("fetched inputs")
+        batch.results  # per-call data, in order
+    """
+
+    def __init__(self, concurrent=False):
+        """
+        Arguments:
+            concurrent: bool -- let the server run independent calls concurrently
+            (calls touching the same file or the log still run in order)
+        """
+        self.concurrent = concurrent
+        self.calls = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.send()
+        return False
+
+    def add(self, procedure_id, **arguments):
+        """
+        Queues a call
+
+        Arguments:
+            procedure_id: str -- name of the FaaSr function
+            arguments: arguments of the FaaSr function
+        Returns:
+            int -- index of the call's entry in results
+        """
+        self.calls.append({"ProcedureID": procedure_id, "Arguments": arguments})
+        return len(self.calls) - 1
+
+    def faasr_put_file(
+        self,
+        local_file,
+        remote_file,
+        server_name="",
+        local_folder=".",
+        remote_folder=".",
+    ):
+        return self.add(
+            "faasr_put_file",
+            local_file=str(local_file),
+            remote_file=str(remote_file),
+            server_name=server_name,
+            local_folder=str(local_folder),
+            remote_folder=str(remote_folder),
+        )
+
+    def faasr_get_file(
+        self,
+        local_file,
+        remote_file,
+        server_name="",
+        local_folder=".",
+        remote_folder=".",
+    ):
+        return self.add(
+            "faasr_get_file",
+            local_file=str(local_file),
+            remote_file=str(remote_file),
+            server_name=server_name,
+            local_folder=str(local_folder),
+            remote_folder=str(remote_folder),
+        )
+
+    def faasr_delete_file(self, remote_file, server_name="", remote_folder=""):
+        return self.add(
+            "faasr_delete_file",
+            remote_file=str(remote_file),
+            server_name=server_name,
+            remote_folder=str(remote_folder),
+        )
+
+    def faasr_log(self, log_message):
+        if not log_message:
+            err_msg = (
+                "{py_client_stub: ERROR -- faasr_log called with empty log_message}"
+            )
+            print(err_msg)
+            sys.exit(1)
+        return self.add("faasr_log", log_message=log_message)
+
+    def faasr_get_folder_list(self, server_name="", prefix=""):
+        return self.add(
+            "faasr_get_folder_list", server_name=server_name, prefix=str(prefix)
+        )
+
+    def send(self):
+        """
+        Sends the queued calls to the server
+
+        Returns:
+            list[dict] -- data returned by each call, in order
+        """
+        if not self.calls:
+            self.results = []
+            return self.results
+        batch_json = {"Calls": self.calls, "Concurrent": self.concurrent}
+        try:
+            response = _rpc().post("/faasr-batch", batch_json)
+        except Exception as e:
+            err_msg = (
+                f'{{"faasr_batch": "Failed to parse response from FaaSr RPC -- {e}"}}'
+            )
+            print(err_msg)
+            sys.exit(1)
+
+        if not response.get("Success", False):
+            for call, result in zip(self.calls, response.get("Results", [])):
+                if not result.get("Success", False):
+                    err_msg = (
+                        f'{{"faasr_batch": "{call["ProcedureID"]} failed -- '
+                        f'{result.get("Message")}"}}'
+                    )
+                    print(err_msg)
+            sys.exit(1)
+
+        self.calls = []
+        self.results = [result.get("Data") or {} for result in response["Results"]]
+        return self.results
+
+
+def faasr_batch(concurrent=False):
+    """
+    Returns a batch that sends the FaaSr calls queued on it in one request
+
+    Arguments:
+        concurrent: bool -- let the server run independent calls concurrently
+    Returns:
+        FaaSrBatch
+    """
+    return FaaSrBatch(concurrent=concurrent)
+
+
 def faasr_return(return_value=None):
     """
     Returns the result of the user function to the FaaSr server
@@ -185,9 +413,8 @@ def faasr_return(return_value=None):
         return_value: bool -- the return value of the user function
     """
     return_json = {"FunctionResult": return_value}
-    r = requests.post("http://127.0.0.1:8000/faasr-return", json=return_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-return", return_json)
         if response.get("Success", False):
             sys.exit(0)
         else:
@@ -204,9 +431,8 @@ def faasr_return(return_value=None):
 
 def faasr_exit(message=None, error=True):
     exit_json = {"Error": error, "Message": message}
-    r = requests.post("http://127.0.0.1:8000/faasr-exit", json=exit_json)
     try:
-        response = r.json()
+        response = _rpc().post("/faasr-exit", exit_json)
         if response.get("Success", False):
             sys.exit(0)
         else:
@@ -0,0 +1,361 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from FaaSr_py import s3_api
+from FaaSr_py.client.py_client_async import MAX_PENDING_CALLS, _as_async
+from FaaSr_py.client.py_client_stubs import FaaSrBatch
+from FaaSr_py.client.py_user_func_entry import (bind_client_api,
+                                                call_user_function,
+                                                get_user_function)
+from FaaSr_py.config.s3_log_sender import S3LogSender
+from FaaSr_py.helpers.batch_scheduling import submit_batch
+from FaaSr_py.helpers.exceptions import FaaSrRequestError
+from FaaSr_py.helpers.rank import faasr_rank
+from FaaSr_py.helpers.s3_helper_functions import flush_s3_log
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns the thread pool running background FaaSr calls (created on first use)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_PENDING_CALLS, thread_name_prefix="faasr-inprocess"
+            )
+    return _executor
+
+
+class _FunctionReturn(BaseException):
+    """
+    Raised by faasr_return to end the user function with a result
+    """
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+
+class _FunctionExit(BaseException):
+    """
+    Raised by faasr_exit to end the user function
+    """
+
+    def __init__(self, message=None, error=True):
+        super().__init__(message)
+        self.message = message
+        self.error = error
+
+
+class InProcessAPI:
+    """
+    FaaSr API for user functions running inside the executor process
+
+    Calls go straight to the s3_api implementations, with no RPC server in between.
+    Failures behave like they do in the client stubs: blocking calls exit the
+    user function, *_future and *_async calls raise FaaSrRequestError
+    """
+
+    def __init__(self, faasr_payload):
+        """
+        Arguments:
+            faasr_payload: FaaSrPayload -- payload of the running action
+        """
+        self.faasr = faasr_payload
+
+    def _call(self, name, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except SystemExit:
+            # s3_api functions log the reason before exiting
+            raise
+        except Exception as e:
+            print(f'{{"{name}": "Request to FaaSr failed -- {e}"}}')
+            raise SystemExit(1)
+
+    def faasr_put_file(
+        self,
+        local_file,
+        remote_file,
+        server_name="",
+        local_folder=".",
+        remote_folder=".",
+    ):
+        self._call(
+            "faasr_put_file",
+            s3_api.faasr_put_file,
+            self.faasr,
+            local_file=str(local_file),
+            remote_file=str(remote_file),
+            server_name=server_name,
+            local_folder=str(local_folder),
+            remote_folder=str(remote_folder),
+        )
+        return True
+
+    def faasr_get_file(
+        self,
+        local_file,
+        remote_file,
+        server_name="",
+        local_folder=".",
+        remote_folder=".",
+    ):
+        self._call(
+            "faasr_get_file",
+            s3_api.faasr_get_file,
+            self.faasr,
+            local_file=str(local_file),
+            remote_file=str(remote_file),
+            server_name=server_name,
+            local_folder=str(local_folder),
+            remote_folder=str(remote_folder),
+        )
+        return True
+
+    def faasr_delete_file(self, remote_file, server_name="", remote_folder=""):
+        self._call(
+            "faasr_delete_file",
+            s3_api.faasr_delete_file,
+            self.faasr,
+            remote_file=str(remote_file),
+            server_name=server_name,
+            remote_folder=str(remote_folder),
+        )
+        return True
+
+    def faasr_get_folder_list(self, server_name="", prefix=""):
+        return self._call(
+            "faasr_get_folder_list",
+            s3_api.faasr_get_folder_list,
+            self.faasr,
+            server_name=server_name,
+            prefix=str(prefix),
+        )
+
+    def faasr_log(self, log_message):
+        if not log_message:
+            err_msg = (
+                "{py_client_stub: ERROR -- faasr_log called with empty log_message}"
+            )
+            print(err_msg)
+            raise SystemExit(1)
+        # same rate limiting and sampling as logs sent through the RPC server
+        log_sender = S3LogSender.get_log_sender()
+        if log_sender is None or log_sender.allow(log_message):
+            self._call("faasr_log", s3_api.faasr_log, self.faasr, log_message)
+        return True
+
+    def faasr_rank(self):
+        return self._call("faasr_rank", faasr_rank, self.faasr)
+
+    def faasr_get_s3_creds(self, server_name=""):
+        return self._call(
+            "faasr_get_s3_creds",
+            s3_api.faasr_get_s3_creds,
+            self.faasr,
+            server_name=server_name,
+        )
+
+    def faasr_put_bytes(self, data, remote_file, server_name="", remote_folder="."):
+        self._call(
+            "faasr_put_bytes",
+            s3_api.faasr_put_bytes,
+            self.faasr,
+            data,
+            remote_file=str(remote_file),
+            server_name=server_name,
+            remote_folder=str(remote_folder),
+        )
+        return True
+
+    def faasr_get_bytes(self, remote_file, server_name="", remote_folder="."):
+        buffer, size = self._call(
+            "faasr_get_bytes",
+            s3_api.faasr_get_bytes,
+            self.faasr,
+            remote_file=str(remote_file),
+            server_name=server_name,
+            remote_folder=str(remote_folder),
+        )
+        return bytes(memoryview(buffer)[:size])
+
+    def faasr_batch(self, concurrent=False):
+        return InProcessBatch(self, concurrent=concurrent)
+
+    def _future(self, name):
+        """
+        Returns the *_future variant of a blocking API function
+        """
+        func = getattr(self, name)
+
+        def run(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except SystemExit:
+                raise FaaSrRequestError(name, "see the action log for details")
+            except Exception as e:
+                raise FaaSrRequestError(name, str(e))
+
+        def future_func(*args, **kwargs):
+            return _get_executor().submit(run, *args, **kwargs)
+
+        future_func.__name__ = f"{name}_future"
+        future_func.__qualname__ = future_func.__name__
+        return future_func
+
+    def functions(self):
+        """
+        Returns the API to bind into the user function's namespace
+
+        Returns:
+            dict -- name of each API function to its implementation
+        """
+        blocking = [
+            "faasr_put_file",
+            "faasr_get_file",
+            "faasr_delete_file",
+            "faasr_get_folder_list",
+            "faasr_log",
+            "faasr_rank",
+            "faasr_get_s3_creds",
+            "faasr_put_bytes",
+            "faasr_get_bytes",
+        ]
+        api = {name: getattr(self, name) for name in blocking}
+        for name in blocking:
+            future_func = self._future(name)
+            api[f"{name}_future"] = future_func
+            api[f"{name}_async"] = _as_async(future_func)
+        api["faasr_batch"] = self.faasr_batch
+        api["faasr_return"] = faasr_return
+        api["faasr_exit"] = faasr_exit
+        return api
+
+
+class InProcessBatch(FaaSrBatch):
+    """
+    faasr_batch for in-process functions: queued calls run when sent, in order
+    or, for a concurrent batch, on the in-process thread pool (calls touching
+    the same file or the log still run in order, as on the RPC server)
+    """
+
+    def __init__(self, api, concurrent=False):
+        super().__init__(concurrent=concurrent)
+        self._api = api
+
+    def _run_call(self, call, wait_for=()):
+        """
+        Runs a queued call
+
+        Returns:
+            (bool, dict) -- whether the call succeeded, and the data it returned
+        """
+        for future in wait_for:
+            future.exception()
+        func = getattr(self._api, call["ProcedureID"])
+        try:
+            data = func(**call["Arguments"])
+        except (Exception, SystemExit):
+            # the API functions print the reason before exiting
+            return False, {}
+        if call["ProcedureID"] == "faasr_get_folder_list":
+            return True, {"folder_list": data}
+        return True, {}
+
+    def send(self):
+        """
+        Runs the queued calls, exiting the user function if any of them failed
+
+        Returns:
+            list[dict] -- data returned by each call, in order
+        """
+        calls = self.calls
+        if self.concurrent and len(calls) > 1:
+            futures = submit_batch(
+                self._api.faasr,
+                [(call["ProcedureID"], call["Arguments"]) for call in calls],
+                lambda i, wait_for: _get_executor().submit(
+                    self._run_call, calls[i], wait_for
+                ),
+            )
+            outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [self._run_call(call) for call in calls]
+
+        failed = [call for call, (ok, _) in zip(calls, outcomes) if not ok]
+        for call in failed:
+            print(f'{{"faasr_batch": "{call["ProcedureID"]} failed"}}')
+        if failed:
+            raise SystemExit(1)
+
+        self.calls = []
+        self.results = [data for _, data in outcomes]
+        return self.results
+
+
+def faasr_return(return_value=None):
+    """
+    Ends the user function with return_value
+    """
+    raise _FunctionReturn(return_value)
+
+
+def faasr_exit(message=None, error=True):
+    """
+    Ends the user function, marking the action as failed if error is set
+    """
+    raise _FunctionExit(message=message, error=error)
+
+
+def run_py_function_in_process(faasr, func_name, args):
+    """
+    Runs a Python user function in the calling process
+
+    Arguments:
+        faasr: FaaSr payload instance
+        func_name: name of function to run
+        args: arguments for function (dict)
+    Returns:
+        result of the user function
+    Raises:
+        RuntimeError -- the user function failed (as reported when it runs
+        in its own process)
+    """
+    try:
+        user_function = get_user_function(faasr, func_name)
+    except Exception as e:
+        raise RuntimeError(f"failed to get user functions -- error: {e}")
+
+    if not user_function:
+        raise RuntimeError(
+            f"{{py_user_func_entry.py: cannot find function {func_name}}}"
+        )
+
+    bind_client_api(user_function, InProcessAPI(faasr).functions())
+
+    try:
+        return call_user_function(user_function, args)
+    except _FunctionReturn as ret:
+        return ret.result
+    except _FunctionExit as exit_obj:
+        if not exit_obj.error:
+            return None
+        raise RuntimeError(
+            exit_obj.message or "Unkown error while getting user function return"
+        )
+    except SystemExit as e:
+        if e.code in (0, None):
+            return None
+        raise RuntimeError(f"non-zero exit code ({e.code!r}) from user function")
+    except Exception as e:
+        raise RuntimeError(str(e))
+    finally:
+        flush_s3_log()
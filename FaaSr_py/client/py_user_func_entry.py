@@ -1,13 +1,18 @@
 import logging
+import os
 from pathlib import Path
 
-from FaaSr_py.client.py_client_stubs import (faasr_delete_file, faasr_exit,
+from FaaSr_py.client import py_client_async
+from FaaSr_py.client.py_client_stubs import (faasr_batch, faasr_delete_file,
+                                             faasr_exit, faasr_get_bytes,
                                              faasr_get_file,
                                              faasr_get_folder_list,
                                              faasr_get_s3_creds, faasr_log,
-                                             faasr_put_file, faasr_rank,
-                                             faasr_return)
+                                             faasr_put_bytes, faasr_put_file,
+                                             faasr_rank, faasr_return)
 from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.exceptions import (FaaSrError, FaaSrRequestError,
+                                         FaaSrRPCError)
 from FaaSr_py.helpers.py_func_helper import (faasr_import_function,
                                              faasr_import_function_walk,
                                              local_wrap)
@@ -15,7 +20,7 @@ from FaaSr_py.helpers.py_func_helper import (faasr_import_function,
 logger = logging.getLogger(__name__)
 
 
-def run_py_function(faasr, func_name, args, func_path=None):
+def run_py_function(faasr, func_name, args, func_path=None, rpc_env=None):
     """
     Entry for Python function process
 
@@ -23,17 +28,13 @@ def run_py_function(faasr, func_name, args, func_path=None):
         faasr: FaaSr payload instance
         func_name: name of function to run
         args: arguments for function (dict)
+        rpc_env: dict | None -- environment variables locating the RPC server
     """
+    if rpc_env:
+        os.environ.update(rpc_env)
+
     try:
-        if global_config.USE_LOCAL_USER_FUNC:
-            func_path = Path(global_config.LOCAL_FUNCTION_PATH).resolve()
-            func_name = global_config.LOCAL_FUNCTION_NAME
-
-            user_function = faasr_import_function(func_path, func_name)
-        else:
-            user_function = faasr_import_function_walk(
-                func_name, directory=f"/tmp/functions/{faasr['InvocationID']}"
-            )
+        user_function = get_user_function(faasr, func_name)
     except Exception as e:
         err_msg = f"failed to get user functions -- error: {e}"
         faasr_exit(err_msg)
@@ -44,21 +45,88 @@ def run_py_function(faasr, func_name, args, func_path=None):
         faasr_exit(err_msg)
 
     # Add FaaSr client stubs to user function's namespace
-    user_function.__globals__["faasr_put_file"] = faasr_put_file
-    user_function.__globals__["faasr_get_file"] = faasr_get_file
-    user_function.__globals__["faasr_delete_file"] = faasr_delete_file
-    user_function.__globals__["faasr_get_folder_list"] = faasr_get_folder_list
-    user_function.__globals__["faasr_log"] = faasr_log
-    user_function.__globals__["faasr_rank"] = faasr_rank
-    user_function.__globals__["faasr_get_s3_creds"] = faasr_get_s3_creds
+    bind_client_api(user_function, rpc_client_api())
 
     try:
-        if global_config.USE_LOCAL_USER_FUNC:
-            print(f"using local function {global_config.LOCAL_FUNCTION_NAME}")
-            result = local_wrap(user_function)(**global_config.LOCAL_FUNC_ARGS)
-        else:
-            result = user_function(**args)
+        result = call_user_function(user_function, args)
     except Exception as e:
         faasr_exit(message=str(e))
 
     faasr_return(result)
+
+
+def get_user_function(faasr, func_name):
+    """
+    Imports the user function
+
+    Arguments:
+        faasr: FaaSr payload instance
+        func_name: name of function to import
+    Returns:
+        function: function object | None
+    """
+    if global_config.USE_LOCAL_USER_FUNC:
+        func_path = Path(global_config.LOCAL_FUNCTION_PATH).resolve()
+        func_name = global_config.LOCAL_FUNCTION_NAME
+
+        return faasr_import_function(func_path, func_name)
+    else:
+        return faasr_import_function_walk(
+            func_name, directory=f"/tmp/functions/{faasr['InvocationID']}"
+        )
+
+
+def call_user_function(user_function, args):
+    """
+    Calls the user function with its arguments (or the local debug arguments)
+
+    Arguments:
+        user_function: function -- user function
+        args: arguments for function (dict)
+    Returns:
+        result of the user function
+    """
+    if global_config.USE_LOCAL_USER_FUNC:
+        print(f"using local function {global_config.LOCAL_FUNCTION_NAME}")
+        return local_wrap(user_function)(**global_config.LOCAL_FUNC_ARGS)
+    else:
+        return user_function(**args)
+
+
+def rpc_client_api():
+    """
+    Returns the FaaSr API that talks to the RPC server
+
+    Returns:
+        dict -- name of each API function to its implementation
+    """
+    api = {
+        "faasr_put_file": faasr_put_file,
+        "faasr_get_file": faasr_get_file,
+        "faasr_delete_file": faasr_delete_file,
+        "faasr_get_folder_list": faasr_get_folder_list,
+        "faasr_log": faasr_log,
+        "faasr_rank": faasr_rank,
+        "faasr_get_s3_creds": faasr_get_s3_creds,
+        "faasr_put_bytes": faasr_put_bytes,
+        "faasr_get_bytes": faasr_get_bytes,
+        "faasr_batch": faasr_batch,
+    }
+    # non-blocking variants (*_future, *_async)
+    for name in py_client_async.__all__:
+        api[name] = getattr(py_client_async, name)
+    return api
+
+
+def bind_client_api(user_function, api):
+    """
+    Adds the FaaSr API (and the errors it raises) to the user function's namespace
+
+    Arguments:
+        user_function: function -- user function
+        api: dict -- name of each API function to its implementation
+    """
+    user_function.__globals__.update(api)
+    user_function.__globals__["FaaSrError"] = FaaSrError
+    user_function.__globals__["FaaSrRequestError"] = FaaSrRequestError
+    user_function.__globals__["FaaSrRPCError"] = FaaSrRPCError
@@ -0,0 +1,154 @@
+import http.client
+import json
+import os
+import socket
+import threading
+from urllib.parse import urlencode
+
+RPC_HOST = "127.0.0.1"
+DEFAULT_RPC_PORT = 8000
+
+# environment variables telling user functions where their RPC server listens:
+# a unix domain socket path, or else a TCP port on localhost
+RPC_SOCKET_ENV = "FAASR_RPC_SOCKET"
+RPC_PORT_ENV = "FAASR_RPC_PORT"
+
+# errors raised when a kept-alive connection was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class TCPHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection with Nagle's algorithm disabled, since RPC
+    requests and responses are small and latency bound
+    """
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection over a unix domain socket
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+class RPCClient:
+    """
+    Keep-alive JSON client for the FaaSr RPC server
+
+    Every thread reuses its own persistent connection, so thousands of small
+    calls don't each pay for a TCP handshake. Only depends on the standard library
+    """
+
+    def __init__(self, port=DEFAULT_RPC_PORT, socket_path=None, timeout=None):
+        """
+        Arguments:
+            port: int -- TCP port of the server on localhost
+            socket_path: str | None -- unix domain socket of the server (preferred)
+            timeout: float | None -- socket timeout in seconds
+        """
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns a client for the RPC server advertised in the environment
+        """
+        port = int(os.getenv(RPC_PORT_ENV) or DEFAULT_RPC_PORT)
+        return cls(port=port, socket_path=os.getenv(RPC_SOCKET_ENV) or None)
+
+    def _connection(self):
+        # connections must not be shared with a forked child
+        if os.getpid() != self._pid:
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.socket_path:
+                conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            else:
+                conn = TCPHTTPConnection(RPC_HOST, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            self._local.used = False
+        return conn
+
+    def request(self, method, path, body=None, params=None):
+        """
+        Sends a request to the RPC server and returns the decoded JSON response
+
+        Arguments:
+            method: str -- HTTP method
+            path: str -- endpoint path (e.g. /faasr-action)
+            body: dict | None -- JSON body
+            params: dict | None -- query parameters
+        Returns:
+            dict -- decoded response
+        """
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {"Connection": "keep-alive"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            conn = self._connection()
+            reused = self._local.used
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS:
+                self.close()
+                # the server drops idle keep-alive connections before reading
+                # the request, so one retry on a fresh connection is safe
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                self.close()
+                raise
+
+            self._local.used = True
+            if response.will_close:
+                self.close()
+            return json.loads(data)
+
+    def post(self, path, body):
+        return self.request("POST", path, body=body)
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params)
+
+    def close(self):
+        """
+        Closes the current thread's connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+        self._local.used = False
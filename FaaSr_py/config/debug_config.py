@@ -2,6 +2,7 @@ import json
 import logging
 from pathlib import Path
 
+from FaaSr_py.config.log_controls import get_action_log_level
 from FaaSr_py.config.logger_classes import FaaSrFilter
 from FaaSr_py.config.s3_log_handler import S3LogHandler
 
@@ -72,9 +73,14 @@ class Config:
         self.USE_LOCAL_FILE_SYSTEM = self.__dict__["_USE_LOCAL_FILE_SYSTEM"]
         self.LOCAL_FILE_SYSTEM_DIR = self.__dict__["_LOCAL_FILE_SYSTEM_DIR"]
 
-    def add_s3_log_handler(self, faasr_payload, start_time, level=logging.DEBUG):
+    def add_s3_log_handler(self, faasr_payload, start_time, level=None):
         """
         Start s3 logger
+
+        Arguments:
+            faasr_payload: FaaSr payload instance
+            start_time: timestamp from start of FaaSr action
+            level: minimum level to upload; defaults to the action's LogLevel (or DEBUG)
         """
         if not faasr_payload:
             raise RuntimeError(
@@ -82,6 +88,9 @@ class Config:
             )
         logger = logging.getLogger()
 
+        if level is None:
+            level = get_action_log_level(faasr_payload)
+
         # Initialize S3 log handler
         s3_log_handler = S3LogHandler(
             faasr_payload=faasr_payload, level=level, start_time=start_time
@@ -0,0 +1,196 @@
+import logging
+import re
+import threading
+import time
+
+# numbers and hex ids are masked so that messages which only differ
+# in counters, timestamps or ids are treated as "similar"
+_VOLATILE_TOKENS = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?")
+
+# number of similar messages that are always kept before sampling starts
+DEFAULT_REPEAT_THRESHOLD = 10
+
+# once the threshold is reached, only one in every N similar messages is kept
+DEFAULT_SAMPLE_EVERY = 100
+
+# minimum number of seconds between "suppressed N similar messages" summaries
+SUMMARY_INTERVAL = 10
+
+# upper bound on the number of distinct message signatures that are tracked
+MAX_TRACKED_SIGNATURES = 10000
+
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+
+def get_action_settings(faasr_payload):
+    """
+    Returns the ActionList entry of the action being invoked
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+    Returns:
+        dict -- action settings (empty if the action cannot be found)
+    """
+    try:
+        return faasr_payload["ActionList"].get(faasr_payload["FunctionInvoke"], {})
+    except (KeyError, TypeError, AttributeError):
+        return {}
+
+
+def get_action_log_level(faasr_payload, default=logging.DEBUG):
+    """
+    Returns the S3 log level for the current action (ActionList.<action>.LogLevel)
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        default: int -- level used if the action does not override it
+    Returns:
+        int -- logging level
+    """
+    level = get_action_settings(faasr_payload).get("LogLevel")
+    if not level:
+        return default
+    return LOG_LEVELS.get(str(level).upper(), default)
+
+
+class LogThrottle:
+    """
+    Token bucket rate limiter with sampling of repeated messages
+
+    Messages at ERROR or above are never dropped. Dropped messages are counted
+    per signature and reported through "suppressed N similar messages" summaries
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        burst=None,
+        repeat_threshold=DEFAULT_REPEAT_THRESHOLD,
+        sample_every=DEFAULT_SAMPLE_EVERY,
+    ):
+        """
+        Arguments:
+            rate: float | None -- messages per second (None disables rate limiting)
+            burst: int | None -- bucket size; defaults to max(rate, 1)
+            repeat_threshold: int -- similar messages kept before sampling starts
+            sample_every: int -- keep one in every N similar messages after threshold
+        """
+        self._rate = rate
+        if burst is None and rate is not None:
+            burst = max(rate, 1)
+        self._capacity = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._repeat_threshold = repeat_threshold
+        self._sample_every = max(int(sample_every), 1)
+        self._seen = {}
+        self._suppressed = {}
+        self._last_summary = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_payload(cls, faasr_payload):
+        """
+        Builds a throttle from the LogRateLimit and LogBurst
+        settings of the current action
+
+        Arguments:
+            faasr_payload: FaaSr payload dict
+        Returns:
+            LogThrottle
+        """
+        action = get_action_settings(faasr_payload)
+        return cls(rate=action.get("LogRateLimit"), burst=action.get("LogBurst"))
+
+    def allow(self, message, levelno=logging.INFO, signature=None):
+        """
+        Decides whether a message should be logged
+
+        Arguments:
+            message: str -- message to log
+            levelno: int -- level of the message
+            signature: str | None -- key used to group similar messages
+            (defaults to the message with numbers masked)
+        Returns:
+            bool -- True if the message should be kept
+        """
+        if levelno >= logging.ERROR:
+            return True
+
+        if signature is None:
+            signature = str(message)
+        signature = _VOLATILE_TOKENS.sub("#", signature)
+
+        with self._lock:
+            if len(self._seen) > MAX_TRACKED_SIGNATURES:
+                self._seen.clear()
+
+            count = self._seen.get(signature, 0) + 1
+            self._seen[signature] = count
+
+            over_threshold = count > self._repeat_threshold
+            if over_threshold and (count - self._repeat_threshold) % self._sample_every:
+                self._suppress(signature, message)
+                return False
+
+            if not self._take_token():
+                self._suppress(signature, message)
+                return False
+        return True
+
+    def _take_token(self):
+        """
+        Takes a token from the bucket (caller must hold the lock)
+        """
+        if self._rate is None:
+            return True
+
+        now = time.monotonic()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._last_refill) * self._rate
+        )
+        self._last_refill = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _suppress(self, signature, message):
+        """
+        Records a dropped message (caller must hold the lock)
+        """
+        if signature in self._suppressed:
+            self._suppressed[signature][0] += 1
+        else:
+            self._suppressed[signature] = [1, str(message)]
+
+    def pop_summaries(self, force=False):
+        """
+        Returns "suppressed N similar messages" summaries and resets the counters
+
+        Arguments:
+            force: bool -- return summaries even if SUMMARY_INTERVAL has not elapsed
+        Returns:
+            list[str] -- summary lines
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self._suppressed:
+                return []
+            if not force and now - self._last_summary < SUMMARY_INTERVAL:
+                return []
+
+            summaries = [
+                f"[FaaSr] suppressed {count} similar messages like: {example}"
+                for count, example in self._suppressed.values()
+            ]
+            self._suppressed = {}
+            self._last_summary = now
+        return summaries
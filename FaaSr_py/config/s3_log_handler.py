@@ -33,7 +33,7 @@ class S3LogHandler(logging.Handler):
 
             # format log and send it
             msg = self.format(record)
-            self._sender.log(msg)
+            self._sender.log(msg, levelno=record.levelno, signature=str(record.msg))
         except Exception as e:
             self._sender.flush_log()
             raise RuntimeError("failed to upload s3 log") from e
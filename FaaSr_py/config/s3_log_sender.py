@@ -1,7 +1,10 @@
 import logging
 import sys
+import threading
 from datetime import datetime
 
+from FaaSr_py.config.log_controls import LogThrottle
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +32,11 @@ class S3LogSender:
         self._log_buffer = []
         self._start_time = timestamp
         self._faasr_payload = faasr_payload
+        self._throttle = LogThrottle.from_payload(faasr_payload)
+        # guards the buffer and throttle; the RPC server logs from many threads
+        self._lock = threading.Lock()
+        # keeps concurrent flushes from uploading out of order
+        self._flush_lock = threading.Lock()
 
     @classmethod
     def get_log_sender(cls):
@@ -45,38 +53,67 @@ class S3LogSender:
     def faasr_payload(self, faasr_payload):
         """
         Sets the faasr_payload for the logger
+        (and picks up the log settings of its action)
         """
-        self._faasr_payload = faasr_payload
+        with self._lock:
+            self._faasr_payload = faasr_payload
+            self._throttle = LogThrottle.from_payload(faasr_payload)
+
+    def allow(self, message, levelno=logging.INFO, signature=None):
+        """
+        Applies the action's rate limit and repeated-message sampling
+
+        Arguments:
+            message: str -- message to log
+            levelno: int -- level of the message (ERROR and above are always kept)
+            signature: str | None -- key used to group similar messages
+        Returns:
+            bool -- True if the message should be logged
+        """
+        with self._lock:
+            return self._throttle.allow(message, levelno, signature)
 
-    def log(self, message):
+    def log(self, message, levelno=logging.INFO, signature=None):
         """
-        Adds a message to the log buffer
+        Adds a message to the log buffer unless it is throttled
 
         Arguments:
             message: str -- message to log
+            levelno: int -- level of the message
+            signature: str | None -- key used to group similar messages
         """
         if not message:
             raise RuntimeError("Cannot log empty message")
-        self._log_buffer.append(message)
+        with self._lock:
+            if self._throttle.allow(message, levelno, signature):
+                self._log_buffer.append(message)
 
-    def flush_log(self):
+    def flush_log(self, final=False):
         """
         Uploads all messages inside S3LogSender and clears buffer
+
+        Arguments:
+            final: bool -- always include summaries of suppressed messages
         """
         if not self._faasr_payload:
             logger.error("S3LogSender payload is not set")
             sys.exit(1)
-        if not self._log_buffer:
-            return
-
-        # Combine all log messages into a single string and clear buffer
-        full_log = "\n".join(self._log_buffer)
-        self._log_buffer = []
 
         from FaaSr_py.s3_api.log import faasr_log
 
-        # Upload the log to S3
-        faasr_log(self._faasr_payload, full_log)
+        with self._flush_lock:
+            with self._lock:
+                self._log_buffer.extend(self._throttle.pop_summaries(force=final))
+                if not self._log_buffer:
+                    return
+
+                # Combine all log messages into a single string and clear buffer
+                full_log = "\n".join(self._log_buffer)
+                self._log_buffer = []
+                faasr_payload = self._faasr_payload
+
+            # Upload the log to S3
+            faasr_log(faasr_payload, full_log)
 
     def get_curr_timestamp(self):
         """
@@ -4,19 +4,19 @@ import os
 import shutil
 import subprocess
 import sys
-from multiprocessing import Process
+import uuid
+from multiprocessing import Pipe, Process
 from pathlib import Path
 
-import requests
-
+from FaaSr_py.client.rpc_client import RPC_PORT_ENV, RPC_SOCKET_ENV, RPCClient
 from FaaSr_py.config.debug_config import global_config
 from FaaSr_py.engine.faasr_payload import FaaSrPayload
-from FaaSr_py.helpers.faasr_start_invoke_helper import \
-    faasr_func_dependancy_install
+from FaaSr_py.engine.startup_pipeline import StartupPipeline
+from FaaSr_py.helpers.faasr_start_invoke_helper import (
+    faasr_fetch_function_code, faasr_install_packages)
 from FaaSr_py.helpers.s3_helper_functions import (flush_s3_log,
                                                   get_invocation_folder)
 from FaaSr_py.s3_api import faasr_put_file
-from FaaSr_py.server.faasr_server import run_server, wait_for_server_start
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +26,34 @@ class Executor:
     Handles logic related to running user function
     """
 
-    def __init__(self, faasr: FaaSrPayload):
+    def __init__(
+        self, faasr: FaaSrPayload, keep_server=False, use_uds=False, warm_workers=False
+    ):
+        """
+        Arguments:
+            faasr: FaaSrPayload -- payload of the action(s) to run
+            keep_server: bool -- keep the RPC server alive across consecutive
+            run_func calls, handing it the new payload for each action
+            use_uds: bool -- serve functions over a unix domain socket
+            instead of a TCP port
+            warm_workers: bool -- fork Python functions from a template process
+            that imports their PackageImports and user module only once, and
+            run R functions in one persistent R session
+        """
         if not isinstance(faasr, FaaSrPayload):
             err_msg = "initializer for Executor must be FaaSr instance"
             logger.error(err_msg)
             sys.exit(1)
         self.faasr = faasr
         self.server = None
+        self.keep_server = keep_server
+        self.use_uds = use_uds
+        self.socket_path = None
+        self.port = None
+        self.rpc_client = None
+        self.warm_workers = warm_workers
+        self.warm_worker = None
+        self.r_worker = None
         self.packages = []
 
     def _call(self, action_name):
@@ -41,13 +62,31 @@ class Executor:
 
         Arguments:
             action_name: str -- name of the action to run
+        Returns:
+            result of the function if it ran in-process, else None
+            (the result is then fetched from the RPC server)
         """
         func_name = self.faasr['ActionList'][action_name]['FunctionName']
         func_type = self.faasr['ActionList'][action_name]['Type']
         user_args = self._get_user_function_args(action_name)
 
+        function_result = None
         if not global_config.SKIP_USER_FUNCTION:
-            if func_type == "Python":
+            if func_type == "Python" and self._runs_in_process(action_name):
+                from FaaSr_py.client.py_inprocess import \
+                    run_py_function_in_process
+
+                logger.info(f"Starting function: {func_name} (Python, in-process)")
+                function_result = run_py_function_in_process(
+                    self.faasr, func_name, user_args
+                )
+                func_res = 0
+            elif func_type == "Python" and self.warm_workers:
+                logger.info(f"Starting function: {func_name} (Python, warm worker)")
+                func_res = self._get_warm_worker().run(
+                    self.faasr, func_name, user_args, rpc_env=self._rpc_env()
+                )
+            elif func_type == "Python":
                 # entry script for py function
                 from FaaSr_py.client.py_user_func_entry import run_py_function
 
@@ -56,6 +95,7 @@ class Executor:
                     py_func = Process(
                         target=run_py_function,
                         args=(self.faasr, func_name, user_args),
+                        kwargs={"rpc_env": self._rpc_env()},
                     )
                 except Exception as e:
                     logger.error(f"Error running Python function: {e}")
@@ -66,23 +106,13 @@ class Executor:
                 py_func.join()
 
                 func_res = py_func.exitcode
+            elif func_type == "R" and self.warm_workers:
+                logger.info(f"Starting function: {func_name} (R, warm worker)")
+                func_res = self._get_r_worker().run(
+                    self.faasr, func_name, user_args, rpc_env=self._rpc_env()
+                )
             elif func_type == "R":
-                # path to R function handler
-                client_dir = Path(__file__).parent.parent / "client"
-
-                r_files = [
-                    client_dir / "r_user_func_entry.R",
-                    client_dir / "r_func_helper.R",
-                    client_dir / "r_client_stubs.R",
-                ]
-
-                # Ensure /tmp exists
-                os.makedirs("/tmp", exist_ok=True)
-
-                # Copy each file
-                for src in r_files:
-                    dst = Path("/tmp") / src.name
-                    shutil.copy(src, dst)
+                self._copy_r_files()
 
                 logger.info(f"Starting function: {func_name} (R)")
 
@@ -97,6 +127,7 @@ class Executor:
                             self.faasr['InvocationID'],
                         ],
                         cwd="/tmp",
+                        env={**os.environ, **self._rpc_env()},
                     )
                 except Exception as e:
                     logger.error(f"Error running R function: {e}")
@@ -114,6 +145,56 @@ class Executor:
             logger.info("SKIPPING USER FUNCTION")
 
         self._make_done(action_name)
+        return function_result
+
+    def _get_warm_worker(self):
+        """
+        Returns the template process for Python functions (started on first use)
+        """
+        if self.warm_worker is None:
+            from FaaSr_py.engine.warm_worker import WarmWorker
+
+            self.warm_worker = WarmWorker(self.faasr)
+        return self.warm_worker
+
+    def _get_r_worker(self):
+        """
+        Returns the persistent R session (started on first use, or again if it died)
+        """
+        if self.r_worker is None or not self.r_worker.is_alive():
+            from FaaSr_py.engine.r_worker import RWorker
+
+            self._copy_r_files()
+            self.r_worker = RWorker(cwd="/tmp")
+        return self.r_worker
+
+    def _copy_r_files(self):
+        """
+        Copies the R entry scripts and client stubs to /tmp, where R runs
+        """
+        # path to R function handler
+        client_dir = Path(__file__).parent.parent / "client"
+
+        r_files = [
+            client_dir / "r_user_func_entry.R",
+            client_dir / "r_worker.R",
+            client_dir / "r_func_helper.R",
+            client_dir / "r_client_stubs.R",
+        ]
+
+        # Ensure /tmp exists
+        os.makedirs("/tmp", exist_ok=True)
+
+        # Copy each file
+        for src in r_files:
+            dst = Path("/tmp") / src.name
+            shutil.copy(src, dst)
+
+    def _runs_in_process(self, action_name):
+        """
+        Returns True if the action's Python function runs inside this process
+        """
+        return bool(self.faasr['ActionList'][action_name].get("InProcess", False))
 
     def _make_done(self, action_name):
         """
@@ -156,41 +237,154 @@ class Executor:
         Arguments:
             action_name: str -- name of the action to run
         """
-        # install dependencies for function
-        logger.debug("Starting dependency install")
         action = self.faasr['ActionList'][action_name]
-        faasr_func_dependancy_install(self.faasr, action)
-        logger.debug("Finished installing dependencies")
 
-        # Run function
+        succeeded = False
+        # in-process Python functions call the FaaSr API directly, without a server
+        use_server = not (
+            action['Type'] == "Python" and self._runs_in_process(action_name)
+        )
         try:
-            self._host_server_api(start_time=start_time)
-            self._call(action_name)
-            function_result = self.get_function_return()
+            # the function code, its packages and the RPC server are independent,
+            # so they are set up concurrently
+            pipeline = StartupPipeline(name=f"{action_name} startup")
+            if use_server:
+                # fork the server before the pipeline starts any threads
+                wait_for_server = self._spawn_server(
+                    start_time=start_time, action_name=action_name
+                )
+                if wait_for_server is not None:
+                    pipeline.add("rpc_server", wait_for_server)
+            pipeline.add(
+                "fetch_code", lambda: faasr_fetch_function_code(self.faasr, action)
+            )
+            pipeline.add(
+                "install_packages", lambda: faasr_install_packages(self.faasr, action)
+            )
+            logger.debug("Starting dependency install")
+            pipeline.run()
+            logger.debug("Finished installing dependencies")
+
+            # Run function
+            if use_server:
+                self._call(action_name)
+                function_result = self.get_function_return()
+            else:
+                function_result = self._call(action_name)
+            succeeded = True
         except Exception as e:
             if isinstance(e, SystemExit):
                 raise
             logger.exception(e, stack_info=True)
             sys.exit(1)
         finally:
-            # Clean up server
-            self.terminate_server()
+            # Clean up server (a server that saw a failed action is never reused)
+            if use_server and not (self.keep_server and succeeded):
+                self.terminate_server()
         return function_result
 
-    def _host_server_api(self, start_time, port=8000):
+    def _host_server_api(self, start_time, port=0, action_name=None):
         """
-        Starts RPC server for serverside API
+        Starts RPC server for serverside API, or hands the current
+        payload to the running server if keep_server is set
 
         Arguments:
-            port: int -- port to run the server on
+            start_time: timestamp from start of FaaSr action
+            port: int -- port to run the server on (0 picks a free port,
+            so that several actions can run on the same host)
+            action_name: str | None -- action the server is started for
+        """
+        wait_for_server = self._spawn_server(start_time, port, action_name)
+        if wait_for_server is not None:
+            wait_for_server()
+
+    def _spawn_server(self, start_time, port=0, action_name=None):
+        """
+        Starts the RPC server process without waiting for it to be ready
+        (or hands the current payload to the running server if keep_server is set)
+
+        Arguments:
+            start_time: timestamp from start of FaaSr action
+            port: int -- port to run the server on (0 picks a free port)
+            action_name: str | None -- action the server is started for
+        Returns:
+            callable | None -- waits until the new server is ready,
+            or None if a running server was reused
         """
-        logger.info(f"Starting server on localhost port {port}")
+        socket_path = self._get_socket_path(action_name)
+
+        if self.keep_server and self.server is not None and self.server.is_alive():
+            if socket_path == self.socket_path:
+                logger.info("Reusing RPC server")
+                self._reset_server()
+                return None
+            # transport changed
+            self.terminate_server()
+
+        # fastapi/uvicorn are only loaded once an action needs the server
+        from FaaSr_py.server.faasr_server import run_server, wait_for_server_start
+
+        self.socket_path = socket_path
+        if socket_path:
+            logger.info(f"Starting server on unix domain socket {socket_path}")
+        else:
+            logger.info("Starting server on localhost")
         # flush s3 log since server process will be logging
         flush_s3_log()
-        self.server = Process(target=run_server, args=(self.faasr, port, start_time))
+        ready_recv, ready_send = Pipe(duplex=False)
+        self.server = Process(
+            target=run_server,
+            args=(self.faasr, port, start_time, ready_send, socket_path),
+            daemon=True,
+        )
         self.server.start()
-        logger.debug("Polling localhost")
-        wait_for_server_start(port)
+        ready_send.close()
+
+        def wait_for_server():
+            logger.debug("Waiting for server to signal readiness")
+            try:
+                self.port = wait_for_server_start(
+                    port, ready_conn=ready_recv, socket_path=socket_path
+                )
+            finally:
+                ready_recv.close()
+            if self.port:
+                logger.info(f"Server listening on localhost port {self.port}")
+            self.rpc_client = RPCClient(port=self.port, socket_path=socket_path)
+
+        return wait_for_server
+
+    def _get_socket_path(self, action_name):
+        """
+        Returns the unix domain socket to serve the action on (None for TCP)
+        """
+        if not self.use_uds or action_name is None:
+            return None
+        if self.socket_path:
+            return self.socket_path
+        return f"/tmp/faasr-rpc-{uuid.uuid4().hex}.sock"
+
+    def _rpc_env(self):
+        """
+        Returns environment variables telling the user process where the RPC server is
+        """
+        if self.socket_path:
+            return {RPC_SOCKET_ENV: self.socket_path}
+        return {RPC_PORT_ENV: str(self.port)}
+
+    def _reset_server(self):
+        """
+        Swaps the payload of a running server to the current action
+        """
+        # flush s3 log since the server will be logging for the new action
+        flush_s3_log()
+        reset_json = {
+            "BaseWorkflow": self.faasr.base_workflow,
+            "Overwritten": self.faasr.overwritten,
+        }
+        response = self.rpc_client.post("/faasr-reset", reset_json)
+        if not response.get("Success", False):
+            raise RuntimeError("failed to hand payload to running RPC server")
 
     def terminate_server(self):
         """
@@ -198,11 +392,33 @@ class Executor:
         """
         if isinstance(self.server, Process):
             self.server.terminate()
+            self.server.join()
+            self.server = None
+            if self.rpc_client is not None:
+                self.rpc_client.close()
+                self.rpc_client = None
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.socket_path = None
+            self.port = None
         else:
             err_msg = "Tried to terminate server, but no server running"
             logger.error(err_msg)
             sys.exit(1)
 
+    def close(self):
+        """
+        Shuts down any server kept alive with keep_server and the warm workers
+        """
+        if self.server is not None:
+            self.terminate_server()
+        if self.warm_worker is not None:
+            self.warm_worker.close()
+            self.warm_worker = None
+        if self.r_worker is not None:
+            self.r_worker.close()
+            self.r_worker = None
+
     def _get_user_function_args(self, action_name):
         """
         Returns user function arguments
@@ -216,19 +432,15 @@ class Executor:
         else:
             return args
 
-    def get_function_return(self, port=8000):
+    def get_function_return(self):
         """
         Get user function result
 
-        Arguments:
-            port: int -- port to get the function result from
-
         Returns:
             result: bool | None
         """
         try:
-            return_response = requests.get(f"http://127.0.0.1:{port}/faasr-get-return")
-            return_val = return_response.json()
+            return_val = self.rpc_client.get("/faasr-get-return")
         except Exception:
             err_msg = "Error getting function result"
             logger.exception(err_msg, stack_info=True)
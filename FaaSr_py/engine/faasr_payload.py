@@ -5,17 +5,25 @@ import random
 import sys
 import uuid
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-import boto3
-
 from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.engine.startup_pipeline import StartupPipeline
 from FaaSr_py.helpers.faasr_lock import faasr_acquire, faasr_release
 from FaaSr_py.helpers.faasr_start_invoke_helper import faasr_get_github_raw
-from FaaSr_py.helpers.graph_functions import check_dag, validate_json
+from FaaSr_py.helpers.graph_functions import SCHEMA_STAMP_FIELD, validate_json
 from FaaSr_py.helpers.s3_helper_functions import (get_default_log_boto3_client,
                                                   get_invocation_folder,
                                                   get_logging_server)
+from FaaSr_py.helpers.trigger_payload import (MERGE_FIELD,
+                                              decode_trigger_payload,
+                                              merge_trigger_payload)
+from FaaSr_py.helpers.workflow_plan import PLAN_FIELD, PLAN_FILE, WorkflowPlan
+from FaaSr_py.helpers.workflow_snapshot import (SNAPSHOT_FIELD, SNAPSHOT_FILE,
+                                                get_snapshot_datastore,
+                                                pin_workflow_path,
+                                                read_snapshot, write_snapshot)
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +38,10 @@ class FaaSrPayload:
     Top level changes (e.g. faasr_obj['FunctionInvoke'] = some_func)
     are tracked in self.overwritten and the scheduler will
     propgates these changes to the next functions in the workflow
+
+    The first action pins the workflow to a commit and stores a snapshot of it
+    in the logging data store; the actions triggered next read the snapshot
+    (once their secrets are known) instead of fetching the workflow from GitHub
     """
 
     def __init__(self, url, overwritten=None, token=None):
@@ -38,32 +50,133 @@ class FaaSrPayload:
         if token is None:
             token = os.getenv("TOKEN")
 
+        # fields holding only the entries that differ from the base workflow's,
+        # completed once it is loaded
+        self._merged = []
         if overwritten is None:
             self._overwritten = None
         else:
-            self._overwritten = overwritten
+            # compact payloads from Scheduler are decoded here
+            self._overwritten = decode_trigger_payload(overwritten)
+            self._merged = self._overwritten.pop(MERGE_FIELD, [])
+
+        self._token = token
+        self._secrets = None
+        self._base = None
+        # workflow JSON as fetched, without secrets
+        self._raw_workflow = None
+        self._raw_base = None
+        # plan of the workflow, once built or loaded
+        self._plan = None
+
+        if self.get_overwritten(SNAPSHOT_FIELD) is None:
+            # every action of the invocation uses this version of the workflow
+            self.url = pin_workflow_path(url, token)
+            self._fetch_workflow()
+        else:
+            # the snapshot is read when the workflow is first used
+            self.url = url
+
+    @property
+    def _base_workflow(self):
+        if self._base is None:
+            self._load_snapshot()
+        return self._base
+
+    @_base_workflow.setter
+    def _base_workflow(self, workflow):
+        self._base = workflow
+
+    @property
+    def raw_workflow(self):
+        """
+        Base workflow as fetched, without secrets (None if not known)
+        """
+        if self._raw_base is None and self._raw_workflow is not None:
+            self._raw_base = json.loads(self._raw_workflow)
+        return self._raw_base
 
-        self.url = url
+    def get_overwritten(self, key):
+        """
+        Returns an overwritten field without loading the base workflow
+        (a map listed in MERGE_FIELD only holds its changed entries)
+        """
+        return (self._overwritten or {}).get(key)
 
-        logger.debug("Fetching workflow from GitHub URL: {url}")
+    def _fetch_workflow(self):
+        """
+        Fetches the workflow from GitHub and validates it
+        """
+        logger.debug(f"Fetching workflow from GitHub URL: {self.url}")
         # fetch payload from gh
-        raw_payload = faasr_get_github_raw(token=token, path=url)
-        self._base_workflow = json.loads(raw_payload)
+        self._raw_workflow = faasr_get_github_raw(token=self._token, path=self.url)
+        self._base = json.loads(self._raw_workflow)
+        self._validate()
+        self._merge()
+
+    def _load_snapshot(self):
+        """
+        Reads the workflow from the snapshot taken by the first action,
+        fetching it from GitHub if the snapshot can't be read
+        """
+        snapshot = self.get_overwritten(SNAPSHOT_FIELD)
+        datastore = get_snapshot_datastore(snapshot, self._overwritten, self._secrets)
+        result = None
+        if datastore is not None:
+            result = read_snapshot(datastore, snapshot['Key'], snapshot['Hash'])
+        if result is None:
+            logger.info("Workflow snapshot unavailable -- fetching from GitHub")
+            self._fetch_workflow()
+            return
+        logger.debug(f"Read workflow snapshot {snapshot['Key']}")
+        self._raw_workflow, self._base = result
+        self._validate()
+        self._merge()
 
+    def _merge(self):
+        """
+        Completes the maps sent with only their changed entries. The entries
+        taken from the base workflow are shared with it, so secrets
+        replaced in the base workflow are also replaced in them
+        """
+        if self._merged:
+            merge_trigger_payload(self._overwritten, self._base, self._merged)
+            self._merged = []
+
+    def load_plan(self):
+        """
+        Reads the workflow plan stored by the first action
+
+        Returns:
+            WorkflowPlan | None -- the plan, or None if it can't be read
+        """
+        location = self.get_overwritten(PLAN_FIELD)
+        if not location:
+            return None
+        datastore = get_snapshot_datastore(location, self._overwritten, self._secrets)
+        if datastore is None:
+            return None
+        return WorkflowPlan.read(datastore, location['Key'], location['Hash'])
+
+    def _validate(self):
+        """
+        Validates the base workflow against the schema
+        (stamping it, so that the next actions skip validating it again)
+        """
         # validate payload against schema
         if global_config.SKIP_SCHEMA_VALIDATE:
             logger.info("SKIPPING SCHEMA VALIDATION")
-        elif validate_json(self._base_workflow):
-            pass
         else:
-            raise ValueError("Payload validation error")
-
-        if self.get("FunctionRank"):
-            self.log_file = f"{self['FunctionInvoke']}({self['FunctionRank']}).txt"
-        else:
-            self.log_file = f"{self['FunctionInvoke']}.txt"
+            validated_hash = self.get_overwritten(SCHEMA_STAMP_FIELD)
+            validated_hash = validate_json(self._base, validated_hash)
+            if not validated_hash:
+                raise ValueError("Payload validation error")
+            if self._overwritten is not None:
+                self._overwritten[SCHEMA_STAMP_FIELD] = validated_hash
 
     def __getitem__(self, key):
+        if key in self._merged:
+            self._load_snapshot()
         if key in self._overwritten:
             return self._overwritten[key]
         elif key in self._base_workflow:
@@ -98,6 +211,8 @@ class FaaSrPayload:
             del self._overwritten[key]
 
     def get(self, key, default=None):
+        if key in self._merged:
+            self._load_snapshot()
         if key in self._overwritten:
             return self._overwritten[key]
         elif key in self._base_workflow:
@@ -106,12 +221,36 @@ class FaaSrPayload:
 
     @property
     def overwritten(self):
+        if self._merged:
+            self._load_snapshot()
         return self._overwritten
 
     @property
     def base_workflow(self):
         return self._base_workflow
 
+    @property
+    def log_file(self):
+        """
+        Name of the log file for the current action (and rank)
+        """
+        if self.get("FunctionRank"):
+            return f"{self['FunctionInvoke']}({self['FunctionRank']}).txt"
+        return f"{self['FunctionInvoke']}.txt"
+
+    def load_state(self, base_workflow, overwritten):
+        """
+        Replaces the workflow held by this payload; used to hand
+        a new action to a long-lived process such as the RPC server
+
+        Arguments:
+            base_workflow: dict -- base workflow
+            overwritten: dict -- overwritten fields
+        """
+        self._base_workflow = base_workflow
+        self._overwritten = overwritten if overwritten is not None else {}
+        self._merged = []
+
     def get_complete_workflow(self):
         temp_dict = self._base_workflow.copy()
         for key, val in self._overwritten.items():
@@ -126,6 +265,8 @@ class FaaSrPayload:
         Arguments:
             secrets: dict -- dictionary of secrets to replace in the payload
         """
+        # needed to read the workflow snapshot
+        self._secrets = secrets
 
         def recursive_replace(payload):
             for name in payload:
@@ -145,6 +286,7 @@ class FaaSrPayload:
             "FunctionCRANPackage",
             "FunctionGitHubPackage",
             "PyPIPackageDownloads",
+            "PythonCondaPackage",
             "PackageImports",
         ]
 
@@ -156,42 +298,56 @@ class FaaSrPayload:
         """
         # Iterate through all of the data stores
         for server in self['DataStores'].keys():
-            # Get the endpoint and region
-            server_endpoint = self['DataStores'][server].get("Endpoint")
-            server_region = self['DataStores'][server]['Region']
-            # Ensure that endpoint is a valid http address
-            if server_endpoint and not server_endpoint.startswith("http"):
-                error_message = f"Invalid data store server endpoint {server}"
-                logger.error(error_message)
-                sys.exit(1)
+            self.s3_check_server(server)
 
-            # If the region is empty, then use defualt 'us-east-1'
-            if not server_region:
-                self['DataStores'][server]['Region'] = "us-east-1"
-
-            if server_endpoint:
-                s3_client = boto3.client(
-                    "s3",
-                    aws_access_key_id=self['DataStores'][server]['AccessKey'],
-                    aws_secret_access_key=self['DataStores'][server]['SecretKey'],
-                    region_name=server_region,
-                    endpoint_url=server_endpoint,
-                )
-            else:
-                s3_client = boto3.client(
-                    "s3",
-                    aws_access_key_id=self['DataStores'][server]['AccessKey'],
-                    aws_secret_access_key=self['DataStores'][server]['SecretKey'],
-                    region_name=server_region,
-                )
-            # Use boto3 head bucket to ensure that the
-            # bucket exists and that we have acces to it
-            try:
-                s3_client.head_bucket(Bucket=self['DataStores'][server]['Bucket'])
-            except Exception as e:
-                err_message = f"S3 server {server} failed with message: {e}"
-                logger.exception(err_message, stack_info=True)
-                sys.exit(1)
+    def s3_check_server(self, server):
+        """
+        Ensures that an S3 data store is valid and reachable
+        (safe to call for several data stores at once)
+
+        Arguments:
+            server: str -- name of the data store
+        """
+        import boto3
+
+        # Get the endpoint and region
+        server_endpoint = self['DataStores'][server].get("Endpoint")
+        server_region = self['DataStores'][server]['Region']
+        # Ensure that endpoint is a valid http address
+        if server_endpoint and not server_endpoint.startswith("http"):
+            error_message = f"Invalid data store server endpoint {server}"
+            logger.error(error_message)
+            sys.exit(1)
+
+        # If the region is empty, then use defualt 'us-east-1'
+        if not server_region:
+            self['DataStores'][server]['Region'] = "us-east-1"
+
+        # boto3.client() shares the default session, which is not thread-safe
+        session = boto3.session.Session()
+        if server_endpoint:
+            s3_client = session.client(
+                "s3",
+                aws_access_key_id=self['DataStores'][server]['AccessKey'],
+                aws_secret_access_key=self['DataStores'][server]['SecretKey'],
+                region_name=server_region,
+                endpoint_url=server_endpoint,
+            )
+        else:
+            s3_client = session.client(
+                "s3",
+                aws_access_key_id=self['DataStores'][server]['AccessKey'],
+                aws_secret_access_key=self['DataStores'][server]['SecretKey'],
+                region_name=server_region,
+            )
+        # Use boto3 head bucket to ensure that the
+        # bucket exists and that we have acces to it
+        try:
+            s3_client.head_bucket(Bucket=self['DataStores'][server]['Bucket'])
+        except Exception as e:
+            err_message = f"S3 server {server} failed with message: {e}"
+            logger.exception(err_message, stack_info=True)
+            sys.exit(1)
 
     def _generate_invocation_timestamp(self):
         """
@@ -294,6 +450,56 @@ class FaaSrPayload:
                 logger.error(err_msg)
                 sys.exit(1)
 
+            self._store_snapshot(target_s3, log_folder)
+            self._store_plan(target_s3, log_folder)
+
+    def _store_snapshot(self, target_s3, log_folder):
+        """
+        Stores the workflow (without secrets) in the invocation's log folder
+        and tells the next actions where to read it
+
+        Arguments:
+            target_s3: str -- name of the logging data store
+            log_folder: Path -- invocation's log folder
+        """
+        if self._raw_workflow is None:
+            return
+        key = f"{log_folder}/{SNAPSHOT_FILE}"
+        workflow_hash = write_snapshot(
+            self['DataStores'][target_s3], key, self._raw_workflow
+        )
+        if workflow_hash is None:
+            return
+        self[SNAPSHOT_FIELD] = {
+            "Key": key,
+            "Hash": workflow_hash,
+            "DataStore": target_s3,
+            # as in the workflow file: secrets are only named
+            "Config": json.loads(self._raw_workflow)['DataStores'][target_s3],
+        }
+
+    def _store_plan(self, target_s3, log_folder):
+        """
+        Stores the workflow plan in the invocation's log folder
+        and tells the next actions where to read it
+
+        Arguments:
+            target_s3: str -- name of the logging data store
+            log_folder: Path -- invocation's log folder
+        """
+        if self._plan is None or self.raw_workflow is None:
+            return
+        key = f"{log_folder}/{PLAN_FILE}"
+        if not self._plan.write(self['DataStores'][target_s3], key):
+            return
+        self[PLAN_FIELD] = {
+            "Key": key,
+            "Hash": self._plan.hash,
+            "DataStore": target_s3,
+            # as in the workflow file: secrets are only named
+            "Config": self.raw_workflow['DataStores'][target_s3],
+        }
+
     def abort_on_multiple_invocations(self, pre: dict):
         """
         Invoked when the current function has multiple predecessors
@@ -430,18 +636,48 @@ class FaaSrPayload:
             sys.exit(0)
 
     def start(self):
+        # The DAG check and the check of each S3 data store are independent,
+        # so they run concurrently; the fan-in checks run once all have passed
+        pipeline = StartupPipeline(name="workflow validation")
+
         # Verifies that the faasr payload is a DAG, meaning that there is no cycles
         # If the payload is a DAG, then
         # this function returns a predecessor list for the workflow
         # If the payload is not a DAG, then the action aborts
-        pre = check_dag(self)
+        # (actions after the first load the validated plan passed on to them)
+        pipeline.add("check_dag", self._get_predecessors)
 
         # Verfies the validity of S3 data stores,
         # checking the server status and ensuring that the specified bucket exists
         # If any of the S3 endpoints are invalid
         # or any data store server are unreachable, the action aborts
-        self.s3_check()
+        s3_checks = []
+        for server in self['DataStores'].keys():
+            s3_checks.append(f"s3_check:{server}")
+            pipeline.add(s3_checks[-1], partial(self.s3_check_server, server))
+
+        pipeline.add(
+            "fan_in",
+            lambda: self._check_predecessors(pipeline.results["check_dag"]),
+            after=["check_dag", *s3_checks],
+        )
+        pipeline.run()
+
+    def _get_predecessors(self):
+        """
+        Returns the actions the current action waits for, from the workflow plan
+        """
+        self._plan = WorkflowPlan.for_payload(self)
+        return self._plan.real_predecessors(self["FunctionInvoke"])
 
+    def _check_predecessors(self, pre):
+        """
+        Initializes the log for the first action, or makes sure that only the
+        last invocation of an action with several predecessors runs
+
+        Arguments:
+            pre: dict -- predecessors of each action
+        """
         # Initialize log if this is the first action in the workflow
         if len(pre) == 0:
             self.init_log_folder()
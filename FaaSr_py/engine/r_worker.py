@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait for a new R session to load its packages and connect
+R_WORKER_START_TIMEOUT = 60
+
+
+class RWorker:
+    """
+    Persistent R session for R actions
+
+    Instead of one Rscript process per action, r_worker.R is started once and
+    connects back to a localhost socket; each action (or rank) is sent to it as
+    a JSON line. httr, jsonlite and the packages loaded by earlier actions stay
+    loaded, so only the first action pays R's startup cost
+    """
+
+    def __init__(self, cwd="/tmp", timeout=R_WORKER_START_TIMEOUT):
+        """
+        Arguments:
+            cwd: str -- directory holding r_worker.R and the R client files
+            timeout: int -- seconds to wait for the session to connect
+        """
+        start = time.perf_counter()
+        listener = socket.create_server(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        self._process = subprocess.Popen(
+            ["Rscript", "r_worker.R", str(port)], cwd=cwd, env=dict(os.environ)
+        )
+        try:
+            conn = self._accept(listener, timeout)
+        except BaseException:
+            self._process.kill()
+            self._process.wait()
+            raise
+        finally:
+            listener.close()
+        self._file = conn.makefile("rw", encoding="utf-8", newline="\n")
+        conn.close()
+        # seconds the session took to start (saved by every later action)
+        self.start_time = time.perf_counter() - start
+        self.runs = 0
+        logger.info(f"Started R worker in {self.start_time:.3f}s")
+
+    def _accept(self, listener, timeout):
+        """
+        Waits for the R session to connect, failing early if it exits
+        """
+        listener.settimeout(0.5)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn, _ = listener.accept()
+                conn.settimeout(None)
+                return conn
+            except socket.timeout:
+                pass
+            if self._process.poll() is not None:
+                raise RuntimeError(
+                    f"R worker exited with code {self._process.returncode} on startup"
+                )
+            if time.monotonic() > deadline:
+                raise RuntimeError("timed out waiting for R worker to start")
+
+    def is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def run(self, faasr, func_name, args, rpc_env=None):
+        """
+        Runs an R user function in the session
+
+        Arguments:
+            faasr: FaaSrPayload -- payload of the action to run
+            func_name: str -- name of the function
+            args: dict -- arguments for the function
+            rpc_env: dict | None -- environment variables locating the RPC server
+        Returns:
+            int -- exit code of the action
+        """
+        request = {
+            "FuncName": func_name,
+            # decoded with fromJSON like the command-line arguments of an Rscript
+            "Args": json.dumps(args),
+            "InvocationID": faasr['InvocationID'],
+            "RPCEnv": rpc_env or {},
+        }
+        try:
+            self._file.write(json.dumps(request) + "\n")
+            self._file.flush()
+            reply = self._file.readline()
+        except OSError:
+            reply = ""
+        if not reply:
+            self.close()
+            raise RuntimeError("R worker exited unexpectedly")
+
+        self.runs += 1
+        if self.runs > 1:
+            logger.info(f"R worker saved {self.start_time:.3f}s of R startup")
+        return json.loads(reply)["ExitCode"]
+
+    def close(self):
+        """
+        Stops the R session and reports the startup time saved
+        """
+        if self._process is None:
+            return
+        try:
+            # the session exits when the connection closes
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+        logger.info(
+            f"R worker ran {self.runs} actions, "
+            f"saving {self.start_time * max(self.runs - 1, 0):.3f}s of R startup"
+        )
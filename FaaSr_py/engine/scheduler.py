@@ -1,14 +1,18 @@
 import json
 import logging
 import os
-import re
 import sys
 
-import boto3
 import requests
 
 from FaaSr_py.config.debug_config import global_config
 from FaaSr_py.engine.faasr_payload import FaaSrPayload
+from FaaSr_py.helpers.canonical_json import canonical_dumps
+from FaaSr_py.helpers.github_client import get_github_client
+from FaaSr_py.helpers.graph_functions import extract_rank
+from FaaSr_py.helpers.trigger_payload import (COMPRESSION_FIELD,
+                                              encode_trigger_payload)
+from FaaSr_py.helpers.workflow_plan import WorkflowPlan
 
 logger = logging.getLogger(__name__)
 
@@ -33,50 +37,41 @@ class Scheduler:
             return_val: any -- value returned by the user function, used for conditionals
         """
         # Get a list of the next functions to invoke
+        # (InvokeNext was parsed once, into the workflow plan)
         curr_func = self.faasr['FunctionInvoke']
-        invoke_next = self.faasr['ActionList'][curr_func]['InvokeNext']
-        if not isinstance(invoke_next, list):
-            invoke_next = [invoke_next]
-
-        # If there is no more triggers, then return
-        if not invoke_next:
-            msg = f"no triggers for {curr_func}"
-            logger.info(msg)
-            return
+        plan = WorkflowPlan.for_payload(self.faasr, verify=False)
 
         # Ensure that function returned a value if conditionals are present
-        if contains_dict(invoke_next) and return_val is None:
+        if plan.has_conditionals(curr_func) and return_val is None:
             err_msg = (
                 "InvokeNext contains conditionals but function did not return a value"
             )
             logger.error(err_msg)
             sys.exit(1)
 
-        for next_trigger in invoke_next:
-            if isinstance(next_trigger, dict):
-                conditional_invoke_next = next_trigger.get(str(return_val))
-                if isinstance(conditional_invoke_next, str):
-                    self.trigger_func(workflow_name, conditional_invoke_next)
-                else:
-                    for func in conditional_invoke_next:
-                        self.trigger_func(workflow_name, func)
-            else:
-                self.trigger_func(workflow_name, next_trigger)
+        next_actions = plan.next_actions(curr_func, return_val)
 
-    def trigger_func(self, workflow_name, function):
+        # If there is no more triggers, then return
+        if not next_actions:
+            msg = f"no triggers for {curr_func}"
+            logger.info(msg)
+            return
+
+        for function, rank_num in next_actions:
+            self.trigger_func(workflow_name, function, rank_num)
+
+    def trigger_func(self, workflow_name, function, rank_num=None):
         """
         Handles a single trigger
 
         Arguments:
             function: str -- name of the function to trigger
+            rank_num: int | None -- rank of the function
+            (if None, it is parsed from the name, e.g. func(3))
         """
         # Split function name and rank if needed
-        parts = re.split(r"[()]", function)
-        if len(parts) > 1:
-            function = parts[0]
-            rank_num = int(parts[1])
-        else:
-            rank_num = 1
+        if rank_num is None:
+            function, rank_num = extract_rank(function)
 
         self.faasr['FunctionInvoke'] = function
         next_server = self.faasr['ActionList'][function]['FaaSServer']
@@ -126,6 +121,40 @@ class Scheduler:
                     msg += f".{rank}"
                 logger.info(msg)
 
+    def _build_overwritten(self, next_compute_server, include_secrets=None):
+        """
+        Builds the OVERWRITTEN payload for the next action, without changing
+        the overwritten fields of the current one
+
+        Only the fields that differ from the base workflow are sent (the next
+        action loads the same base workflow), compressed if the workflow sets
+        CompressTriggerPayload
+
+        Arguments:
+            next_compute_server: dict -- next compute server configuration
+            include_secrets: bool | None -- send the compute servers & data stores
+            that contain secrets (by default, unless the next server uses a
+            secret store)
+        Returns:
+            dict -- OVERWRITTEN payload
+        """
+        overwritten_fields = dict(self.faasr.overwritten)
+
+        if include_secrets is None:
+            include_secrets = not next_compute_server.get("UseSecretStore")
+        if include_secrets:
+            overwritten_fields['ComputeServers'] = self.faasr['ComputeServers']
+            overwritten_fields['DataStores'] = self.faasr['DataStores']
+        else:
+            overwritten_fields.pop("ComputeServers", None)
+            overwritten_fields.pop("DataStores", None)
+
+        return encode_trigger_payload(
+            overwritten_fields,
+            self.faasr.raw_workflow,
+            self.faasr.get(COMPRESSION_FIELD, False),
+        )
+
     def invoke_gh(self, next_compute_server, function, workflow_name=None):
         """
         Trigger GH function
@@ -150,21 +179,7 @@ class Scheduler:
         git_ref = next_compute_server['Branch']
 
         # Create payload input
-        overwritten_fields = self.faasr.overwritten
-
-        # If UseSecretStore == True, don't send secrets to next action
-        # Otherwise, we should send the compute servers & data stores
-        # that contain secrets via overwritten
-        if next_compute_server.get("UseSecretStore"):
-            if "ComputeServers" in overwritten_fields:
-                del overwritten_fields['ComputeServers']
-            if "DataStores" in overwritten_fields:
-                del overwritten_fields['DataStores']
-        else:
-            overwritten_fields['ComputeServers'] = self.faasr['ComputeServers']
-            overwritten_fields['DataStores'] = self.faasr['DataStores']
-
-        json_overwritten = json.dumps(overwritten_fields)
+        json_overwritten = canonical_dumps(self._build_overwritten(next_compute_server))
 
         inputs = {
             "OVERWRITTEN": json_overwritten,
@@ -172,24 +187,13 @@ class Scheduler:
         }
 
         # Create url for GitHub API
-        url = (
-            f"https://api.github.com/repos/"
-            f"{repo}/actions/workflows/"
-            f"{workflow_file}/dispatches"
-        )
+        url = f"/repos/{repo}/actions/workflows/{workflow_file}/dispatches"
 
         # Create body for POST request
         body = {"ref": git_ref, "inputs": inputs}
 
-        # Create headers for POST request
-        post_headers = {
-            "Authorization": f"token {pat}",
-            "Accept": "application/vnd.github.v3+json",
-            "X-GitHub-Api-Version": "2022-11-28",
-        }
-
-        # Issue POST request
-        response = requests.post(url=url, json=body, headers=post_headers)
+        # Issue POST request (shared client: pooled and rate-limit aware)
+        response = get_github_client().post(url, token=pat, json=body)
 
         # Log response
         if response.status_code == 204:
@@ -247,6 +251,8 @@ class Scheduler:
             function = f"{workflow_name}-{function}"
             logger.debug(f"Prepending workflow name. Full function: {function}")
 
+        import boto3
+
         # Create client for invoking lambda function
         lambda_client = boto3.client(
             "lambda",
@@ -257,21 +263,11 @@ class Scheduler:
 
         # Invoke lambda function
 
-        overwritten_fields = self.faasr.overwritten
-
-        # Don't send secrets to next action if UseSecretStore is set
-        if next_compute_server.get("UseSecretStore"):
-            if "ComputeServers" in overwritten_fields:
-                del overwritten_fields['ComputeServers']
-            if "DataStores" in overwritten_fields:
-                del overwritten_fields['DataStores']
-        else:
-            overwritten_fields['ComputeServers'] = self.faasr['ComputeServers']
-            overwritten_fields['DataStores'] = self.faasr['DataStores']
+        overwritten_fields = self._build_overwritten(next_compute_server)
 
         try:
             payload = {
-                "OVERWRITTEN": json.dumps(overwritten_fields),
+                "OVERWRITTEN": canonical_dumps(overwritten_fields),
                 "PAYLOAD_URL": self.faasr.url,
             }
 
@@ -342,10 +338,9 @@ class Scheduler:
         # Create headers for POST
         headers = {"accept": "application/json", "Content-Type": "application/json"}
 
-        overwritten_fields = self.faasr.overwritten
-
-        overwritten_fields['ComputeServers'] = self.faasr['ComputeServers']
-        overwritten_fields['DataStores'] = self.faasr['DataStores']
+        overwritten_fields = self._build_overwritten(
+            next_compute_server, include_secrets=True
+        )
 
         payload_dict = {
             "OVERWRITTEN": overwritten_fields,
@@ -437,31 +432,20 @@ class Scheduler:
             sys.exit(1)
 
         # Create overwritten fields for the next action (following GitHub Actions pattern)
-        overwritten_fields = self.faasr.overwritten.copy()
-
         if next_compute_server.get("UseSecretStore"):
-            # Next action will fetch secrets from its own secret store
-            # Remove secrets from overwritten fields
-            if "ComputeServers" in overwritten_fields:
-                del overwritten_fields['ComputeServers']
-            if "DataStores" in overwritten_fields:
-                del overwritten_fields['DataStores']
             logger.info(
                 "Next SLURM action will use secret store. Secrets not included in payload"
             )
         else:
-            # Next action expects secrets in payload
-            # Include full ComputeServers and DataStores with secrets
-            overwritten_fields['ComputeServers'] = self.faasr['ComputeServers']
-            overwritten_fields['DataStores'] = self.faasr['DataStores']
             logger.info(
                 "Next SLURM action expects secrets in payload - including credentials"
             )
+        overwritten_fields = self._build_overwritten(next_compute_server)
 
         # Prepare environment variables for SLURM job
         environment_vars = {
             "PAYLOAD_URL": self.faasr.url,  # URL to GitHub-hosted workflow JSON
-            "OVERWRITTEN": json.dumps(overwritten_fields, separators=(",", ":")),
+            "OVERWRITTEN": canonical_dumps(overwritten_fields),
         }
 
         # Create job script
@@ -594,45 +578,11 @@ class Scheduler:
         job_url = f"{endpoint}{namespace}/locations/{region}/jobs/{function}:run"
 
         # Build overwritten fields - matching GitHub Actions pattern
-        overwritten = {}
-        overwritten['FunctionInvoke'] = function
-
-        # Add InvocationID if present
-        if self.faasr.get("InvocationID"):
-            overwritten['InvocationID'] = self.faasr['InvocationID']
-
-        # Add InvocationTimestamp if present
-        if self.faasr.get("InvocationTimestamp"):
-            overwritten['InvocationTimestamp'] = self.faasr['InvocationTimestamp']
-
-        # Add FunctionResult if present
-        if self.faasr.get("FunctionResult"):
-            overwritten['FunctionResult'] = self.faasr['FunctionResult']
-
-        # Handle FunctionRank if it exists (for ranked invocations)
-        if self.faasr.get("FunctionRank"):
-            overwritten['FunctionRank'] = self.faasr['FunctionRank']
-
-        # Handle UseSecretStore=False case
+        # (credentials are only sent without a secret store)
         use_secret_store = next_compute_server.get("UseSecretStore", True)
-        if not use_secret_store:
-            # Include credentials in overwritten
-            if "ComputeServers" not in overwritten:
-                overwritten['ComputeServers'] = {}
-
-            # Get the server name by finding which server matches this config
-            server_name = None
-            for name, config in self.faasr['ComputeServers'].items():
-                if config == next_compute_server:
-                    server_name = name
-                    break
-
-            if server_name:
-                overwritten['ComputeServers'][server_name] = {
-                    "ClientEmail": next_compute_server.get("ClientEmail"),
-                    "SecretKey": next_compute_server.get("SecretKey"),
-                    "TokenUri": next_compute_server.get("TokenUri"),
-                }
+        overwritten = self._build_overwritten(
+            next_compute_server, include_secrets=not use_secret_store
+        )
 
         # Refresh access token
         try:
@@ -653,7 +603,7 @@ class Scheduler:
             sys.exit(1)
 
         # Create environment variables exactly like GitHub Actions
-        json_overwritten = json.dumps(overwritten)
+        json_overwritten = canonical_dumps(overwritten)
 
         # Define environment variables
         env_vars = [
@@ -707,16 +657,3 @@ class Scheduler:
         except Exception as e:
             logger.exception(f"GoogleCloud: Request failed: {e}")
             sys.exit(1)
-
-
-def contains_dict(list_obj):
-    """
-    Returns true if list contains dict
-    """
-    if not isinstance(list_obj, list):
-        return False
-
-    for element in list_obj:
-        if isinstance(element, dict):
-            return True
-    return False
@@ -0,0 +1,120 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class StartupPipeline:
+    """
+    Runs the phases of an action's startup concurrently
+
+    A phase starts as soon as the phases it depends on have finished, so startup
+    takes as long as its slowest chain of phases rather than the sum of all of
+    them. Every phase is timed so that this critical path can be reported
+    """
+
+    def __init__(self, name="startup"):
+        """
+        Arguments:
+            name: str -- name of the pipeline (used in logs)
+        """
+        self.name = name
+        self._phases = {}
+        # phase name -> result, filled in as phases finish
+        self.results = {}
+        # phase name -> (start, end) in seconds since the pipeline started
+        self.timings = {}
+        self.elapsed = None
+
+    def add(self, name, func, after=()):
+        """
+        Adds a phase to the pipeline
+
+        Arguments:
+            name: str -- name of the phase
+            func: callable -- runs the phase; takes no arguments
+            after: iterable[str] -- phases that must finish before this one starts
+            (they must already have been added, so the phases can't form a cycle)
+        """
+        after = tuple(after)
+        for dep in after:
+            if dep not in self._phases:
+                raise ValueError(f"{name} depends on unknown phase {dep}")
+        self._phases[name] = (func, after)
+
+    def run(self):
+        """
+        Runs every phase, raising the first error (or SystemExit) of any phase
+
+        Returns:
+            dict -- result of each phase
+        """
+        start = time.perf_counter()
+        pending = dict(self._phases)
+        running = {}
+        with ThreadPoolExecutor(
+            max_workers=max(len(pending), 1), thread_name_prefix=f"faasr-{self.name}"
+        ) as pool:
+            try:
+                while pending or running:
+                    for name, (func, after) in list(pending.items()):
+                        if all(dep in self.results for dep in after):
+                            del pending[name]
+                            future = pool.submit(self._run_phase, name, func, start)
+                            running[future] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        self.results[name] = future.result()
+            finally:
+                # phases already running finish before the error is raised
+                for future in running:
+                    future.cancel()
+        self.elapsed = time.perf_counter() - start
+        self.log_timings()
+        return self.results
+
+    def _run_phase(self, name, func, start):
+        phase_start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.timings[name] = (phase_start - start, time.perf_counter() - start)
+
+    def critical_path(self):
+        """
+        Returns the chain of phases that determined the startup time: the phase
+        that finished last, the dependency it waited for last, and so on
+
+        Returns:
+            list[str] -- phase names, first to last
+        """
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda phase: self.timings[phase][1])
+        path = [name]
+        while True:
+            after = [dep for dep in self._phases[name][1] if dep in self.timings]
+            if not after:
+                break
+            name = max(after, key=lambda phase: self.timings[phase][1])
+            path.append(name)
+        return path[::-1]
+
+    def log_timings(self):
+        """
+        Logs the time each phase took and the critical path
+        """
+        for name, (phase_start, phase_end) in sorted(
+            self.timings.items(), key=lambda item: item[1][0]
+        ):
+            logger.debug(
+                f"{self.name} phase {name}: started at +{phase_start:.3f}s, "
+                f"took {phase_end - phase_start:.3f}s"
+            )
+        total = sum(end - begin for begin, end in self.timings.values())
+        logger.info(
+            f"{self.name} took {self.elapsed:.3f}s ({total:.3f}s of phases); "
+            f"critical path: {' -> '.join(self.critical_path())}"
+        )
@@ -0,0 +1,262 @@
+import importlib
+import logging
+import os
+import sys
+import time
+import traceback
+from multiprocessing import get_context
+
+from FaaSr_py.client.py_user_func_entry import (get_user_function,
+                                                run_py_function)
+from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.code_cache import COMMITS_FIELD
+
+logger = logging.getLogger(__name__)
+
+
+def get_package_imports(faasr, func_name):
+    """
+    Returns the modules a function declares in PackageImports, which maps
+    function names to a module name or a list of them
+    (e.g. {"my_func": ["numpy", "pandas"]})
+
+    Arguments:
+        faasr: FaaSrPayload -- workflow payload
+        func_name: str -- name of the function
+    Returns:
+        list[str] -- module names
+    """
+    package_imports = faasr.get("PackageImports") or {}
+    packages = package_imports.get(func_name) or []
+    if isinstance(packages, str):
+        packages = [packages]
+    return packages
+
+
+def get_code_version(faasr):
+    """
+    Returns what identifies the function code of a payload: the directory
+    it is fetched into and the commits its repos are pinned to
+
+    Arguments:
+        faasr: FaaSrPayload -- workflow payload
+    Returns:
+        (str, list) -- code directory and sorted (repo, commit) pairs
+    """
+    if global_config.USE_LOCAL_USER_FUNC:
+        code_dir = os.path.abspath(global_config.LOCAL_FUNCTION_PATH)
+    else:
+        code_dir = f"/tmp/functions/{faasr['InvocationID']}"
+    commits = sorted((faasr.get(COMMITS_FIELD) or {}).items())
+    return code_dir, commits
+
+
+class WarmWorker:
+    """
+    Forkserver-style template process for Python actions
+
+    The template imports a function's PackageImports and user module once;
+    every action (or rank) of that function then runs in a child forked
+    from the template, so it starts with everything already imported.
+    Each run carries this process's sys.path (which grows as environments
+    are installed) and the function code version; when either changes, the
+    template drops the old user modules and preloads again
+    """
+
+    def __init__(self, faasr):
+        """
+        Arguments:
+            faasr: FaaSrPayload -- payload the template starts with
+        """
+        ctx = get_context("fork")
+        self._conn, template_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_template_main, args=(template_conn, faasr), daemon=True
+        )
+        self._process.start()
+        template_conn.close()
+        # seconds each function's imports took in the template
+        self.import_times = {}
+        self.runs = {}
+
+    def run(self, faasr, func_name, args, rpc_env=None):
+        """
+        Runs a Python user function in a child of the template
+
+        Arguments:
+            faasr: FaaSrPayload -- payload of the action to run
+            func_name: str -- name of the function
+            args: dict -- arguments for the function
+            rpc_env: dict | None -- environment variables locating the RPC server
+        Returns:
+            int -- exit code of the child (negative if killed by a signal)
+        """
+        self._conn.send(
+            (
+                faasr.base_workflow,
+                faasr.overwritten,
+                func_name,
+                args,
+                rpc_env,
+                list(sys.path),
+                get_code_version(faasr),
+            )
+        )
+        try:
+            reply = self._conn.recv()
+        except EOFError:
+            raise RuntimeError("warm worker exited unexpectedly")
+
+        if reply["import_time"] is not None:
+            self.import_times[func_name] = reply["import_time"]
+            logger.info(
+                f"Warm worker preloaded {func_name} in {reply['import_time']:.3f}s"
+            )
+        self.runs[func_name] = self.runs.get(func_name, 0) + 1
+        if self.runs[func_name] > 1:
+            logger.info(
+                f"Warm worker saved {self.import_times.get(func_name, 0):.3f}s "
+                f"of imports for {func_name}"
+            )
+        return reply["exitcode"]
+
+    def saved_time(self):
+        """
+        Returns the import time saved so far: every run after a function's
+        first one skips the imports the template already did
+
+        Returns:
+            float -- seconds saved
+        """
+        return sum(
+            self.import_times.get(func_name, 0) * (runs - 1)
+            for func_name, runs in self.runs.items()
+        )
+
+    def close(self):
+        """
+        Stops the template process and reports the import time saved
+        """
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._conn.close()
+        self._process = None
+        logger.info(
+            f"Warm worker ran {sum(self.runs.values())} actions, "
+            f"saving {self.saved_time():.3f}s of imports"
+        )
+
+
+def _template_main(conn, faasr):
+    """
+    Main loop of the template process
+    """
+    preloaded = set()
+    current_path = None
+    current_code = None
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+
+        (
+            base_workflow,
+            overwritten,
+            func_name,
+            args,
+            rpc_env,
+            path,
+            code_version,
+        ) = msg
+        faasr.load_state(base_workflow, overwritten)
+
+        if path != current_path or code_version != current_code:
+            if current_code is not None and code_version != current_code:
+                _unload_modules(current_code[0])
+            sys.path[:] = path
+            importlib.invalidate_caches()
+            current_path, current_code = path, code_version
+            preloaded.clear()
+
+        import_time = None
+        if func_name not in preloaded:
+            import_time = _preload(faasr, func_name)
+            preloaded.add(func_name)
+
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            _run_child(faasr, func_name, args, rpc_env)
+        _, status = os.waitpid(pid, 0)
+        conn.send(
+            {
+                "exitcode": os.waitstatus_to_exitcode(status),
+                "import_time": import_time,
+            }
+        )
+
+
+def _preload(faasr, func_name):
+    """
+    Imports a function's PackageImports and user module into the template
+
+    Returns:
+        float -- seconds the imports took
+    """
+    start = time.perf_counter()
+    for package in get_package_imports(faasr, func_name):
+        try:
+            importlib.import_module(package)
+        except Exception as e:
+            logger.warning(f"Warm worker failed to import package {package} -- {e}")
+    try:
+        get_user_function(faasr, func_name)
+    except (Exception, SystemExit) as e:
+        # the child reports the error when it imports the function itself
+        logger.warning(f"Warm worker failed to preload {func_name} -- {e}")
+    return time.perf_counter() - start
+
+
+def _unload_modules(code_dir):
+    """
+    Removes the modules imported from a function code directory from sys.modules
+    """
+    prefix = os.path.join(code_dir, "")
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None) or ""
+        if module_file.startswith(prefix):
+            del sys.modules[name]
+
+
+def _run_child(faasr, func_name, args, rpc_env):
+    """
+    Runs the user function in a forked child and exits it
+    """
+    exitcode = 1
+    try:
+        run_py_function(faasr, func_name, args, rpc_env=rpc_env)
+        exitcode = 0
+    except SystemExit as e:
+        if e.code is None:
+            exitcode = 0
+        elif isinstance(e.code, int):
+            exitcode = e.code
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exitcode)
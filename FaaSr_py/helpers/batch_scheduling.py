@@ -0,0 +1,80 @@
+import os
+
+
+def batch_call_resources(faasr_payload, procedure_id, arguments):
+    """
+    Returns the files (and log) a procedure call reads or writes, so that
+    calls of a concurrent batch that touch the same resource keep their order
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        procedure_id: str -- name of the FaaSr function
+        arguments: dict -- arguments of the call
+    Returns:
+        set | None -- resources, or None if the call may touch any of them
+    """
+    args = arguments or {}
+    server_name = args.get("server_name") or faasr_payload.get("DefaultDataStore")
+
+    def remote_path():
+        path = os.path.join(
+            str(args.get("remote_folder", ".")), str(args.get("remote_file", ""))
+        )
+        return ("remote", server_name, os.path.normpath(path))
+
+    def local_path():
+        path = os.path.join(
+            str(args.get("local_folder", ".")), str(args.get("local_file", ""))
+        )
+        return ("local", os.path.normpath(path))
+
+    match procedure_id:
+        case "faasr_log":
+            return {("log",)}
+        case "faasr_put_file" | "faasr_get_file":
+            return {local_path(), remote_path()}
+        case "faasr_delete_file" | "faasr_put_shared" | "faasr_get_shared":
+            return {remote_path()}
+        case "faasr_rank" | "faasr_get_s3_creds":
+            return set()
+        case _:
+            return None
+
+
+def submit_batch(faasr_payload, calls, submit):
+    """
+    Submits the calls of a concurrent batch, each one after the earlier
+    calls that touch the same resources
+
+    submit must hand its work to a thread pool that starts work in
+    submission order, so a call only ever waits on calls that are already
+    running or done
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        calls: list[(str, dict)] -- procedure ID and arguments of each call
+        submit: callable -- submit(index, wait_for) schedules call index once
+        the futures in wait_for are done, and returns its Future
+    Returns:
+        list[Future] -- future of each call, in order
+    """
+    futures = []
+    last_use = {}
+    barrier = None
+    for index, (procedure_id, arguments) in enumerate(calls):
+        resources = batch_call_resources(faasr_payload, procedure_id, arguments)
+        if resources is None:
+            # call depends on (and blocks) every call around it
+            wait_for = list(futures)
+        else:
+            wait_for = {last_use[r] for r in resources if r in last_use}
+            if barrier is not None:
+                wait_for.add(barrier)
+        future = submit(index, list(wait_for))
+        futures.append(future)
+        if resources is None:
+            barrier = future
+            last_use = {}
+        else:
+            last_use.update((r, future) for r in resources)
+    return futures
@@ -0,0 +1,27 @@
+import hashlib
+import json
+
+
+def canonical_dumps(obj):
+    """
+    Serializes obj to JSON that is the same for equal values
+    (sorted keys, no insignificant whitespace)
+
+    Arguments:
+        obj: JSON-serializable object
+    Returns:
+        str -- canonical JSON
+    """
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(obj):
+    """
+    Returns the sha256 hex digest of the canonical JSON of obj
+
+    Arguments:
+        obj: JSON-serializable object
+    Returns:
+        str -- hex digest
+    """
+    return hashlib.sha256(canonical_dumps(obj).encode("utf-8")).hexdigest()
@@ -0,0 +1,285 @@
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+from FaaSr_py.helpers.env_cache import get_cache_store
+from FaaSr_py.helpers.function_index import compile_tree
+from FaaSr_py.helpers.github_client import get_github_client, github_error
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+# function code by commit, shared by every action that runs on this host
+CODE_CACHE_DIR = "/tmp/faasr_cache/code"
+
+# bare mirrors of the git repos that actions clone, fetched into shallowly
+GIT_MIRROR_DIR = "/tmp/faasr_cache/git"
+
+# folder in the CacheDataStore that holds function code archives
+CODE_CACHE_FOLDER = "FaaSrCodeCache"
+
+# overwritten field pinning each FunctionGitRepo entry to the commit it was
+# resolved to, so that every action of the invocation runs the same code
+COMMITS_FIELD = "FunctionGitRepoCommits"
+
+
+def get_pinned_commit(faasr_source, source):
+    """
+    Returns the commit a FunctionGitRepo entry was resolved to earlier in the invocation
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        source: str -- FunctionGitRepo entry
+    Returns:
+        str | None -- commit SHA
+    """
+    return (faasr_source.get(COMMITS_FIELD) or {}).get(source)
+
+
+def pin_commit(faasr_source, source, sha):
+    """
+    Records the commit of a FunctionGitRepo entry in the overwritten payload,
+    which is passed on to the actions triggered next
+    """
+    commits = dict(faasr_source.get(COMMITS_FIELD) or {})
+    if commits.get(source) != sha:
+        commits[source] = sha
+        faasr_source[COMMITS_FIELD] = commits
+
+
+def resolve_github_commit(repo, token=None, ref="HEAD"):
+    """
+    Resolves a ref of a GitHub repo to a commit SHA
+
+    Arguments:
+        repo: str -- username/repo
+        token: str | None -- GitHub PAT
+        ref: str -- branch, tag or HEAD (the default branch)
+    Returns:
+        str -- commit SHA
+    """
+    response = get_github_client().get(
+        f"/repos/{repo}/commits/{ref}",
+        token=token,
+        headers={"Accept": "application/vnd.github.sha"},
+        cache=True,
+    )
+    if response.status_code != 200:
+        logger.error(f"Failed to resolve {repo}@{ref} -- {github_error(response)}")
+        sys.exit(1)
+    return response.text.strip()
+
+
+def _git(*args):
+    result = subprocess.run(["git", *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def resolve_git_commit(url):
+    """
+    Resolves the default branch of a git repo to a commit SHA
+    """
+    output = _git("ls-remote", url, "HEAD").split()
+    if not output:
+        raise RuntimeError(f"Git repo {url} has no HEAD")
+    return output[0]
+
+
+def _extract_member(tar, member, dest):
+    try:
+        if hasattr(tarfile, "data_filter"):
+            tar.extract(member, dest, filter="data")
+        else:
+            tar.extract(member, dest)
+    except tarfile.TarError as e:
+        logger.warning(f"Skipping {member.name} -- {e}")
+
+
+def extract_tar_stream(fileobj, dest, subpath=None):
+    """
+    Extracts a tar stream as it is read, without seeking or a temporary file
+
+    Arguments:
+        fileobj: file-like -- (compressed) tar stream
+        dest: str -- directory to extract into
+        subpath: str | None -- only extract this path (relative to the
+        archive's top-level directory)
+    """
+    prefix = subpath.strip("/") if subpath else None
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            if prefix:
+                relative = member.name.split("/", 1)[1] if "/" in member.name else ""
+                if relative != prefix and not relative.startswith(f"{prefix}/"):
+                    continue
+            _extract_member(tar, member, dest)
+
+
+def _cache_entry(repo, sha, subpath=None):
+    """
+    Returns the name of the cache entry of a repo (or one of its folders) at a commit
+    """
+    part = hashlib.sha256(subpath.encode()).hexdigest()[:16] if subpath else "repo"
+    return f"{repo}/{sha}/{part}"
+
+
+def _restore_from_datastore(faasr_source, entry, dest):
+    """
+    Streams a code archive from the CacheDataStore into dest
+
+    Returns:
+        bool -- True if the archive was found and extracted
+    """
+    target_s3 = get_cache_store(faasr_source)
+    if target_s3 is None:
+        return False
+    s3_client = get_s3_client(target_s3)
+    try:
+        response = s3_client.get_object(
+            Bucket=target_s3['Bucket'], Key=f"{CODE_CACHE_FOLDER}/{entry}.tar.gz"
+        )
+        extract_tar_stream(response['Body'], dest)
+    except s3_client.exceptions.NoSuchKey:
+        return False
+    except Exception as e:
+        logger.warning(f"Failed to restore cached function code -- {e}")
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+        return False
+    logger.info(f"Restored function code from the CacheDataStore ({entry})")
+    return True
+
+
+def _save_to_datastore(faasr_source, entry, src):
+    """
+    Uploads the code in src to the CacheDataStore
+    """
+    target_s3 = get_cache_store(faasr_source)
+    if target_s3 is None:
+        return
+    s3_client = get_s3_client(target_s3)
+    with tempfile.TemporaryFile() as archive:
+        try:
+            with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+                tar.add(src, arcname=".")
+            archive.seek(0)
+            s3_client.upload_fileobj(
+                archive, target_s3['Bucket'], f"{CODE_CACHE_FOLDER}/{entry}.tar.gz"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache function code -- {e}")
+
+
+def _get_cached_code(faasr_source, entry, fetch):
+    """
+    Returns the local cache directory of a cache entry, filling it on a miss
+    from the CacheDataStore or else with fetch(directory)
+    """
+    path = os.path.join(CODE_CACHE_DIR, entry)
+    if os.path.isdir(path):
+        logger.info(f"Using cached function code ({entry})")
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # filled under a temporary name so that a partial fetch is never used
+    tmp_path = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        if not _restore_from_datastore(faasr_source, entry, tmp_path):
+            fetch(tmp_path)
+            # bytecode is cached (and uploaded) with the code it belongs to
+            compile_tree(tmp_path)
+            _save_to_datastore(faasr_source, entry, tmp_path)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # filled by another action at the same time
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return path
+
+
+def get_github_tarball_code(faasr_source, path, token, dest):
+    """
+    Gets a GitHub repo (or a folder of it) at the invocation's pinned commit
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        path: str -- username/repo[/path to folder]
+        token: str | None -- GitHub PAT
+        dest: str -- directory to put the code in
+    """
+    parts = path.split("/")
+    repo = f"{parts[0]}/{parts[1]}"
+    subpath = "/".join(parts[2:]) or None
+
+    sha = get_pinned_commit(faasr_source, path)
+    if sha is None:
+        sha = resolve_github_commit(repo, token)
+        pin_commit(faasr_source, path, sha)
+    logger.debug(f"{path} resolved to commit {sha}")
+
+    def fetch(tmp_path):
+        # extract while downloading, keeping only the needed folder
+        response = get_github_client().get(
+            f"/repos/{repo}/tarball/{sha}", token=token, stream=True
+        )
+        if response.status_code != 200:
+            logger.error(github_error(response))
+            sys.exit(1)
+        response.raw.decode_content = True
+        with response:
+            extract_tar_stream(response.raw, tmp_path, subpath)
+
+    cached = _get_cached_code(faasr_source, _cache_entry(repo, sha, subpath), fetch)
+    shutil.copytree(cached, dest, dirs_exist_ok=True)
+
+
+def get_git_repo_code(faasr_source, url, repo_name, dest):
+    """
+    Gets a git repo at the invocation's pinned commit through a local bare
+    mirror, which only fetches the commits it does not have (shallowly)
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        url: str -- HTTPS url of the repo
+        repo_name: str -- owner/repo
+        dest: str -- directory to put the code in
+    """
+    sha = get_pinned_commit(faasr_source, url)
+    if sha is None:
+        sha = resolve_git_commit(url)
+        pin_commit(faasr_source, url, sha)
+    logger.debug(f"{url} resolved to commit {sha}")
+
+    def fetch(tmp_path):
+        mirror = os.path.join(GIT_MIRROR_DIR, f"{repo_name}.git")
+        if not os.path.isdir(mirror):
+            os.makedirs(os.path.dirname(mirror), exist_ok=True)
+            _git("init", "--bare", "--quiet", mirror)
+        has_commit = subprocess.run(
+            ["git", "--git-dir", mirror, "cat-file", "-e", f"{sha}^{{commit}}"],
+            capture_output=True,
+        )
+        if has_commit.returncode != 0:
+            _git("--git-dir", mirror, "fetch", "--depth=1", "--quiet", url, sha)
+        archive = subprocess.Popen(
+            ["git", "--git-dir", mirror, "archive", sha], stdout=subprocess.PIPE
+        )
+        try:
+            extract_tar_stream(archive.stdout, tmp_path)
+        finally:
+            archive.stdout.close()
+            if archive.wait() != 0:
+                raise RuntimeError(f"git archive failed for {url}")
+
+    cached = _get_cached_code(faasr_source, _cache_entry(repo_name, sha), fetch)
+    shutil.copytree(cached, dest, dirs_exist_ok=True)
@@ -0,0 +1,518 @@
+import hashlib
+import importlib
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import sysconfig
+import tarfile
+import tempfile
+import time
+
+from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.canonical_json import content_hash
+from FaaSr_py.helpers.s3_helper_functions import (get_s3_client,
+                                                  get_transfer_config)
+
+logger = logging.getLogger(__name__)
+
+# folder in the cache data store that holds the environment archives
+ENV_CACHE_FOLDER = "FaaSrEnvCache"
+
+# where an action's packages are installed when the cache is used
+# (Python packages with pip --target into a directory per environment,
+# so they can be archived on their own)
+PYTHON_ENV_DIR = "/tmp/faasr_env/python"
+R_LIB_DIR = "/tmp/Rlibs"
+
+# PythonCondaPackage environment, and the package cache kept across actions
+CONDA_ENV_DIR = "/tmp/faasr_env/conda"
+CONDA_ROOT_DIR = "/tmp/faasr_cache/conda"
+CONDA_PKGS_DIR = "/tmp/faasr_cache/conda/pkgs"
+CONDA_CHANNELS = ["conda-forge"]
+# solvers to use, fastest first
+CONDA_SOLVERS = ("micromamba", "mamba", "conda")
+
+
+def _as_list(packages):
+    if not packages:
+        return []
+    if isinstance(packages, str):
+        return [packages]
+    return list(packages)
+
+
+def get_action_dependencies(faasr_source, action):
+    """
+    Returns the packages an action's function installs
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        action: dict -- the action
+    Returns:
+        dict -- {"PyPI": [...], "CRAN": [...], "GitHub": [...]}
+    """
+    func_name = action['FunctionName']
+    fields = {
+        "PyPI": "PyPIPackageDownloads",
+        "CRAN": "FunctionCRANPackage",
+        "GitHub": "FunctionGitHubPackage",
+    }
+    return {
+        kind: sorted(_as_list((faasr_source.get(field) or {}).get(func_name)))
+        for kind, field in fields.items()
+    }
+
+
+def get_runtime_version(func_type):
+    """
+    Returns the version of the interpreter an action's packages are built for
+
+    Arguments:
+        func_type: str -- Python or R
+    Returns:
+        str | None -- version, or None if it cannot be determined
+    """
+    if func_type == "Python":
+        version = sys.version_info
+        return f"{sys.implementation.name}-{version.major}.{version.minor}"
+    try:
+        result = subprocess.run(
+            ["Rscript", "-e", 'cat(R.version$major, R.version$minor, sep=".")'],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    return f"R-{result.stdout.strip()}"
+
+
+def get_platform_tag():
+    """
+    Returns the platform compiled packages are built for
+    """
+    libc, libc_version = platform.libc_ver()
+    return f"{sysconfig.get_platform()}-{libc or 'unknown'}{libc_version}"
+
+
+def download_archive(target_s3, key, dest):
+    """
+    Downloads a gzipped tar archive from a datastore and extracts it
+
+    Arguments:
+        target_s3: dict -- datastore config
+        key: str -- key of the archive
+        dest: str -- directory to extract into
+    Returns:
+        bool -- True if the archive was found and extracted
+    """
+    s3_client = get_s3_client(target_s3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "env.tar.gz")
+        try:
+            s3_client.download_file(
+                Bucket=target_s3['Bucket'],
+                Key=key,
+                Filename=archive,
+                Config=get_transfer_config(),
+            )
+        except s3_client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ("404", "NoSuchKey"):
+                logger.info(f"No cached environment {key} -- installing packages")
+            else:
+                logger.warning(f"Failed to download cached environment -- {e}")
+            return False
+        except Exception as e:
+            logger.warning(f"Failed to download cached environment -- {e}")
+            return False
+
+        try:
+            os.makedirs(dest, exist_ok=True)
+            with tarfile.open(archive, "r:gz") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(dest, filter="data")
+                else:
+                    tar.extractall(dest)
+        except (OSError, tarfile.TarError) as e:
+            logger.warning(f"Failed to extract cached environment -- {e}")
+            return False
+    return True
+
+
+def upload_archive(target_s3, key, src):
+    """
+    Uploads a directory to a datastore as a gzipped tar archive
+
+    Arguments:
+        target_s3: dict -- datastore config
+        key: str -- key of the archive
+        src: str -- directory to archive
+    Returns:
+        bool -- True if the archive was uploaded
+    """
+    s3_client = get_s3_client(target_s3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "env.tar.gz")
+        try:
+            with tarfile.open(archive, "w:gz", compresslevel=6) as tar:
+                tar.add(src, arcname=".")
+            s3_client.upload_file(
+                Filename=archive,
+                Bucket=target_s3['Bucket'],
+                Key=key,
+                Config=get_transfer_config(),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache environment -- {e}")
+            return False
+    return True
+
+
+def get_cache_store(faasr_source):
+    """
+    Returns the config of the CacheDataStore
+
+    Returns:
+        dict | None -- None if no (valid) CacheDataStore is set
+    """
+    server_name = faasr_source.get("CacheDataStore")
+    if not server_name or global_config.USE_LOCAL_FILE_SYSTEM:
+        return None
+    if server_name not in faasr_source['DataStores']:
+        logger.warning(f"Invalid CacheDataStore {server_name} -- not caching")
+        return None
+    return faasr_source['DataStores'][server_name]
+
+
+class EnvCache:
+    """
+    Snapshot of an action's installed packages, stored in the CacheDataStore
+
+    Archives are keyed by a hash of the action's packages, the interpreter
+    version and the platform, so an action with the same dependency set
+    restores the archive instead of installing its packages again
+    """
+
+    def __init__(self, target_s3, func_type, key, env_dir):
+        """
+        Arguments:
+            target_s3: dict -- config of the CacheDataStore
+            func_type: str -- Python or R
+            key: str -- hash of the environment
+            env_dir: str -- directory the packages are installed in
+        """
+        self.target_s3 = target_s3
+        self.func_type = func_type
+        self.key = key
+        self.env_dir = env_dir
+
+    @classmethod
+    def for_action(cls, faasr_source, action):
+        """
+        Returns the environment cache of an action
+
+        Returns:
+            EnvCache | None -- None if there is no CacheDataStore, the action
+            installs no packages or its environment cannot be identified
+        """
+        target_s3 = get_cache_store(faasr_source)
+        if target_s3 is None:
+            return None
+
+        func_type = action['Type']
+        dependencies = get_action_dependencies(faasr_source, action)
+        if not any(dependencies.values()):
+            return None
+
+        runtime = get_runtime_version(func_type)
+        if runtime is None:
+            logger.warning(f"Cannot determine {func_type} version -- not caching")
+            return None
+
+        key = content_hash(
+            {
+                "Type": func_type,
+                "Dependencies": dependencies,
+                "Runtime": runtime,
+                "Platform": get_platform_tag(),
+            }
+        )
+        if func_type == "Python":
+            env_dir = os.path.join(PYTHON_ENV_DIR, key)
+        else:
+            env_dir = R_LIB_DIR
+        return cls(target_s3, func_type, key, env_dir)
+
+    @property
+    def remote_key(self):
+        return f"{ENV_CACHE_FOLDER}/{self.func_type}-{self.key}.tar.gz"
+
+    @property
+    def _marker(self):
+        # present once the environment is installed in env_dir
+        return os.path.join(self.env_dir, f".faasr-env-{self.key}")
+
+    def activate(self):
+        """
+        Makes the packages in env_dir importable by the functions this process runs
+        """
+        if self.func_type == "Python" and self.env_dir not in sys.path:
+            # environments of earlier actions on this host are not importable
+            sys.path[:] = [
+                path for path in sys.path if os.path.dirname(path) != PYTHON_ENV_DIR
+            ]
+            sys.path.insert(0, self.env_dir)
+            importlib.invalidate_caches()
+
+    def clear(self):
+        """
+        Empties env_dir before a fresh install, so that the archive saved
+        afterwards only holds this environment's packages
+
+        Only the per-environment directories the cache creates are emptied:
+        R packages go to the shared R library, which keeps the packages
+        installed by earlier actions
+        """
+        if os.path.dirname(self.env_dir) == PYTHON_ENV_DIR:
+            shutil.rmtree(self.env_dir, ignore_errors=True)
+        os.makedirs(self.env_dir, exist_ok=True)
+
+    def restore(self):
+        """
+        Restores the environment from the cache
+
+        Returns:
+            bool -- True if the environment was restored (or is already installed)
+        """
+        if os.path.exists(self._marker):
+            logger.info("Packages already installed")
+            self.activate()
+            return True
+
+        start = time.perf_counter()
+        if not download_archive(self.target_s3, self.remote_key, self.env_dir):
+            return False
+        open(self._marker, "w").close()
+        self.activate()
+        logger.info(
+            f"Restored cached environment in {time.perf_counter() - start:.2f}s"
+        )
+        return True
+
+    def save(self):
+        """
+        Uploads the installed environment to the cache
+        """
+        open(self._marker, "w").close()
+        self.activate()
+
+        start = time.perf_counter()
+        if upload_archive(self.target_s3, self.remote_key, self.env_dir):
+            logger.info(f"Cached environment in {time.perf_counter() - start:.2f}s")
+
+
+def find_conda_solver():
+    """
+    Returns the path of the fastest conda solver installed (None if there is none)
+    """
+    for name in CONDA_SOLVERS:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+class CondaEnv:
+    """
+    Conda environment with an action's PythonCondaPackage packages
+
+    The packages are installed from binaries into a prefix built for this
+    interpreter's Python version, whose site-packages is then put on sys.path.
+    With a CacheDataStore, the solved environment is saved as an explicit
+    lockfile (keyed by the requested packages) and an archive of the prefix
+    (keyed by a hash of the lockfile), so later actions skip solving and
+    downloading packages
+    """
+
+    def __init__(self, packages, solver, target_s3=None):
+        """
+        Arguments:
+            packages: list[str] -- conda package specs
+            solver: str -- path of micromamba, mamba or conda
+            target_s3: dict | None -- config of the CacheDataStore
+        """
+        self.packages = sorted(packages)
+        self.solver = solver
+        self.target_s3 = target_s3
+        self.prefix = CONDA_ENV_DIR
+        version = sys.version_info
+        self.python_version = f"{version.major}.{version.minor}"
+        self.spec_key = content_hash(
+            {
+                "Packages": self.packages,
+                "Channels": CONDA_CHANNELS,
+                "Python": self.python_version,
+                "Platform": get_platform_tag(),
+            }
+        )
+
+    @classmethod
+    def for_action(cls, faasr_source, action):
+        """
+        Returns the conda environment of an action
+
+        Returns:
+            CondaEnv | None -- None if the action has no PythonCondaPackage
+        Raises:
+            RuntimeError -- there are conda packages but no solver is installed
+        """
+        if action['Type'] != "Python":
+            return None
+        packages = _as_list(
+            (faasr_source.get("PythonCondaPackage") or {}).get(action['FunctionName'])
+        )
+        if not packages:
+            return None
+        solver = find_conda_solver()
+        if solver is None:
+            raise RuntimeError(
+                "PythonCondaPackage needs micromamba, mamba or conda in the container"
+            )
+        return cls(packages, solver, get_cache_store(faasr_source))
+
+    @property
+    def site_packages(self):
+        return os.path.join(
+            self.prefix, "lib", f"python{self.python_version}", "site-packages"
+        )
+
+    @property
+    def _marker(self):
+        return os.path.join(self.prefix, f".faasr-conda-{self.spec_key}")
+
+    def _run(self, *args):
+        env = dict(os.environ)
+        env["CONDA_PKGS_DIRS"] = CONDA_PKGS_DIR
+        env.setdefault("MAMBA_ROOT_PREFIX", CONDA_ROOT_DIR)
+        result = subprocess.run(
+            [self.solver, *args], env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"{os.path.basename(self.solver)} {args[0]} failed: {result.stderr}"
+            )
+        return result.stdout
+
+    def _create(self, *args):
+        shutil.rmtree(self.prefix, ignore_errors=True)
+        os.makedirs(CONDA_PKGS_DIR, exist_ok=True)
+        self._run("create", "--yes", "--prefix", self.prefix, *args)
+
+    def _export_lock(self):
+        """
+        Returns the explicit lockfile (package URLs and checksums) of the prefix
+        """
+        if os.path.basename(self.solver) == "micromamba":
+            args = ["env", "export", "--prefix", self.prefix, "--explicit", "--md5"]
+        else:
+            args = ["list", "--prefix", self.prefix, "--explicit", "--md5"]
+        return self._run(*args)
+
+    @staticmethod
+    def lock_hash(lock):
+        """
+        Returns the hash of a lockfile, ignoring its comments
+        """
+        lines = [
+            line.strip()
+            for line in lock.splitlines()
+            if line.strip() and not line.startswith("#")
+        ]
+        return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+    def _lock_key(self):
+        return f"{ENV_CACHE_FOLDER}/Conda-{self.spec_key}.lock"
+
+    def _archive_key(self, lock_hash):
+        return f"{ENV_CACHE_FOLDER}/Conda-{lock_hash}.tar.gz"
+
+    def _get_lock(self):
+        s3_client = get_s3_client(self.target_s3)
+        try:
+            response = s3_client.get_object(
+                Bucket=self.target_s3['Bucket'], Key=self._lock_key()
+            )
+            return response['Body'].read().decode("utf-8")
+        except s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to get conda lockfile -- {e}")
+            return None
+
+    def _put_lock(self, lock):
+        s3_client = get_s3_client(self.target_s3)
+        try:
+            s3_client.put_object(
+                Bucket=self.target_s3['Bucket'],
+                Key=self._lock_key(),
+                Body=lock.encode("utf-8"),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache conda lockfile -- {e}")
+
+    def activate(self):
+        """
+        Makes the conda packages importable by the functions this process runs
+        """
+        if self.site_packages not in sys.path:
+            sys.path.insert(0, self.site_packages)
+            importlib.invalidate_caches()
+
+    def install(self):
+        """
+        Installs the packages (restoring them from the CacheDataStore if cached)
+        """
+        if os.path.exists(self._marker):
+            logger.info("Conda packages already installed")
+            self.activate()
+            return
+
+        start = time.perf_counter()
+        lock = self._get_lock() if self.target_s3 else None
+        if lock is not None:
+            lock_hash = self.lock_hash(lock)
+            shutil.rmtree(self.prefix, ignore_errors=True)
+            archive_key = self._archive_key(lock_hash)
+            if download_archive(self.target_s3, archive_key, self.prefix):
+                source = "cache"
+            else:
+                # solved before: install the exact packages without solving again
+                with tempfile.NamedTemporaryFile("w", suffix=".txt") as lock_file:
+                    lock_file.write(lock)
+                    lock_file.flush()
+                    self._create("--file", lock_file.name)
+                upload_archive(self.target_s3, archive_key, self.prefix)
+                source = "lockfile"
+        else:
+            channels = [arg for channel in CONDA_CHANNELS for arg in ("-c", channel)]
+            self._create(*channels, f"python={self.python_version}", *self.packages)
+            source = "solver"
+            if self.target_s3:
+                lock = self._export_lock()
+                lock_hash = self.lock_hash(lock)
+                if upload_archive(
+                    self.target_s3, self._archive_key(lock_hash), self.prefix
+                ):
+                    # only point to archives that exist
+                    self._put_lock(lock)
+
+        open(self._marker, "w").close()
+        self.activate()
+        logger.info(
+            f"Installed conda packages ({source}) in {time.perf_counter() - start:.2f}s"
+        )
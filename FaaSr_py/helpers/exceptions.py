@@ -0,0 +1,29 @@
+class FaaSrError(Exception):
+    """
+    Base class for errors raised by the FaaSr client API
+    """
+
+
+class FaaSrRPCError(FaaSrError):
+    """
+    The RPC server could not be reached or sent back an invalid response
+    """
+
+
+class FaaSrRequestError(FaaSrError):
+    """
+    The RPC server ran a FaaSr call, but the call failed
+
+    The failure is only reported to the caller: a user function that catches
+    it can carry on, and the action fails only if it does not
+    """
+
+    def __init__(self, procedure_id, message=None):
+        """
+        Arguments:
+            procedure_id: str -- name of the FaaSr function that failed
+            message: str | None -- error reported by the server
+        """
+        self.procedure_id = procedure_id
+        self.message = message
+        super().__init__(f"{procedure_id} failed -- {message or 'unknown error'}")
@@ -5,18 +5,23 @@ import re
 import shutil
 import subprocess
 import sys
-import tarfile
-
-import requests
 
 from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.code_cache import (get_git_repo_code,
+                                         get_github_tarball_code)
+from FaaSr_py.helpers.env_cache import CondaEnv, EnvCache
+from FaaSr_py.helpers.github_client import get_github_client, github_error
 
 logger = logging.getLogger(__name__)
 
+# pip/uv download and wheel cache, kept across actions in the same container
+PIP_CACHE_DIR = "/tmp/faasr_cache/pip"
+
 
 def faasr_get_github_clone(faasr_payload, url, base_dir=None):
     """
     Downloads a github repo clone from the repo's url
+    (at the commit pinned for the invocation, through the local code cache)
 
     Arguments:
         url: HTTPS url to git repo
@@ -38,16 +43,18 @@ def faasr_get_github_clone(faasr_payload, url, base_dir=None):
     if os.path.isdir(repo_path):
         shutil.rmtree(repo_path)
 
-    result = subprocess.run(["git", "clone", "--depth=1", url, repo_path], text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"Git clone failed for {url}")
+    try:
+        get_git_repo_code(faasr_payload, url, repo_name, repo_path)
+    except RuntimeError as e:
+        raise RuntimeError(f"Git clone failed for {url} -- {e}")
 
     return repo_path
 
 
 def faasr_get_github(faasr_source, path, token=None):
     """
-    Downloads a repo specified by a github path [username/repo] to a tarball file
+    Downloads a repo specified by a github path [username/repo]
+    (at the commit pinned for the invocation, through the local code cache)
 
     Arguments:
         faasr_source: payload dict (FaaSr)
@@ -61,69 +68,14 @@ def faasr_get_github(faasr_source, path, token=None):
         logger.error(err_msg)
         sys.exit(1)
 
-    # construct gh url
-    username = parts[0]
-    reponame = parts[1]
-    repo = f"{username}/{reponame}"
+    extract_base = f"/tmp/functions/{faasr_source['InvocationID']}"
+    os.makedirs(extract_base, exist_ok=True)
+    get_github_tarball_code(faasr_source, path, token, extract_base)
 
     if len(parts) > 2:
-        path = "/".join(parts[2:])
+        logger.info(f"Successfully downloaded GitHub repo sub folder: {path}")
     else:
-        path = None
-
-    url = f"https://api.github.com/repos/{repo}/tarball"
-    tar_name = f"/tmp/{reponame}.tar.gz"
-    parent_dir = os.path.dirname(tar_name)
-
-    if not os.path.isdir(parent_dir):
-        os.makedirs(parent_dir, exist_ok=True)
-
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "Authorization": f"Bearer {token}" if token else None,
-    }
-
-    # send get request
-    response = requests.get(
-        url,
-        headers=headers,
-        stream=True,
-    )
-
-    # if the response code is 200 (successful), then write repo to tarball file
-    if response.status_code == 200:
-        with open(tar_name, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        with tarfile.open(tar_name) as tar:
-            root_dir = tar.getnames()[0]
-            extract_base = f"/tmp/functions/{faasr_source['InvocationID']}"
-            os.makedirs(extract_base, exist_ok=True)
-
-            if path:
-                extract_path = os.path.join(root_dir, path)
-                members = [
-                    mem for mem in tar.getmembers() if mem.name.startswith(extract_path)
-                ]
-                tar.extractall(path=extract_base, members=members)
-            else:
-                tar.extractall(path=extract_base)
-        os.remove(tar_name)
-
-        if path:
-            logger.info(f"Successfully downloaded GitHub repo sub folder: {path}")
-        else:
-            logger.info(f"Successfully downloaded GitHub repo: {repo}")
-    else:
-        try:
-            err_response = response.json()
-            message = err_response.get("message")
-        except Exception:
-            message = "invalid or no response from GH"
-        logger.error(message)
-        sys.exit(1)
+        logger.info(f"Successfully downloaded GitHub repo: {path}")
 
 
 def faasr_get_github_raw(token, path):
@@ -148,17 +100,10 @@ def faasr_get_github_raw(token, path):
     reponame = parts[1]
     branch = parts[2]
     filepath = "/".join(parts[3:])
-    url = (
-        f"https://api.github.com/repos/"
-        f"{username}/{reponame}/contents/{filepath}?ref={branch}"
-    )
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "Authorization": f"Bearer {token}" if token else None,
-    }
+    url = f"/repos/{username}/{reponame}/contents/{filepath}?ref={branch}"
 
-    response1 = requests.get(url, headers=headers)
+    # revalidated with an ETag, so refetching an unchanged file is free
+    response1 = get_github_client().get(url, token=token, cache=True)
 
     if response1.status_code == 200:
         logger.debug(f"Successfully fetched raw file from GitHub: {path}")
@@ -168,11 +113,7 @@ def faasr_get_github_raw(token, path):
         decoded_string = decoded_bytes.decode("utf-8")
         return decoded_string
     else:
-        try:
-            err_response = response1.json()
-            message = err_response.get("message")
-        except Exception:
-            message = "invalid or no response from GH"
+        message = github_error(response1)
         logger.error(f"Failed to fetch raw file from GitHub: {path} -- {message}")
         sys.exit(1)
 
@@ -218,54 +159,39 @@ def faasr_install_git_repos(faasr_source, func_type, gits, token):
                     faasr_get_github(faasr_source, path, token)
 
 
-def faasr_pip_install(package):
+def _package_list(packages):
     """
-    Pip installs a single PyPI package
+    Returns packages as a list (the workflow allows a single string)
     """
-    # run pip install [package] command
-    if not package:
-        logger.info("No PyPI package dependency")
-    else:
-        command = ["pip", "install", "--no-input", package]
-        subprocess.run(command, text=True)
+    if not packages:
+        return []
+    if isinstance(packages, str):
+        return [packages]
+    return list(packages)
 
 
-def faasr_install_cran(package, lib_path=None):
+def _pip_command(target=None):
     """
-    Installs a single CRAN package non-interactively
+    Returns the install command of the fastest available Python resolver
+    (uv downloads in parallel; pip is the fallback)
     """
-    if not package:
-        logger.info("No CRAN package dependency")
-        return
-
-    logger.info(f"Installing CRAN package: {package}")
-    lib_path = lib_path or "/tmp/Rlibs"
-    os.makedirs(lib_path, exist_ok=True)
-
-    command = [
-        "Rscript",
-        "-e",
-        f'.libPaths(c("{lib_path}", .libPaths())); '
-        f'install.packages("{package}", lib="{lib_path}", '
-        f'repos="https://cloud.r-project.org", verbose=TRUE)',
-    ]
-
-    result = subprocess.run(command, text=True, capture_output=True)
-
-    if result.returncode != 0:
-        logger.error(
-            f"Failed to install {package}:\n"
-            f"std err: {result.stderr}\n"
-            f"std out: {result.stdout}"
-        )
-        raise RuntimeError(f"Install failed for {package}")
+    uv = shutil.which("uv")
+    if uv:
+        command = [uv, "pip", "install", "--python", sys.executable]
+        if not target:
+            command.append("--system")
     else:
-        logger.info(f"Successfully installed {package}")
+        command = [sys.executable, "-m", "pip", "install", "--no-input"]
+        command += ["--progress-bar", "off"]
+    command += ["--cache-dir", PIP_CACHE_DIR]
+    if target:
+        command += ["--target", target]
+    return command
 
 
-def faasr_pip_gh_install(path):
+def faasr_pip_gh_url(path):
     """
-    Installs a single package specified via a github path (name/path) using pip
+    Returns the pip requirement for a package specified via a github path (name/path)
     """
     parts = path.split("/")
     if len(parts) < 2:
@@ -276,43 +202,169 @@ def faasr_pip_gh_install(path):
     username = parts[0]
     reponame = parts[1]
     repo = f"{username}/{reponame}"
-    gh_url = f"git+https://github.com/{repo}.git"
+    return f"git+https://github.com/{repo}.git"
+
+
+def faasr_pip_install_all(requirements, target=None):
+    """
+    Installs Python requirements with a single resolver invocation
+
+    If the combined install fails, each requirement is installed on its own
+    so that the failing ones can be reported
+
+    Arguments:
+        requirements: list[str] -- PyPI packages or pip URLs
+        target: str | None -- directory to install into (pip --target)
+    Returns:
+        bool -- False if a requirement failed to install
+    """
+    requirements = _package_list(requirements)
+    if not requirements:
+        logger.info("No PyPI package dependency")
+        return True
+
+    os.makedirs(PIP_CACHE_DIR, exist_ok=True)
+    logger.info(f"Installing Python packages: {', '.join(requirements)}")
+    result = subprocess.run(_pip_command(target) + requirements, text=True)
+    if result.returncode == 0:
+        return True
+
+    failed = []
+    for requirement in requirements:
+        result = subprocess.run(_pip_command(target) + [requirement], text=True)
+        if result.returncode != 0:
+            failed.append(requirement)
+    for requirement in failed:
+        logger.error(f"Failed to install Python package {requirement}")
+    return not failed
+
+
+def faasr_pip_install(package, target=None):
+    """
+    Pip installs a single PyPI package
+
+    Arguments:
+        package: str -- package to install
+        target: str | None -- directory to install into (pip --target)
+    Returns:
+        bool -- False if pip failed
+    """
+    return faasr_pip_install_all([package] if package else [], target=target)
+
+
+def faasr_pip_gh_install(path, target=None):
+    """
+    Installs a single package specified via a github path (name/path) using pip
+
+    Arguments:
+        path: str -- GitHub path of the package
+        target: str | None -- directory to install into (pip --target)
+    Returns:
+        bool -- False if pip failed
+    """
+    return faasr_pip_install_all([faasr_pip_gh_url(path)], target=target)
+
+
+# installs packages (given as trailing arguments) with one install.packages call
+# and prints the ones that did not end up in the library
+CRAN_INSTALL_SCRIPT = """
+args <- commandArgs(trailingOnly = TRUE)
+lib <- args[1]
+ncpus <- as.integer(args[2])
+pkgs <- args[-(1:2)]
+.libPaths(c(lib, .libPaths()))
+install.packages(pkgs, lib = lib, repos = "https://cloud.r-project.org", Ncpus = ncpus)
+installed <- vapply(
+  pkgs, function(p) nzchar(system.file(package = p, lib.loc = lib)), logical(1)
+)
+for (p in pkgs[!installed]) cat("FAASR_INSTALL_FAILED", p, "\n")
+"""
+
+
+def faasr_install_cran_packages(packages, lib_path=None):
+    """
+    Installs CRAN packages with a single install.packages call,
+    building up to one package per core at a time
+
+    Arguments:
+        packages: list[str] -- CRAN packages
+        lib_path: str | None -- library to install into
+    """
+    packages = _package_list(packages)
+    if not packages:
+        logger.info("No CRAN package dependency")
+        return
 
-    command = ["pip", "install", "--no-input", gh_url]
-    subprocess.run(command, text=True)
+    logger.info(f"Installing CRAN packages: {', '.join(packages)}")
+    lib_path = lib_path or "/tmp/Rlibs"
+    os.makedirs(lib_path, exist_ok=True)
+
+    ncpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 1
+    command = ["Rscript", "-e", CRAN_INSTALL_SCRIPT, lib_path, str(ncpus)] + packages
+
+    result = subprocess.run(command, text=True, capture_output=True)
+
+    failed = [
+        line.split()[1]
+        for line in result.stdout.splitlines()
+        if line.startswith("FAASR_INSTALL_FAILED")
+    ]
+    if result.returncode != 0 and not failed:
+        failed = packages
+    if failed:
+        for package in failed:
+            logger.error(f"Failed to install CRAN package {package}")
+        logger.error(f"std err: {result.stderr}\nstd out: {result.stdout}")
+        raise RuntimeError(f"Install failed for {', '.join(failed)}")
+    logger.info(f"Successfully installed {', '.join(packages)}")
+
+
+def faasr_install_cran(package, lib_path=None):
+    """
+    Installs a single CRAN package non-interactively
+    """
+    faasr_install_cran_packages([package] if package else [], lib_path)
 
 
 def faasr_install_git_packages(gh_packages, type, lib_path=None):
     """
     Install a list of git packages
+
+    Arguments:
+        gh_packages: list[str] -- GitHub paths of the packages
+        type: str -- Python or R
+        lib_path: str | None -- directory to install into
+    Returns:
+        bool -- False if a Python package failed to install
     """
+    installed = True
     if not gh_packages:
         logger.info("No git package dependency")
+    elif type == "Python":
+        # resolve all of them together
+        requirements = [faasr_pip_gh_url(package) for package in gh_packages]
+        installed = faasr_pip_install_all(requirements, target=lib_path)
     else:
+        r_lib_path = f'"{lib_path}"' if lib_path else ".libPaths()[1]"
         # install each package
         for package in gh_packages:
             logger.info(f"Install GitHub package {package}")
-            if type == "Python":
-                faasr_pip_gh_install(package)
-            elif type == "R":
-                if lib_path:
-                    lib_path = f'"{lib_path}"'
-                else:
-                    lib_path = ".libPaths()[1]"
+            if type == "R":
                 command = [
                     "Rscript",
                     "-e",
                     (
                         f"withr::with_libpaths("
-                        f'new="{lib_path}", '
+                        f"new={r_lib_path}, "
                         f'code=quote(devtools::install_github("{package}", force=TRUE)))'
                     ),
                 ]
-                res = subprocess.run(command, text=True)
+                res = subprocess.run(command, text=True, capture_output=True)
                 if res.returncode != 0:
-                    logger.info("STDOUT:", res.stdout)
-                    logger.info("STDERR:", res.stderr)
+                    logger.info(f"STDOUT: {res.stdout}")
+                    logger.info(f"STDERR: {res.stderr}")
                     raise RuntimeError(f"Installation failed for {package}")
+    return installed
 
 
 def copy_local_files(faasr_source, gits):
@@ -339,6 +391,18 @@ def faasr_func_dependancy_install(faasr_source, action):
     """
     Installs the dependencies for an action's function
 
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        action: name of current action
+    """
+    faasr_fetch_function_code(faasr_source, action)
+    faasr_install_packages(faasr_source, action)
+
+
+def faasr_fetch_function_code(faasr_source, action):
+    """
+    Downloads (or copies) the code of an action's function
+
     Arguments:
         faasr_source: faasr payload (FaaSr)
         action: name of current action
@@ -377,36 +441,81 @@ def faasr_func_dependancy_install(faasr_source, action):
             # copy local files to /tmp/functions/{InvocationID}
             copy_local_files(faasr_source, local_gits)
 
-    if "PyPIPackageDownloads" in faasr_source and func_type == "Python":
-        if "PyPIPackageDownloads" in faasr_source and func_type == "Python":
-            pypi_packages = faasr_source['PyPIPackageDownloads'].get(func_name)
-            if pypi_packages:
-                for package in pypi_packages:
-                    faasr_pip_install(package)
 
-    elif "FunctionCRANPackage" in faasr_source and func_type == "R":
-        if "FunctionCRANPackage" in faasr_source:
-            cran_packages = faasr_source['FunctionCRANPackage'].get(func_name)
+def faasr_install_conda_packages(faasr_source, action):
+    """
+    Installs the PythonCondaPackage packages of an action's function
+    with micromamba, mamba or conda
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        action: name of current action
+    """
+    try:
+        conda_env = CondaEnv.for_action(faasr_source, action)
+        if conda_env is not None:
+            conda_env.install()
+    except RuntimeError as e:
+        logger.error(f"Failed to install conda packages -- {e}")
+        sys.exit(1)
+
+
+def faasr_install_packages(faasr_source, action):
+    """
+    Installs the PyPI, CRAN and GitHub packages of an action's function
+    (independent of the function code, so it can run while the code is fetched)
+
+    Arguments:
+        faasr_source: faasr payload (FaaSr)
+        action: name of current action
+    """
+    func_type, func_name = action['Type'], action['FunctionName']
+
+    # conda packages get their own environment (with its own cache)
+    faasr_install_conda_packages(faasr_source, action)
+
+    # restore the packages from the CacheDataStore if this environment is cached
+    env_cache = EnvCache.for_action(faasr_source, action)
+    if env_cache is not None:
+        if env_cache.restore():
+            return
+        env_cache.clear()
+    # with a cache, Python packages go to their own directory so they can be archived
+    python_target = env_cache.env_dir if env_cache is not None else None
+    # only complete environments are cached
+    installed = True
+
+    pypi_packages = _package_list(
+        (faasr_source.get("PyPIPackageDownloads") or {}).get(func_name)
+    )
+    cran_packages = _package_list(
+        (faasr_source.get("FunctionCRANPackage") or {}).get(func_name)
+    )
+    gh_packages = _package_list(
+        (faasr_source.get("FunctionGitHubPackage") or {}).get(func_name)
+    )
 
+    if func_type == "Python":
+        # PyPI and GitHub packages are resolved together in one pip (or uv) run
+        requirements = pypi_packages + [faasr_pip_gh_url(p) for p in gh_packages]
+        installed = faasr_pip_install_all(requirements, target=python_target)
+    elif func_type == "R":
         lib_path = "/tmp/Rlibs"
         os.makedirs(lib_path, exist_ok=True)
 
-        if cran_packages:
-            for package in cran_packages:
-                faasr_install_cran(package, lib_path)
-
+        faasr_install_cran_packages(cran_packages, lib_path)
         logger.debug(f"Packages in /tmp/Rlibs: {os.listdir('/tmp/Rlibs')}")
 
-    # install gh packages
-    if "FunctionGitHubPackage" in faasr_source:
-        if func_name in faasr_source['FunctionGitHubPackage']:
-            gh_packages = faasr_source['FunctionGitHubPackage'].get(func_name)
-            if gh_packages:
-                if func_type == "Python":
-                    faasr_install_git_packages(gh_packages, func_type)
-                elif func_type == "R":
-                    faasr_install_git_packages(gh_packages, func_type, "/tmp/Rlibs")
-                else:
-                    err_msg = "Invalid function type: {func_type}"
-                    logger.critical(err_msg)
-                    raise RuntimeError(err_msg)
+        # install gh packages
+        faasr_install_git_packages(gh_packages, func_type, lib_path)
+    elif gh_packages:
+        err_msg = f"Invalid function type: {func_type}"
+        logger.critical(err_msg)
+        raise RuntimeError(err_msg)
+
+    if env_cache is not None:
+        if installed:
+            env_cache.save()
+        else:
+            env_cache.activate()
+            logger.warning("Not caching environment -- a package failed to install")
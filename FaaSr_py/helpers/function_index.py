@@ -0,0 +1,169 @@
+import ast
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import py_compile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# on-disk cache of the names each Python file defines, keyed by file hash
+FUNCTION_INDEX_PATH = "/tmp/faasr_cache/function_index.json"
+
+# how strongly a top-level statement binds a name, best first:
+# def/class, then assignment (e.g. f = decorator(g)), then import
+DEFINITION_KINDS = ("defs", "assigns", "imports")
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(FUNCTION_INDEX_PATH, "r") as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+    return _index
+
+
+def _save_index():
+    try:
+        os.makedirs(os.path.dirname(FUNCTION_INDEX_PATH), exist_ok=True)
+        tmp_path = f"{FUNCTION_INDEX_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_index, f)
+        os.replace(tmp_path, FUNCTION_INDEX_PATH)
+    except OSError as e:
+        logger.debug(f"could not save function index -- {e}")
+
+
+def top_level_names(source):
+    """
+    Returns the names a module binds at top level, without running it
+
+    Arguments:
+        source: bytes -- source code of the module
+    Returns:
+        dict -- {"defs": [...], "assigns": [...], "imports": [...]}
+    """
+    tree = ast.parse(source)
+    names = {kind: [] for kind in DEFINITION_KINDS}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names["defs"].append(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for elt in ast.walk(target):
+                    if isinstance(elt, ast.Name):
+                        names["assigns"].append(elt.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    names["imports"].append(
+                        alias.asname or alias.name.split(".")[0]
+                    )
+    return names
+
+
+def file_names(path):
+    """
+    Returns the top-level names of a Python file (cached by the file's hash)
+
+    Arguments:
+        path: str -- path to the file
+    Returns:
+        dict | None -- names by kind, or None if the file does not parse
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+
+    with _index_lock:
+        index = _load_index()
+        if digest in index:
+            return index[digest]
+
+    try:
+        names = top_level_names(source)
+    except (SyntaxError, ValueError) as e:
+        logger.warning(f"Skipping {os.path.basename(path)} -- cannot parse: {e}")
+        names = None
+
+    with _index_lock:
+        _index[digest] = names
+    return names
+
+
+def locate_function(func_name, directory, ignore_files=()):
+    """
+    Finds the Python file that defines func_name by parsing (not importing) files
+
+    Arguments:
+        func_name: str -- name of function to find
+        directory: str -- directory to search
+        ignore_files: iterable -- file names to skip
+    Returns:
+        str | None -- path of the defining file
+    """
+    best = None
+    best_rank = len(DEFINITION_KINDS)
+    for root, _, files in os.walk(directory):
+        for f in files:
+            if not f.endswith(".py") or f in ignore_files:
+                continue
+            path = os.path.join(root, f)
+            names = file_names(path)
+            if names is None:
+                continue
+            for rank, kind in enumerate(DEFINITION_KINDS[:best_rank]):
+                if func_name in names[kind]:
+                    best, best_rank = path, rank
+                    break
+            if best_rank == 0:
+                break
+        if best_rank == 0:
+            break
+
+    with _index_lock:
+        _save_index()
+    return best
+
+
+def compile_module(path):
+    """
+    Writes the bytecode of a module next to it, checked by source hash rather
+    than mtime so it stays valid when the function code is cached and copied
+
+    Arguments:
+        path: str -- path to the module
+    """
+    cfile = importlib.util.cache_from_source(path)
+    try:
+        py_compile.compile(
+            path,
+            cfile=cfile,
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+        )
+    except (py_compile.PyCompileError, OSError) as e:
+        logger.debug(f"could not compile {path} -- {e}")
+
+
+def compile_tree(directory):
+    """
+    Writes the bytecode of every Python file under directory (see compile_module)
+
+    Arguments:
+        directory: str -- directory to compile
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for f in files:
+            if f.endswith(".py"):
+                compile_module(os.path.join(root, f))
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+
+# ETags and bodies of cached GET responses, shared by the actions on this host
+GITHUB_CACHE_DIR = "/tmp/faasr_cache/github"
+# larger responses are not cached
+MAX_CACHED_BODY = 1024 * 1024
+
+# below this many remaining requests, requests are spread over the time
+# left until the rate limit resets
+THROTTLE_BELOW = 100
+# longest wait (seconds) for a rate limit reset or Retry-After
+MAX_RATE_LIMIT_WAIT = 60
+MAX_RETRIES = 3
+# connections kept open to the API
+POOL_SIZE = 16
+
+
+def github_headers(token=None):
+    """
+    Returns the headers of a GitHub API request
+
+    Arguments:
+        token: str | None -- GitHub PAT
+    """
+    headers = {
+        "Accept": "application/vnd.github.v3+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def github_error(response):
+    """
+    Returns the error message of a failed GitHub API response
+    """
+    try:
+        return response.json().get("message")
+    except Exception:
+        return "invalid or no response from GH"
+
+
+class GitHubClient:
+    """
+    GitHub API client shared by everything in this process that calls GitHub
+
+    - one pooled session, so requests reuse connections
+    - GETs can be revalidated with If-None-Match against an on-disk cache
+      (a 304 does not count against the rate limit)
+    - requests are throttled as the X-RateLimit headers run low, and retried
+      after Retry-After or the rate limit reset when GitHub rejects them
+    """
+
+    def __init__(self, cache_dir=GITHUB_CACHE_DIR):
+        """
+        Arguments:
+            cache_dir: str -- directory of the response cache
+        """
+        self.cache_dir = cache_dir
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        # last X-RateLimit-* values seen
+        self.rate_limit = {"Limit": None, "Remaining": None, "Reset": None}
+        self.metrics = {
+            "Requests": 0,
+            "NotModified": 0,
+            "Retries": 0,
+            "ThrottledSeconds": 0.0,
+        }
+
+    def _get_session(self):
+        with self._lock:
+            # pooled connections must not be shared with a forked child
+            if self._session is None or self._session_pid != os.getpid():
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def get(self, path, token=None, cache=False, **kwargs):
+        """
+        GET request to the GitHub API
+
+        Arguments:
+            path: str -- API path (e.g. /repos/owner/repo) or full URL
+            token: str | None -- GitHub PAT
+            cache: bool -- revalidate against the response cache
+        Returns:
+            requests.Response
+        """
+        return self.request("GET", path, token=token, cache=cache, **kwargs)
+
+    def post(self, path, token=None, **kwargs):
+        """
+        POST request to the GitHub API (see get)
+        """
+        return self.request("POST", path, token=token, **kwargs)
+
+    def request(self, method, path, token=None, headers=None, cache=False, **kwargs):
+        """
+        Sends a request to the GitHub API
+
+        Arguments:
+            method: str -- HTTP method
+            path: str -- API path or full URL
+            token: str | None -- GitHub PAT
+            headers: dict | None -- headers added to the defaults
+            cache: bool -- revalidate a GET against the response cache
+            kwargs: passed on to requests
+        Returns:
+            requests.Response
+        """
+        url = path if path.startswith("http") else f"{GITHUB_API_URL}{path}"
+        request_headers = github_headers(token)
+        request_headers.update(headers or {})
+
+        cacheable = cache and method == "GET" and not kwargs.get("stream")
+        cached = None
+        if cacheable:
+            cache_key = self._cache_key(url, request_headers)
+            cached = self._read_cache(cache_key)
+            if cached is not None:
+                request_headers["If-None-Match"] = cached["ETag"]
+
+        session = self._get_session()
+        for attempt in range(MAX_RETRIES + 1):
+            self._throttle()
+            response = session.request(method, url, headers=request_headers, **kwargs)
+            self._update_rate_limit(response)
+            with self._lock:
+                self.metrics["Requests"] += 1
+
+            wait = self._retry_wait(method, response, attempt)
+            if wait is None or attempt == MAX_RETRIES:
+                break
+            logger.warning(
+                f"GitHub API returned {response.status_code} for {url} -- "
+                f"retrying in {wait:.1f}s"
+            )
+            response.close()
+            with self._lock:
+                self.metrics["Retries"] += 1
+            time.sleep(wait)
+
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                self.metrics["NotModified"] += 1
+            return self._cached_response(cached, url)
+        if cacheable and response.status_code == 200:
+            self._write_cache(cache_key, response)
+        return response
+
+    def _throttle(self):
+        """
+        Waits before a request when the rate limit is (nearly) used up
+        """
+        with self._lock:
+            remaining = self.rate_limit["Remaining"]
+            reset = self.rate_limit["Reset"]
+        if remaining is None or reset is None or remaining >= THROTTLE_BELOW:
+            return
+        until_reset = max(reset - time.time(), 0)
+        if remaining > 0:
+            # spread the remaining requests until the reset
+            wait = until_reset / remaining
+        else:
+            wait = until_reset
+        wait = min(wait, MAX_RATE_LIMIT_WAIT)
+        if wait <= 0:
+            return
+        if remaining == 0:
+            logger.warning(f"GitHub API rate limit used up -- waiting {wait:.1f}s")
+        with self._lock:
+            self.metrics["ThrottledSeconds"] += wait
+        time.sleep(wait)
+
+    def _update_rate_limit(self, response):
+        """
+        Records the X-RateLimit-* headers of a response
+        """
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        try:
+            with self._lock:
+                self.rate_limit["Limit"] = int(headers.get("X-RateLimit-Limit", 0))
+                self.rate_limit["Remaining"] = int(headers["X-RateLimit-Remaining"])
+                self.rate_limit["Reset"] = int(headers.get("X-RateLimit-Reset", 0))
+        except ValueError:
+            return
+        logger.debug(
+            f"GitHub API quota: {self.rate_limit['Remaining']}/"
+            f"{self.rate_limit['Limit']} remaining"
+        )
+
+    def _retry_wait(self, method, response, attempt):
+        """
+        Returns the seconds to wait before retrying a request (None to not retry)
+        """
+        status = response.status_code
+        retry_after = response.headers.get("Retry-After")
+        if status in (403, 429) and retry_after:
+            try:
+                return min(float(retry_after), MAX_RATE_LIMIT_WAIT)
+            except ValueError:
+                return None
+        rate_limited = response.headers.get("X-RateLimit-Remaining") == "0"
+        if status in (403, 429) and rate_limited:
+            try:
+                reset = int(response.headers.get("X-RateLimit-Reset", 0))
+            except ValueError:
+                return None
+            until_reset = reset - time.time()
+            # not worth waiting for a reset this far away
+            if until_reset > MAX_RATE_LIMIT_WAIT:
+                return None
+            return max(until_reset, 1)
+        # a failed POST may still have been carried out, so it is not repeated
+        if status >= 500 and method == "GET":
+            return 2**attempt
+        return None
+
+    def _cache_key(self, url, headers):
+        # responses depend on the credentials, so the (hashed) token is part of the key
+        key = json.dumps(
+            [url, headers.get("Accept"), headers.get("Authorization")], sort_keys=True
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _read_cache(self, cache_key):
+        path = os.path.join(self.cache_dir, f"{cache_key}.json")
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            with open(os.path.join(self.cache_dir, f"{cache_key}.body"), "rb") as f:
+                entry["Body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _write_cache(self, cache_key, response):
+        etag = response.headers.get("ETag")
+        if not etag or len(response.content) > MAX_CACHED_BODY:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # the body is written first, so that an entry's metadata never
+            # points to a partial body; each file is replaced atomically
+            for suffix, content in (
+                ("body", response.content),
+                (
+                    "json",
+                    json.dumps(
+                        {
+                            "ETag": etag,
+                            "ContentType": response.headers.get("Content-Type"),
+                        }
+                    ).encode("utf-8"),
+                ),
+            ):
+                path = os.path.join(self.cache_dir, f"{cache_key}.{suffix}")
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Failed to cache GitHub response -- {e}")
+
+    def _cached_response(self, entry, url):
+        """
+        Returns a cached body as a 200 response
+        """
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+
+        response = Response()
+        response.status_code = 200
+        response.url = url
+        response._content = entry["Body"]
+        response.headers = CaseInsensitiveDict(
+            {"ETag": entry["ETag"], "Content-Type": entry.get("ContentType") or ""}
+        )
+        response.encoding = "utf-8"
+        return response
+
+    def get_metrics(self):
+        """
+        Returns the request counts and the remaining quota
+
+        Returns:
+            dict -- Requests, NotModified, Retries, ThrottledSeconds,
+            RateLimitLimit, RateLimitRemaining and RateLimitReset
+        """
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["RateLimitLimit"] = self.rate_limit["Limit"]
+            metrics["RateLimitRemaining"] = self.rate_limit["Remaining"]
+            metrics["RateLimitReset"] = self.rate_limit["Reset"]
+        return metrics
+
+
+_github_client = None
+_github_client_lock = threading.Lock()
+
+
+def get_github_client():
+    """
+    Returns the GitHub API client shared by this process
+    """
+    global _github_client
+    with _github_client_lock:
+        if _github_client is None:
+            _github_client = GitHubClient()
+        return _github_client
@@ -1,25 +1,30 @@
 import json
 import logging
 import sys
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache
 from pathlib import Path
 
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
+from FaaSr_py.helpers.canonical_json import content_hash
 
 logger = logging.getLogger(__name__)
 
+# overwritten field stamped with the validation hash of the base workflow,
+# so that the actions triggered next don't validate the same workflow again
+SCHEMA_STAMP_FIELD = "SchemaValidatedHash"
 
-def validate_json(payload):
-    """
-    Verifies JSON payload is compliant with the FaaSr schema
+# validation hashes of the payloads this process has validated
+_validated_hashes = set()
 
-    Arguments:
-        payload: FaaSr payload to validate
+
+@lru_cache(maxsize=None)
+def load_schema():
     """
-    if isinstance(payload, str):
-        payload = json.loads(payload)
+    Loads the FaaSr schema (once per process)
 
+    Returns:
+        (dict, str) -- schema and its content hash
+    """
     schema_path = Path(__file__).parent.parent / "FaaSr.schema.json"
     if not schema_path.exists():
         logger.error(f"FaaSr schema file not found at {schema_path}")
@@ -28,52 +33,122 @@ def validate_json(payload):
     # Open FaaSr schema
     with open(schema_path, "r") as f:
         schema = json.load(f)
+    return schema, content_hash(schema)
+
+
+@lru_cache(maxsize=None)
+def get_schema_validator():
+    """
+    Returns a validator compiled for the FaaSr schema (built once per process)
+    """
+    from jsonschema.validators import validator_for
+
+    schema, _ = load_schema()
+    return validator_for(schema)(schema)
+
+
+def get_validation_hash(payload):
+    """
+    Returns the hash identifying a payload validated against this FaaSr schema
+
+    Arguments:
+        payload: dict -- FaaSr payload
+    Returns:
+        str -- hex digest
+    """
+    _, schema_hash = load_schema()
+    return content_hash({"Schema": schema_hash, "Payload": payload})
+
+
+def validate_json(payload, validated_hash=None):
+    """
+    Verifies JSON payload is compliant with the FaaSr schema
+    (skipped for payloads already validated by this process or stamped
+    as validated by an earlier action)
+
+    Arguments:
+        payload: FaaSr payload to validate
+        validated_hash: str | None -- SchemaValidatedHash of the payload
+    Returns:
+        str -- validation hash of the payload, to stamp it with
+    """
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+
+    payload_hash = get_validation_hash(payload)
+    if payload_hash == validated_hash or payload_hash in _validated_hashes:
+        logger.debug("Payload already validated -- skipping schema validation")
+        return payload_hash
+
+    from jsonschema.exceptions import best_match
 
     # Compare payload against FaaSr schema and except if they do not match
-    try:
-        validate(instance=payload, schema=schema)
-    except ValidationError as e:
-        logger.error(f"JSON not compliant with FaaSr schema: {e.message}")
+    error = best_match(get_schema_validator().iter_errors(payload))
+    if error is not None:
+        logger.error(f"JSON not compliant with FaaSr schema: {error.message}")
         sys.exit(1)
-    return True
+    _validated_hashes.add(payload_hash)
+    return payload_hash
 
 
-def is_cyclic(adj_graph, curr, visited, stack):
+def find_cycles(adj_graph, nodes):
     """
-    Recursive function that if there is a cycle in a directed
-    graph defined by an adjacency list
+    Finds the cycles in a directed graph with an iterative three-color DFS,
+    which takes linear time and no recursion however long its paths are
 
     Arguments:
         adj_graph: adjacency list for graph (dict)
-        curr: current node
-        visited: set of visited nodes (set)
-        stack: list of nodes in recursion call stack (list)
+        nodes: iterable of the nodes to start searching from
 
     Returns:
-        bool: True if cycle exists, False otherwise
+        list[list] -- one cycle (as a list of nodes, first node repeated at the
+        end) for every back edge found; empty if the graph is acyclic
     """
-    # if the current node is in the recursion call
-    # stack then there must be a cycle in the graph
-    if curr in stack:
-        return True
-
-    # add current node to recursion call stack and visited set
-    visited.add(curr)
-    stack.append(curr)
-
-    # check each successor for cycles, recursively calling is_cyclic()
-    for child in adj_graph[curr]:
-        if child not in visited and is_cyclic(adj_graph, child, visited, stack):
-            logger.error(f"Function loop found from node {curr} to {child}")
-            sys.exit(1)
-        elif child in stack:
-            logger.error(f"Function loop found from node {curr} to {child}")
-            sys.exit(1)
+    cycles = []
+    # nodes whose successors have all been explored
+    done = set()
+    for root in nodes:
+        if root in done:
+            continue
+        # current DFS path, and the position of each node on it
+        path = [root]
+        on_path = {root: 0}
+        # iterator over the unexplored successors of each node on the path
+        iterators = [iter(adj_graph.get(root, ()))]
+        while iterators:
+            child = next(iterators[-1], None)
+            if child is None:
+                # no more successors: backtrack
+                iterators.pop()
+                node = path.pop()
+                del on_path[node]
+                done.add(node)
+            elif child in on_path:
+                # edge back to a node on the path closes a cycle
+                cycles.append(path[on_path[child]:] + [child])
+            elif child not in done:
+                on_path[child] = len(path)
+                path.append(child)
+                iterators.append(iter(adj_graph.get(child, ())))
+    return cycles
+
+
+def reachable_from(adj_graph, start):
+    """
+    Returns the set of nodes reachable from start (including start)
 
-    # no more successors to visit for this branch and no cycles found
-    # remove current node from recursion call stack
-    stack.pop()
-    return False
+    Arguments:
+        adj_graph: adjacency list for graph (dict)
+        start: node to start from
+    """
+    visited = {start}
+    queue = deque([start])
+    while queue:
+        for child in adj_graph.get(queue.popleft(), ()):
+            if child not in visited:
+                visited.add(child)
+                queue.append(child)
+    return visited
 
 
 def build_adjacency_graph(payload):
@@ -92,30 +167,31 @@ def build_adjacency_graph(payload):
     ranks = dict()
 
     # Build adjacency list from ActionList
-    for func in payload["ActionList"].keys():
-        invoke_next = payload["ActionList"][func]["InvokeNext"]
+    for func, action_config in payload["ActionList"].items():
+        invoke_next = action_config["InvokeNext"]
         if isinstance(invoke_next, str):
             invoke_next = [invoke_next]
         for child in invoke_next:
+            if isinstance(child, dict):
+                actions = [
+                    action
+                    for conditional_branch in child.values()
+                    for action in conditional_branch
+                ]
+            else:
+                actions = [child]
 
-            def process_action(action):
+            for action in actions:
                 action_name, action_rank = extract_rank(action)
-                if action_name in ranks and ranks[action_name] > 1:
+                if ranks.get(action_name, 0) > 1:
                     err_msg = "Function with rank cannot have multiple predecessors"
                     logger.error(err_msg)
                     sys.exit(1)
-                else:
-                    adj_graph[func].append(action_name)
-                    ranks[action_name] = action_rank
-
-            if isinstance(child, dict):
-                for conditional_branch in child.values():
-                    for action in conditional_branch:
-                        process_action(action)
-            else:
-                process_action(child)
+                adj_graph[func].append(action_name)
+                ranks[action_name] = action_rank
 
-    for func in adj_graph:
+    # actions that no action invokes (including ones that invoke nothing)
+    for func in payload["ActionList"]:
         if func not in ranks:
             ranks[func] = 0
 
@@ -144,38 +220,49 @@ def check_dag(faasr_payload):
         sys.exit(1)
 
     adj_graph, ranks = build_adjacency_graph(faasr_payload)
+    pre = validate_graph(faasr_payload, adj_graph, ranks)
+    return expand_ranked_predecessors(pre[faasr_payload["FunctionInvoke"]], ranks)
+
 
-    # Initialize empty recursion call stack
-    stack = []
+def validate_graph(faasr_payload, adj_graph, ranks):
+    """
+    Checks the workflow graph for cycles, unreachable nodes and
+    ranked functions invoking ranked functions, aborting if it finds any
 
-    # Initialize empty visited set
-    visited = set()
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        adj_graph: adjacency list for graph (dict)
+        ranks: dict of each action's rank
+    Returns:
+        predecessors: dict -- map of function predecessors
+    """
+    errors = []
 
     # Find initial function in the graph
-    start = False
-    for func in faasr_payload["ActionList"]:
-        if ranks[func] == 0:
-            start = True
-            # This function stores the first function with no predecessors
-            # In the cases where there is multiple functions with no
-            # predecessors, an unreachable state error will occur later
-            first_func = func
-            break
+    # In the cases where there is multiple functions with no predecessors,
+    # the ones after the first are reported as unreachable
+    first_func = next(
+        (func for func in faasr_payload["ActionList"] if ranks.get(func, 0) == 0),
+        None,
+    )
 
     # Ensure there is an initial action
-    if start is False:
-        logger.error("Function loop found: no initial action")
-        sys.exit(1)
+    if first_func is None:
+        errors.append("Function loop found: no initial action")
+        reachable = set()
+    else:
+        reachable = reachable_from(adj_graph, first_func)
 
-    # Check for cycles
-    is_cyclic(adj_graph, first_func, visited, stack)
+    # Check for cycles (every cycle is reported, not just the first)
+    for cycle in find_cycles(adj_graph, faasr_payload["ActionList"]):
+        errors.append(f"Function loop found: {' -> '.join(cycle)}")
 
-    # Check if all of the functions have been visited by the DFS
+    # Check if all of the functions are reachable from the initial action
     # If not, then there is an unreachable state in the graph
-    for func in faasr_payload["ActionList"]:
-        if func.split(".")[0] not in visited:
-            logger.error(f"Unreachable state found: {func}")
-            sys.exit(1)
+    if first_func is not None:
+        for func in faasr_payload["ActionList"]:
+            if func.split(".")[0] not in reachable:
+                errors.append(f"Unreachable state found: {func}")
 
     # Initialize predecessor list
     pre = predecessors_list(adj_graph)
@@ -185,15 +272,32 @@ def check_dag(faasr_payload):
         if ranks[func] > 1:
             for pre_f in p:
                 if ranks[pre_f] > 1:
-                    logger.error(
+                    errors.append(
                         "Function with rank cannot have predecessor with rank"
                         f" - offending functions: {func}({ranks[func]}) and {pre_f}({ranks[pre_f]})"
                     )
-                    sys.exit(1)
 
-    curr_pre = pre[faasr_payload["FunctionInvoke"]]
+    # Report every problem with the workflow at once
+    if errors:
+        for err_msg in errors:
+            logger.error(err_msg)
+        sys.exit(1)
+    return pre
+
+
+def expand_ranked_predecessors(predecessors, ranks):
+    """
+    Returns the action names (with rank) whose completion an action waits for:
+    a predecessor with rank N is N actions, pre.1 to pre.N
+
+    Arguments:
+        predecessors: list[str] -- predecessors of the action
+        ranks: dict of each action's rank
+    Returns:
+        list[str] -- predecessor actions
+    """
     real_pre = []
-    for p in curr_pre:
+    for p in predecessors:
         if p in ranks and ranks[p] > 1:
             for i in range(1, ranks[p] + 1):
                 real_pre.append(f"{p}.{i}")
@@ -224,6 +328,8 @@ def extract_rank(str):
     Returns:
         (str, int) -- action name and rank
     """
+    if "(" not in str:
+        return str, 1
     parts = str.split("(")
     if len(parts) != 2 or not parts[1].endswith(")"):
         return str, 1
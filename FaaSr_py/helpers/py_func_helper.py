@@ -4,8 +4,21 @@ import os
 import sys
 import uuid
 
+from FaaSr_py.helpers.function_index import locate_function
+
 logger = logging.getLogger(__name__)
 
+# files in function repositories that are never user functions
+IGNORE_FILES = [
+    "test_gh_invoke.py",
+    "test.py",
+    "func_test.py",
+    "faasr_start_invoke_helper.py",
+    "faasr_start_invoke_openwhisk.py",
+    "faasr_start_invoke_aws-lambda.py",
+    "faasr_start_invoke_github_actions.py",
+]
+
 
 def local_wrap(function):
     """
@@ -52,7 +65,11 @@ def faasr_import_function(path, func_name):
 
 def faasr_import_function_walk(func_name, directory="."):
     """
-    Walks directory until it finds function
+    Finds and imports a function from a directory
+
+    Files are parsed (not run) to find the module defining the function,
+    and only that module is imported. If no file defines the function at top
+    level, every module is imported until one has it
 
     Arguments:
         func_name: str -- name of function to import
@@ -60,35 +77,55 @@ def faasr_import_function_walk(func_name, directory="."):
     Returns:
         function: function object | None
     """
-    ignore_files = [
-        "test_gh_invoke.py",
-        "test.py",
-        "func_test.py",
-        "faasr_start_invoke_helper.py",
-        "faasr_start_invoke_openwhisk.py",
-        "faasr_start_invoke_aws-lambda.py",
-        "faasr_start_invoke_github_actions.py",
-    ]
     directory = os.path.abspath(directory)
 
     if directory not in sys.path:
         sys.path.insert(0, directory)
 
+    path = locate_function(func_name, directory, ignore_files=IGNORE_FILES)
+    if path is not None:
+        module_name = _module_name(directory, path)
+        logger.info(f"Source python file {os.path.basename(path)}")
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            logger.error(
+                f"Python file {os.path.basename(path)} has following source error: "
+                f"{str(e)}"
+            )
+            sys.exit(1)
+        obj = getattr(module, func_name, None)
+        if callable(obj):
+            return obj
+
+    return _import_function_walk_all(func_name, directory)
+
+
+def _module_name(directory, path):
+    """
+    Returns the importable module name of a file under directory
+    """
+    rel_path = os.path.relpath(os.path.splitext(path)[0], directory)
+    return rel_path.replace(os.path.sep, ".")
+
+
+def _import_function_walk_all(func_name, directory):
+    """
+    Walks directory, importing every module until one has the function
+
+    Arguments:
+        func_name: str -- name of function to import
+        directory: str -- directory to walk
+    Returns:
+        function: function object | None
+    """
     for root, _, files in os.walk(directory):
         py_files = [file for file in files if file.endswith(".py")]
         for f in py_files:
-            if f not in ignore_files:
+            if f not in IGNORE_FILES:
                 logger.info(f"Source python file {f}")
                 try:
-                    rel_path = os.path.relpath(root, directory)
-                    if rel_path == ".":
-                        # file is in the base directory
-                        module_name = os.path.splitext(f)[0]
-                    else:
-                        # file is in a subdirectory
-                        module_path = os.path.join(rel_path, os.path.splitext(f)[0])
-                        module_name = module_path.replace(os.path.sep, ".")
-
+                    module_name = _module_name(directory, os.path.join(root, f))
                     module = importlib.import_module(module_name)
 
                     # return func
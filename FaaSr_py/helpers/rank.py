@@ -1,7 +1,7 @@
 import logging
 import sys
 
-from FaaSr_py.helpers.graph_functions import get_ranks
+from FaaSr_py.helpers.workflow_plan import WorkflowPlan
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +17,7 @@ def faasr_rank(faasr_payload):
     curr_func_name = faasr_payload["FunctionInvoke"]
 
     # get rank info
-    ranks = get_ranks(faasr_payload)
+    ranks = WorkflowPlan.for_payload(faasr_payload, verify=False).ranks
     max_rank = ranks.get(curr_func_name)
 
     if max_rank and max_rank > 1:
@@ -1,14 +1,27 @@
 import logging
+import os
 import sys
+import threading
 import uuid
 from pathlib import Path
 
-import boto3
-
 from FaaSr_py.config.s3_log_sender import S3LogSender
 
 logger = logging.getLogger(__name__)
 
+# size of the connection pool of each S3 client,
+# so that concurrent RPC requests don't queue for connections
+S3_MAX_POOL_CONNECTIONS = 32
+
+# large objects (cached environments and code) are transferred in parts,
+# several at a time -- a download is a set of concurrent ranged GETs
+TRANSFER_CHUNK_SIZE = 8 * 1024 * 1024
+TRANSFER_CONCURRENCY = 16
+
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+_s3_clients_pid = os.getpid()
+
 
 def validate_uuid(uuid_value):
     """
@@ -55,26 +68,70 @@ def get_default_log_boto3_client(faasr_payload):
         logger.error(err_msg)
         sys.exit(1)
 
-    if s3_log_info.get("Endpoint"):
-        return boto3.client(
-            "s3",
-            aws_access_key_id=s3_log_info["AccessKey"],
-            aws_secret_access_key=s3_log_info["SecretKey"],
-            region_name=s3_log_info["Region"],
-            endpoint_url=s3_log_info["Endpoint"],
-        )
-    else:
-        return boto3.client(
-            "s3",
-            aws_access_key_id=s3_log_info["AccessKey"],
-            aws_secret_access_key=s3_log_info["SecretKey"],
-            region_name=s3_log_info["Region"],
-        )
+    return get_s3_client(s3_log_info)
+
+
+def get_s3_client(target_s3):
+    """
+    Returns a boto3 client for a datastore, shared by all threads
+
+    Clients are cached per set of credentials; creating one is not thread-safe
+    and is much slower than the requests made with it
+
+    Arguments:
+        target_s3: dict -- datastore config (AccessKey, SecretKey, Region, Endpoint)
+    Returns:
+        boto3.client: boto3 client for S3 datastore
+    """
+    key = (
+        target_s3["AccessKey"],
+        target_s3["SecretKey"],
+        target_s3["Region"],
+        target_s3.get("Endpoint") or None,
+    )
+    global _s3_clients_pid
+    with _s3_clients_lock:
+        # pooled connections must not be shared with a forked child
+        if _s3_clients_pid != os.getpid():
+            _s3_clients.clear()
+            _s3_clients_pid = os.getpid()
+        s3_client = _s3_clients.get(key)
+        if s3_client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            client_args = {
+                "aws_access_key_id": target_s3["AccessKey"],
+                "aws_secret_access_key": target_s3["SecretKey"],
+                "region_name": target_s3["Region"],
+                "config": BotoConfig(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+            }
+            if target_s3.get("Endpoint"):
+                client_args["endpoint_url"] = target_s3["Endpoint"]
+            s3_client = boto3.session.Session().client("s3", **client_args)
+            _s3_clients[key] = s3_client
+    return s3_client
+
+
+def get_transfer_config():
+    """
+    Returns the boto3 TransferConfig for large objects
+
+    Returns:
+        boto3.s3.transfer.TransferConfig
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=TRANSFER_CHUNK_SIZE,
+        multipart_chunksize=TRANSFER_CHUNK_SIZE,
+        max_concurrency=TRANSFER_CONCURRENCY,
+    )
 
 
-def flush_s3_log():
+def flush_s3_log(final=False):
     log_sender = S3LogSender.get_log_sender()
-    log_sender.flush_log()
+    log_sender.flush_log(final=final)
 
 
 def get_invocation_folder(faasr_payload):
@@ -0,0 +1,128 @@
+import io
+import logging
+from multiprocessing import resource_tracker, shared_memory
+
+logger = logging.getLogger(__name__)
+
+
+def create_shared_buffer(size):
+    """
+    Creates a shared memory block that the caller owns (and must unlink)
+
+    Arguments:
+        size: int -- number of bytes (blocks always hold at least one byte)
+    Returns:
+        SharedMemory
+    """
+    return shared_memory.SharedMemory(create=True, size=max(int(size), 1))
+
+
+def attach_shared_buffer(name):
+    """
+    Attaches to a shared memory block owned by another process
+
+    The block is not registered with this process' resource tracker,
+    so it is not unlinked behind the owner's back when this process exits
+
+    Arguments:
+        name: str -- name of the shared memory block
+    Returns:
+        SharedMemory
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    untrack_shared_buffer(shm)
+    return shm
+
+
+def untrack_shared_buffer(shm):
+    """
+    Hands ownership of a shared memory block to another process
+    """
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception as e:
+        logger.debug(f"could not unregister shared memory {shm.name}: {e}")
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a buffer (no copy of the data is made)
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class BufferWriter(io.RawIOBase):
+    """
+    Seekable file object that writes into a preallocated buffer
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, b):
+        data = memoryview(b).cast("B")
+        end = self._pos + len(data)
+        if end > len(self._view):
+            raise ValueError("write past the end of the buffer")
+        self._view[self._pos:end] = data
+        self._pos = end
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
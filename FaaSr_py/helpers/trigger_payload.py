@@ -0,0 +1,158 @@
+import base64
+import json
+import logging
+import sys
+import zlib
+
+from FaaSr_py.helpers.canonical_json import canonical_dumps
+
+logger = logging.getLogger(__name__)
+
+# fields of an encoded OVERWRITTEN payload: the codec and the base64 data
+ENCODED_FIELD = "FaaSrEncoded"
+DATA_FIELD = "Data"
+
+# field of an OVERWRITTEN payload listing the fields (e.g. ActionList) that only
+# hold the entries differing from the base workflow's, to be merged into them
+MERGE_FIELD = "FaaSrMerge"
+
+# workflow field choosing the compression of OVERWRITTEN payloads
+COMPRESSION_FIELD = "CompressTriggerPayload"
+
+
+def _get_codec(compression):
+    """
+    Returns the codec for a CompressTriggerPayload setting (None for no compression)
+    """
+    if not compression:
+        return None
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+
+            return "zstd"
+        except ImportError:
+            logger.debug("zstandard not installed -- compressing with zlib")
+    return "zlib"
+
+
+def _compress(codec, data):
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            err_msg = "OVERWRITTEN payload is zstd-compressed but zstandard is missing"
+            logger.error(err_msg)
+            sys.exit(1)
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    logger.error(f"Unknown OVERWRITTEN payload encoding: {codec}")
+    sys.exit(1)
+
+
+def _delta(overwritten, base_workflow):
+    """
+    Returns the fields that differ from the base workflow; of a map such as
+    ActionList, DataStores or ComputeServers only the changed entries are kept,
+    and the field is listed in MERGE_FIELD
+    """
+    delta = {}
+    merged = []
+    for key, value in overwritten.items():
+        if key not in base_workflow:
+            delta[key] = value
+            continue
+        base_value = base_workflow[key]
+        if value == base_value:
+            continue
+        # a map with removed entries is sent whole
+        if isinstance(value, dict) and isinstance(base_value, dict):
+            if base_value.keys() <= value.keys():
+                value = {
+                    name: entry
+                    for name, entry in value.items()
+                    if name not in base_value or base_value[name] != entry
+                }
+                merged.append(key)
+        delta[key] = value
+    if merged:
+        delta[MERGE_FIELD] = sorted(merged)
+    return delta
+
+
+def encode_trigger_payload(overwritten, base_workflow=None, compression=False):
+    """
+    Returns the minimal OVERWRITTEN payload for the next action: the fields that
+    differ from the base workflow it will load (only the changed entries of
+    its maps), compressed if that makes it smaller
+
+    Arguments:
+        overwritten: dict -- overwritten fields of the next action
+        base_workflow: dict | None -- base workflow as fetched (without secrets)
+        compression: bool | str -- CompressTriggerPayload setting
+    Returns:
+        dict -- payload (serialize it with canonical_dumps)
+    """
+    if base_workflow is None:
+        delta = dict(overwritten)
+    else:
+        delta = _delta(overwritten, base_workflow)
+    payload = delta
+    text = canonical_dumps(delta)
+
+    codec = _get_codec(compression)
+    if codec is not None:
+        data = base64.b64encode(_compress(codec, text.encode("utf-8"))).decode("ascii")
+        encoded = {ENCODED_FIELD: codec, DATA_FIELD: data}
+        if len(canonical_dumps(encoded)) < len(text):
+            payload = encoded
+
+    full_size = len(json.dumps(overwritten))
+    sent_size = len(canonical_dumps(payload))
+    logger.info(
+        f"OVERWRITTEN payload: {sent_size} bytes "
+        f"(saved {full_size - sent_size} of {full_size} bytes)"
+    )
+    return payload
+
+
+def decode_trigger_payload(overwritten):
+    """
+    Decodes an OVERWRITTEN payload made by encode_trigger_payload
+    (plain payloads are returned as they are)
+
+    The fields listed in MERGE_FIELD are left to be merged with the base
+    workflow (see merge_trigger_payload)
+
+    Arguments:
+        overwritten: dict | None -- OVERWRITTEN payload
+    Returns:
+        dict | None -- overwritten fields
+    """
+    if not isinstance(overwritten, dict) or ENCODED_FIELD not in overwritten:
+        return overwritten
+    data = base64.b64decode(overwritten[DATA_FIELD])
+    return json.loads(_decompress(overwritten[ENCODED_FIELD], data).decode("utf-8"))
+
+
+def merge_trigger_payload(overwritten, base_workflow, merged):
+    """
+    Completes the fields of a decoded payload that only hold the entries
+    differing from the base workflow's (the fields in MERGE_FIELD)
+
+    Arguments:
+        overwritten: dict -- overwritten fields (updated in place)
+        base_workflow: dict -- base workflow
+        merged: list[str] -- fields to complete
+    """
+    for key in merged:
+        overwritten[key] = {**base_workflow[key], **overwritten[key]}
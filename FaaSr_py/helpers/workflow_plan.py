@@ -0,0 +1,320 @@
+import gzip
+import json
+import logging
+import sys
+from collections import deque
+
+from FaaSr_py.helpers.canonical_json import canonical_dumps, content_hash
+from FaaSr_py.helpers.graph_functions import (build_adjacency_graph,
+                                              expand_ranked_predecessors,
+                                              extract_rank, validate_graph)
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+# overwritten field locating the plan stored by the first action, so that the
+# actions triggered next load it instead of rebuilding and validating the graph
+PLAN_FIELD = "WorkflowPlan"
+
+# name of the plan in the invocation's log folder
+PLAN_FILE = "plan.json.gz"
+
+# plans built or loaded by this process, by hash
+_plans = {}
+
+
+def get_plan_hash(workflow):
+    """
+    Returns the content hash of the parts of a workflow that a plan is built from
+
+    Arguments:
+        workflow: FaaSr payload (FaaSrPayload or dict)
+    Returns:
+        str -- hex digest
+    """
+    servers = {
+        name: server.get("FaaSType")
+        for name, server in (workflow.get("ComputeServers") or {}).items()
+    }
+    return content_hash({"ActionList": workflow["ActionList"], "Servers": servers})
+
+
+class WorkflowPlan:
+    """
+    Compiled form of a workflow's DAG
+
+    Holds what every action would otherwise recompute from the ActionList:
+    successors, predecessors, ranks, a topological order, the parsed InvokeNext
+    of each action and the compute server each action runs on. The first
+    action builds and validates it and stores it in the logging data store;
+    only its location and hash are passed on in the overwritten payload, and
+    an action whose workflow has the same hash loads it as is
+    """
+
+    def __init__(
+        self, plan_hash, adjacency, predecessors, ranks, order, invoke_next, servers
+    ):
+        """
+        Arguments:
+            plan_hash: str -- hash of the workflow the plan was built from
+            adjacency: dict -- action to the actions it invokes
+            predecessors: dict -- action to the actions that invoke it
+            ranks: dict -- action to rank (0 for the first action)
+            order: list[str] -- actions in topological order
+            invoke_next: dict -- action to {"Always": [[action, rank], ...],
+            "Conditional": {return value: [[action, rank], ...]}}
+            servers: dict -- action to {"Server": name, "FaaSType": type}
+        """
+        self.hash = plan_hash
+        self.adjacency = adjacency
+        self.predecessors = predecessors
+        self.ranks = ranks
+        self.order = order
+        self.invoke_next = invoke_next
+        self.servers = servers
+
+    @classmethod
+    def build(cls, workflow):
+        """
+        Builds and validates the plan of a workflow, aborting if its graph is invalid
+
+        Arguments:
+            workflow: FaaSr payload (FaaSrPayload or dict)
+        Returns:
+            WorkflowPlan
+        """
+        action_list = workflow["ActionList"]
+        adj_graph, graph_ranks = build_adjacency_graph(workflow)
+        for action, children in adj_graph.items():
+            for child in children:
+                if child not in action_list:
+                    logger.error(f"InvokeNext of {action} has unknown action {child}")
+                    sys.exit(1)
+        pre = validate_graph(workflow, adj_graph, graph_ranks)
+
+        adjacency = {action: list(adj_graph.get(action, [])) for action in action_list}
+        predecessors = {action: list(pre.get(action, [])) for action in action_list}
+        ranks = {action: graph_ranks.get(action, 0) for action in action_list}
+
+        compute_servers = workflow.get("ComputeServers") or {}
+        servers = {}
+        for action, config in action_list.items():
+            server = config["FaaSServer"]
+            if server not in compute_servers:
+                logger.error(f"invalid server name for action {action}: {server}")
+                sys.exit(1)
+            servers[action] = {
+                "Server": server,
+                "FaaSType": compute_servers[server].get("FaaSType"),
+            }
+
+        invoke_next = {
+            action: _parse_invoke_next(config["InvokeNext"])
+            for action, config in action_list.items()
+        }
+        order = _topological_order(adjacency, predecessors)
+        return cls(
+            get_plan_hash(workflow),
+            adjacency,
+            predecessors,
+            ranks,
+            order,
+            invoke_next,
+            servers,
+        )
+
+    @classmethod
+    def for_payload(cls, faasr, verify=True):
+        """
+        Returns the plan of the current workflow, building it only if no
+        plan with the workflow's hash was built in this process or stored
+        by the first action
+
+        Arguments:
+            faasr: FaaSrPayload -- workflow payload
+            verify: bool -- check that a passed-on plan matches the workflow
+            (without it, a passed-on plan is trusted as is)
+        Returns:
+            WorkflowPlan
+        """
+        if faasr["FunctionInvoke"] not in faasr["ActionList"]:
+            err_msg = "FunctionInvoke does not refer to a valid function"
+            logger.error(err_msg)
+            sys.exit(1)
+
+        propagated = faasr.get(PLAN_FIELD)
+        if propagated and not verify:
+            plan = _plans.get(propagated["Hash"])
+            if plan is None:
+                plan = faasr.load_plan()
+            if plan is not None:
+                _plans[plan.hash] = plan
+                return plan
+
+        plan_hash = get_plan_hash(faasr)
+        if propagated and propagated["Hash"] != plan_hash:
+            # the workflow changed: the next actions must not trust the stored plan
+            faasr.remove(PLAN_FIELD)
+            propagated = None
+
+        plan = _plans.get(plan_hash)
+        if plan is not None:
+            logger.debug("Using workflow plan built earlier")
+            return plan
+        if propagated:
+            plan = faasr.load_plan()
+        if plan is not None:
+            logger.debug("Loaded workflow plan -- skipping DAG validation")
+        else:
+            logger.debug("Building workflow plan")
+            plan = cls.build(faasr)
+        _plans[plan_hash] = plan
+        return plan
+
+    @classmethod
+    def from_dict(cls, plan):
+        """
+        Arguments:
+            plan: dict -- plan from WorkflowPlan.to_dict
+        Returns:
+            WorkflowPlan
+        """
+        return cls(
+            plan["Hash"],
+            plan["Adjacency"],
+            plan["Predecessors"],
+            plan["Ranks"],
+            plan["Order"],
+            plan["InvokeNext"],
+            plan["Servers"],
+        )
+
+    def to_dict(self):
+        """
+        Returns the plan as JSON-serializable dict
+        """
+        return {
+            "Hash": self.hash,
+            "Adjacency": self.adjacency,
+            "Predecessors": self.predecessors,
+            "Ranks": self.ranks,
+            "Order": self.order,
+            "InvokeNext": self.invoke_next,
+            "Servers": self.servers,
+        }
+
+    def write(self, target_s3, key):
+        """
+        Uploads the plan, gzipped
+
+        Arguments:
+            target_s3: dict -- config of the data store
+            key: str -- key of the plan
+        Returns:
+            bool -- True if the plan was stored
+        """
+        body = gzip.compress(canonical_dumps(self.to_dict()).encode("utf-8"))
+        s3_client = get_s3_client(target_s3)
+        try:
+            s3_client.put_object(Bucket=target_s3['Bucket'], Key=key, Body=body)
+        except Exception as e:
+            logger.warning(f"Failed to store workflow plan -- {e}")
+            return False
+        logger.debug(f"Stored workflow plan at {key} ({len(body)} bytes)")
+        return True
+
+    @classmethod
+    def read(cls, target_s3, key, expected_hash):
+        """
+        Downloads a plan stored with WorkflowPlan.write
+
+        Arguments:
+            target_s3: dict -- config of the data store
+            key: str -- key of the plan
+            expected_hash: str -- hash of the workflow the plan must be built from
+        Returns:
+            WorkflowPlan | None -- the plan, or None if it could not be read
+            or does not match
+        """
+        s3_client = get_s3_client(target_s3)
+        try:
+            response = s3_client.get_object(Bucket=target_s3['Bucket'], Key=key)
+            plan = cls.from_dict(json.loads(gzip.decompress(response['Body'].read())))
+        except Exception as e:
+            logger.warning(f"Failed to read workflow plan -- {e}")
+            return None
+        if plan.hash != expected_hash:
+            logger.warning("Workflow plan does not match its hash")
+            return None
+        return plan
+
+    def real_predecessors(self, action):
+        """
+        Returns the actions (with rank, e.g. pre.2) that must finish before action
+
+        Arguments:
+            action: str -- action name
+        Returns:
+            list[str] -- predecessor actions
+        """
+        return expand_ranked_predecessors(self.predecessors[action], self.ranks)
+
+    def next_actions(self, action, return_val=None):
+        """
+        Returns the actions that action triggers
+
+        Arguments:
+            action: str -- action name
+            return_val: any -- value returned by the user function, used for conditionals
+        Returns:
+            list[(str, int)] -- action name and rank of each action to trigger
+        """
+        invoke_next = self.invoke_next[action]
+        next_actions = [tuple(entry) for entry in invoke_next["Always"]]
+        if invoke_next["Conditional"]:
+            conditional = invoke_next["Conditional"].get(str(return_val), [])
+            next_actions.extend(tuple(entry) for entry in conditional)
+        return next_actions
+
+    def has_conditionals(self, action):
+        """
+        Returns True if action's InvokeNext depends on its function's return value
+        """
+        return bool(self.invoke_next[action]["Conditional"])
+
+
+def _parse_invoke_next(invoke_next):
+    """
+    Parses an action's InvokeNext, splitting the rank off each action name
+    """
+    if not isinstance(invoke_next, list):
+        invoke_next = [invoke_next] if invoke_next else []
+    parsed = {"Always": [], "Conditional": {}}
+    for entry in invoke_next:
+        if isinstance(entry, dict):
+            for value, branch in entry.items():
+                if isinstance(branch, str):
+                    branch = [branch]
+                parsed["Conditional"].setdefault(value, []).extend(
+                    list(extract_rank(action)) for action in branch
+                )
+        else:
+            parsed["Always"].append(list(extract_rank(entry)))
+    return parsed
+
+
+def _topological_order(adjacency, predecessors):
+    """
+    Returns the actions in topological order (Kahn's algorithm)
+    """
+    in_degree = {action: len(pre) for action, pre in predecessors.items()}
+    queue = deque(action for action, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        action = queue.popleft()
+        order.append(action)
+        for child in adjacency[action]:
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return order
@@ -0,0 +1,113 @@
+import gzip
+import json
+import logging
+import re
+
+from FaaSr_py.helpers.canonical_json import canonical_dumps, content_hash
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+# overwritten field locating the snapshot of the workflow taken by the first
+# action, which the actions triggered next read instead of fetching from GitHub
+SNAPSHOT_FIELD = "WorkflowSnapshot"
+
+# name of the snapshot in the invocation's log folder
+SNAPSHOT_FILE = "workflow.json.gz"
+
+_COMMIT_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+
+def pin_workflow_path(path, token=None):
+    """
+    Resolves the ref of a workflow file's GitHub path to a commit, so that
+    every action of the invocation reads the same version of the workflow
+
+    Arguments:
+        path: str -- username/repo/ref/path to file
+        token: str | None -- GitHub PAT
+    Returns:
+        str -- username/repo/commit SHA/path to file
+    """
+    parts = path.split("/")
+    if len(parts) < 4 or _COMMIT_SHA.match(parts[2]):
+        return path
+
+    from FaaSr_py.helpers.code_cache import resolve_github_commit
+
+    parts[2] = resolve_github_commit(f"{parts[0]}/{parts[1]}", token, ref=parts[2])
+    return "/".join(parts)
+
+
+def write_snapshot(target_s3, key, raw_workflow):
+    """
+    Uploads a gzipped canonical copy of the workflow (without secrets)
+
+    Arguments:
+        target_s3: dict -- config of the data store
+        key: str -- key of the snapshot
+        raw_workflow: str -- workflow JSON as fetched from GitHub
+    Returns:
+        str | None -- content hash of the workflow, or None if the upload failed
+    """
+    workflow = json.loads(raw_workflow)
+    body = gzip.compress(canonical_dumps(workflow).encode("utf-8"))
+    s3_client = get_s3_client(target_s3)
+    try:
+        s3_client.put_object(Bucket=target_s3['Bucket'], Key=key, Body=body)
+    except Exception as e:
+        logger.warning(f"Failed to store workflow snapshot -- {e}")
+        return None
+    logger.debug(f"Stored workflow snapshot at {key} ({len(body)} bytes)")
+    return content_hash(workflow)
+
+
+def read_snapshot(target_s3, key, expected_hash):
+    """
+    Downloads a workflow snapshot
+
+    Arguments:
+        target_s3: dict -- config of the data store
+        key: str -- key of the snapshot
+        expected_hash: str -- content hash the workflow must have
+    Returns:
+        (str, dict) | None -- workflow JSON and workflow, or None if the
+        snapshot could not be read or does not match
+    """
+    s3_client = get_s3_client(target_s3)
+    try:
+        response = s3_client.get_object(Bucket=target_s3['Bucket'], Key=key)
+        raw_workflow = gzip.decompress(response['Body'].read()).decode("utf-8")
+        workflow = json.loads(raw_workflow)
+    except Exception as e:
+        logger.warning(f"Failed to read workflow snapshot -- {e}")
+        return None
+    if content_hash(workflow) != expected_hash:
+        logger.warning("Workflow snapshot does not match its hash")
+        return None
+    return raw_workflow, workflow
+
+
+def get_snapshot_datastore(snapshot, overwritten, secrets):
+    """
+    Returns the config of the data store holding a snapshot, with its credentials
+
+    Arguments:
+        snapshot: dict -- WorkflowSnapshot field
+        overwritten: dict -- overwritten payload
+        secrets: dict | None -- secrets of the action
+    Returns:
+        dict | None -- data store config, or None if its credentials are unknown
+    """
+    name = snapshot['DataStore']
+    # data stores passed on with their credentials (when not using a secret store)
+    datastores = (overwritten or {}).get("DataStores") or {}
+    if name in datastores:
+        return datastores[name]
+    if secrets is None:
+        return None
+    # the snapshot only records the names of the secrets
+    return {
+        field: secrets.get(value, value) if isinstance(value, str) else value
+        for field, value in snapshot['Config'].items()
+    }
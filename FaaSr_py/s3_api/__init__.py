@@ -1,8 +1,10 @@
 from .delete_file import faasr_delete_file
+from .get_bytes import faasr_get_bytes
 from .get_file import faasr_get_file
 from .get_folder_list import faasr_get_folder_list
 from .get_s3_creds import faasr_get_s3_creds
 from .log import faasr_log
+from .put_bytes import faasr_put_bytes
 from .put_file import faasr_put_file
 
 __all__ = [
@@ -12,4 +14,6 @@ __all__ = [
     "faasr_delete_file",
     "faasr_get_folder_list",
     "faasr_get_s3_creds",
+    "faasr_put_bytes",
+    "faasr_get_bytes",
 ]
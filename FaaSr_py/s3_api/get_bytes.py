@@ -0,0 +1,78 @@
+import logging
+import re
+import sys
+from pathlib import Path
+
+from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
+from FaaSr_py.helpers.shared_memory import BufferWriter
+
+logger = logging.getLogger(__name__)
+
+
+def faasr_get_bytes(
+    faasr_payload, remote_file, server_name="", remote_folder=".", allocate=bytearray
+):
+    """
+    Downloads a file from S3 straight into memory without a temp file
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        remote_file: str -- name of file to download
+        server_name: str -- name of S3 data store to get file from
+        remote_folder: str -- folder in S3 to get file from
+        allocate: callable -- given the object size, returns a writable buffer
+        of at least that size to download into (defaults to bytearray)
+    Returns:
+        (buffer, int) -- buffer returned by allocate and the object size
+    """
+    remote_folder = re.sub(r"/+", "/", str(remote_folder).rstrip("/"))
+    remote_file = re.sub(r"/+", "/", str(remote_file).rstrip("/"))
+
+    get_file_remote = Path(remote_folder) / remote_file
+
+    if global_config.USE_LOCAL_FILE_SYSTEM:
+        remote_path = Path(global_config.LOCAL_FILE_SYSTEM_DIR) / get_file_remote
+        size = remote_path.stat().st_size
+        buffer = allocate(size)
+        with open(remote_path, "rb") as rf:
+            rf.readinto(memoryview(buffer).cast("B")[:size])
+        return buffer, size
+
+    if not server_name:
+        if "DefaultDataStore" in faasr_payload:
+            server_name = faasr_payload["DefaultDataStore"]
+        else:
+            logger.error("No default data store")
+            raise RuntimeError("No default data store")
+    if server_name not in faasr_payload["DataStores"]:
+        logger.error(f"Invalid data server name: {server_name}")
+        sys.exit(1)
+
+    target_s3 = faasr_payload["DataStores"][server_name]
+
+    s3_client = get_s3_client(target_s3)
+
+    try:
+        head = s3_client.head_object(
+            Bucket=target_s3["Bucket"], Key=str(get_file_remote)
+        )
+        size = head["ContentLength"]
+        buffer = allocate(size)
+        # download_fileobj fetches ranges in parallel and writes them in place
+        s3_client.download_fileobj(
+            Bucket=target_s3["Bucket"],
+            Key=str(get_file_remote),
+            Fileobj=BufferWriter(memoryview(buffer).cast("B")[:size]),
+        )
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            logger.error(
+                f"S3 object not found: s3://{target_s3['Bucket']}/{get_file_remote}"
+            )
+        else:
+            logger.error(f"Error downloading buffer from S3: {e}")
+        sys.exit(1)
+
+    logger.debug(f"Downloaded {size} bytes from {get_file_remote}")
+    return buffer, size
@@ -1,5 +1,6 @@
 import logging
 import sys
+import threading
 from pathlib import Path
 
 from FaaSr_py.config.debug_config import global_config
@@ -9,6 +10,19 @@ from FaaSr_py.helpers.s3_helper_functions import (get_default_log_boto3_client,
 
 logger = logging.getLogger(__name__)
 
+# appending to a log is a read-modify-write of the whole object,
+# so appends to the same log must not overlap
+_log_locks = {}
+_log_locks_guard = threading.Lock()
+
+
+def _get_log_lock(log_path):
+    """
+    Returns the lock serializing appends to a log file
+    """
+    with _log_locks_guard:
+        return _log_locks.setdefault(str(log_path), threading.Lock())
+
 
 def faasr_log(faasr_payload, log_message):
     """
@@ -25,6 +39,14 @@ def faasr_log(faasr_payload, log_message):
     log_folder = get_invocation_folder(faasr_payload)
     log_path = log_folder / faasr_payload.log_file
 
+    with _get_log_lock(log_path):
+        _append_log(faasr_payload, log_path, log_message)
+
+
+def _append_log(faasr_payload, log_path, log_message):
+    """
+    Appends a message to the log file at log_path
+    """
     if global_config.USE_LOCAL_FILE_SYSTEM:
         # make log dir
         local_log_path = Path(global_config.LOCAL_FILE_SYSTEM_DIR / log_path)
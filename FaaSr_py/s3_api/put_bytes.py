@@ -0,0 +1,68 @@
+import logging
+import re
+import sys
+from pathlib import Path
+
+from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
+from FaaSr_py.helpers.shared_memory import BufferReader
+
+logger = logging.getLogger(__name__)
+
+
+def faasr_put_bytes(
+    faasr_payload, data, remote_file, server_name="", remote_folder="."
+):
+    """
+    Uploads an in-memory buffer to S3 bucket without writing it to disk
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        data: bytes-like object (or readable file object) to upload
+        remote_file: str -- name of file to upload to S3
+        server_name: str -- name of S3 data store to put file in
+        remote_folder: str -- folder in S3 to put file in
+    """
+    remote_folder = re.sub(r"/+", "/", str(remote_folder).rstrip("/"))
+    remote_file = re.sub(r"/+", "/", str(remote_file).rstrip("/"))
+
+    # Path for remote file
+    remote_path = Path(remote_folder) / remote_file
+
+    # wrap buffers so they are streamed rather than copied
+    if hasattr(data, "read"):
+        fileobj = data
+    else:
+        fileobj = BufferReader(data)
+
+    if global_config.USE_LOCAL_FILE_SYSTEM:
+        path_to_put = Path(global_config.LOCAL_FILE_SYSTEM_DIR) / remote_path
+        path_to_put.parent.mkdir(parents=True, exist_ok=True)
+        with open(path_to_put, "wb") as wf:
+            while chunk := fileobj.read(1024 * 1024):
+                wf.write(chunk)
+    else:
+        # Get the server name from payload if it is not provided
+        if server_name == "":
+            server_name = faasr_payload["DefaultDataStore"]
+
+        # Ensure that the server name is valid
+        if server_name not in faasr_payload["DataStores"]:
+            logger.error(f"Invalid data server name: {server_name}")
+            sys.exit(1)
+
+        # Get the S3 server to put the file in
+        target_s3 = faasr_payload["DataStores"][server_name]
+
+        s3_client = get_s3_client(target_s3)
+
+        # upload_fileobj streams large buffers as a parallel multipart upload
+        try:
+            s3_client.upload_fileobj(
+                Fileobj=fileobj, Bucket=target_s3["Bucket"], Key=str(remote_path)
+            )
+        except s3_client.exceptions.ClientError as e:
+            logger.error(f"Error putting buffer in S3: {e}")
+            sys.exit(1)
+
+        logger.debug(f"Buffer successfully uploaded to {remote_path}")
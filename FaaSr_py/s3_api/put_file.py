@@ -3,9 +3,8 @@ import re
 import sys
 from pathlib import Path
 
-import boto3
-
 from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.helpers.s3_helper_functions import get_s3_client
 
 logger = logging.getLogger(__name__)
 
@@ -78,21 +77,7 @@ def faasr_put_file(
         # Get the S3 server to put the file in
         target_s3 = faasr_payload["DataStores"][server_name]
 
-        if target_s3.get("Endpoint"):
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=target_s3["AccessKey"],
-                aws_secret_access_key=target_s3["SecretKey"],
-                region_name=target_s3["Region"],
-                endpoint_url=target_s3["Endpoint"],
-            )
-        else:
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=target_s3["AccessKey"],
-                aws_secret_access_key=target_s3["SecretKey"],
-                region_name=target_s3["Region"],
-            )
+        s3_client = get_s3_client(target_s3)
 
         try:
             with open(local_path, "rb") as put_data:
@@ -1,28 +1,39 @@
+import asyncio
 import logging
-import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 import uvicorn
 from fastapi import FastAPI
 from pydantic import BaseModel
 
+from FaaSr_py.client.rpc_client import RPCClient
 from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.config.log_controls import get_action_log_level
+from FaaSr_py.config.s3_log_handler import S3LogHandler
+from FaaSr_py.config.s3_log_sender import S3LogSender
+from FaaSr_py.helpers.batch_scheduling import submit_batch
 from FaaSr_py.helpers.rank import faasr_rank
 from FaaSr_py.helpers.s3_helper_functions import flush_s3_log
-from FaaSr_py.s3_api import (faasr_delete_file, faasr_get_file,
-                             faasr_get_folder_list, faasr_get_s3_creds,
-                             faasr_log, faasr_put_file)
+from FaaSr_py.helpers.shared_memory import (BufferReader,
+                                            attach_shared_buffer,
+                                            create_shared_buffer,
+                                            untrack_shared_buffer)
+from FaaSr_py.s3_api import (faasr_delete_file, faasr_get_bytes,
+                             faasr_get_file, faasr_get_folder_list,
+                             faasr_get_s3_creds, faasr_log, faasr_put_bytes,
+                             faasr_put_file)
 
 logger = logging.getLogger(__name__)
+
+# seconds to wait for the RPC server to come up before giving up
+SERVER_START_TIMEOUT = 30
+
+# default number of blocking calls (S3 requests, log uploads) the server runs
+# at once; an action can change it with RPCConcurrency
+DEFAULT_MAX_CONCURRENCY = 32
+
 faasr_api = FastAPI()
-valid_functions = {
-    "faasr_get_file",
-    "faasr_put_file",
-    "faasr_delete_file",
-    "faasr_get_folder_list",
-    "faasr_log",
-    "faasr_rank",
-}
 
 
 class Request(BaseModel):
@@ -51,74 +62,233 @@ class Exit(BaseModel):
     Message: str | None = None
 
 
-def register_request_handler(faasr_payload):
+class BatchRequest(BaseModel):
+    Calls: list[Request]
+    Concurrent: bool = False
+
+
+class BatchResponse(BaseModel):
+    Success: bool
+    Results: list[Response]
+
+
+class Reset(BaseModel):
+    BaseWorkflow: dict
+    Overwritten: dict | None = None
+
+
+class BlockingRunner:
+    """
+    Runs blocking FaaSr calls off the event loop on a bounded thread pool
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Arguments:
+            max_concurrency: int -- number of calls that may run at once
+        """
+        self.max_concurrency = max_concurrency
+        self._pool = self._new_pool(max_concurrency)
+
+    @staticmethod
+    def _new_pool(max_concurrency):
+        return ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="faasr-rpc"
+        )
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedules func on the pool
+
+        Returns:
+            concurrent.futures.Future
+        """
+        return self._pool.submit(func, *args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs func on the pool and waits for its result without blocking the loop
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def resize(self, max_concurrency):
+        """
+        Switches to a pool of a different size (calls already running finish)
+
+        Arguments:
+            max_concurrency: int -- number of calls that may run at once
+        """
+        if max_concurrency == self.max_concurrency:
+            return
+        old_pool = self._pool
+        self._pool = self._new_pool(max_concurrency)
+        self.max_concurrency = max_concurrency
+        old_pool.shutdown(wait=False)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def flush_log(final=False):
+    """
+    Flushes the S3 log, reporting a failed upload instead of exiting the server
+
+    Arguments:
+        final: bool -- always include summaries of suppressed messages
+    """
+    try:
+        flush_s3_log(final=final)
+    except (Exception, SystemExit) as e:
+        logger.error(f"ERROR -- failed to flush log -- {e}")
+
+
+def get_max_concurrency(faasr_payload):
+    """
+    Returns the number of RPC calls the current action may run at once
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+    Returns:
+        int -- concurrency limit
+    """
+    action = faasr_payload["ActionList"].get(faasr_payload["FunctionInvoke"], {})
+    return action.get("RPCConcurrency") or DEFAULT_MAX_CONCURRENCY
+
+
+def register_request_handler(faasr_payload, runner):
     """ "
     Setup FastAPI request handlers for FaaSr functions
 
+    Handlers run on the event loop (so the shared state below is only touched
+    from one thread) and hand blocking work to runner
+
     Arguments:
         faasr_payload: FaaSr payload dict
+        runner: BlockingRunner -- bounded thread pool for blocking calls
     """
     return_val = None
     message = None
     error = False
 
-    @faasr_api.post("/faasr-action")
-    def faasr_request_handler(request: Request):
-        """
-        Handler for FaaSr function requests
+    def dispatch(request):
         """
-        nonlocal error
-        logger.info(f"Processing request: {request.ProcedureID}")
+        Runs a single procedure call
 
+        Arguments:
+            request: Request -- procedure call
+        Returns:
+            Response -- result of the call
+        """
         args = request.Arguments or {}
         return_obj = Response(Success=True, Data={})
-        try:
-            match request.ProcedureID:
-                case "faasr_log":
+        match request.ProcedureID:
+            case "faasr_log":
+                # drop repeated or rate-limited user messages before they hit S3
+                log_sender = S3LogSender.get_log_sender()
+                if log_sender.allow(args.get("log_message")):
                     faasr_log(faasr_payload=faasr_payload, **args)
-                case "faasr_put_file":
-                    faasr_put_file(faasr_payload=faasr_payload, **args)
-                case "faasr_get_file":
-                    faasr_get_file(faasr_payload=faasr_payload, **args)
-                case "faasr_delete_file":
-                    faasr_delete_file(faasr_payload=faasr_payload, **args)
-                case "faasr_get_folder_list":
-                    return_obj.Data["folder_list"] = faasr_get_folder_list(
-                        faasr_payload=faasr_payload, **args
-                    )
-                case "faasr_rank":
-                    return_obj.Data = faasr_rank(faasr_payload=faasr_payload)
-                case "faasr_get_s3_creds":
-                    return_obj.Data["s3_creds"] = faasr_get_s3_creds(
-                        faasr_payload=faasr_payload, **args
-                    )
-                case _:
-                    logging.error(
-                        f"{request.ProcedureID} is not a valid FaaSr function call"
-                    )
-                    error = True
-                    sys.exit(1)
+            case "faasr_put_file":
+                faasr_put_file(faasr_payload=faasr_payload, **args)
+            case "faasr_get_file":
+                faasr_get_file(faasr_payload=faasr_payload, **args)
+            case "faasr_delete_file":
+                faasr_delete_file(faasr_payload=faasr_payload, **args)
+            case "faasr_get_folder_list":
+                return_obj.Data["folder_list"] = faasr_get_folder_list(
+                    faasr_payload=faasr_payload, **args
+                )
+            case "faasr_rank":
+                return_obj.Data = faasr_rank(faasr_payload=faasr_payload)
+            case "faasr_put_shared":
+                put_shared_buffer(faasr_payload, **args)
+            case "faasr_get_shared":
+                return_obj.Data = get_shared_buffer(faasr_payload, **args)
+            case "faasr_get_s3_creds":
+                return_obj.Data["s3_creds"] = faasr_get_s3_creds(
+                    faasr_payload=faasr_payload, **args
+                )
+            case _:
+                raise ValueError(
+                    f"{request.ProcedureID} is not a valid FaaSr function call"
+                )
+        return return_obj
+
+    def run_call(request, wait_for=()):
+        """
+        Runs a procedure call, reporting failures in the response
+        instead of exiting
+
+        Arguments:
+            request: Request -- procedure call
+            wait_for: list[Future] -- calls that must finish first
+        Returns:
+            Response -- result of the call
+        """
+        for future in wait_for:
+            future.exception()
+        try:
+            return dispatch(request)
+        except SystemExit:
+            # s3_api functions log the reason before exiting
+            err_msg = f"ERROR -- failed to invoke {request.ProcedureID}"
         except Exception as e:
             err_msg = f"ERROR -- failed to invoke {request.ProcedureID} -- {e}"
-            logger.error(err_msg)
-            error = True
-            sys.exit(1)
+        logger.error(err_msg)
+        return Response(Success=False, Message=err_msg)
+
+    @faasr_api.post("/faasr-action")
+    async def faasr_request_handler(request: Request):
+        """
+        Handler for FaaSr function requests
+
+        A failed call is only reported in its response: the client decides
+        whether the action fails (through faasr_exit or its exit code)
+        """
+        logger.info(f"Processing request: {request.ProcedureID}")
+
+        return_obj = await runner.run(run_call, request)
         # flush log after every function, since we don't know when user function will end
-        flush_s3_log()
+        await runner.run(flush_log)
         return return_obj
 
+    @faasr_api.post("/faasr-batch")
+    async def faasr_batch_handler(batch: BatchRequest):
+        """
+        Handler for batches of FaaSr function requests
+
+        Calls run in order, or concurrently if the batch asks for it, in which
+        case calls touching the same file (or the log) still run in order.
+        Like single requests, failed calls are only reported in the response
+        """
+        logger.info(f"Processing batch of {len(batch.Calls)} requests")
+
+        if batch.Concurrent and len(batch.Calls) > 1:
+            futures = submit_batch(
+                faasr_payload,
+                [(call.ProcedureID, call.Arguments) for call in batch.Calls],
+                lambda i, wait_for: runner.submit(run_call, batch.Calls[i], wait_for),
+            )
+            results = await asyncio.gather(*map(asyncio.wrap_future, futures))
+        else:
+            results = [await runner.run(run_call, call) for call in batch.Calls]
+
+        failed = [result for result in results if not result.Success]
+        # one flush for the whole batch
+        await runner.run(flush_log)
+        return BatchResponse(Success=not failed, Results=results)
+
     @faasr_api.post("/faasr-return")
-    def faasr_return_handler(return_obj: Return):
+    async def faasr_return_handler(return_obj: Return):
         """
         Handler for FaaSr function return values
         """
         nonlocal return_val
         return_val = return_obj.FunctionResult
-        flush_s3_log()
+        await runner.run(flush_log)
         return Response(Success=True)
 
     @faasr_api.post("/faasr-exit")
-    def faasr_get_exit_handler(exit_obj: Exit):
+    async def faasr_get_exit_handler(exit_obj: Exit):
         """
         Handler for FaaSr function exit values
         """
@@ -126,18 +296,94 @@ def register_request_handler(faasr_payload):
         if exit_obj.Error:
             error = True
             message = exit_obj.Message
-        flush_s3_log()
+        await runner.run(flush_log)
+        return Response(Success=True)
+
+    @faasr_api.post("/faasr-reset")
+    async def faasr_reset_handler(reset_obj: Reset):
+        """
+        Handler to hand the next action to a reused server:
+        swaps the active payload and clears the previous result
+        """
+        nonlocal return_val, error, message
+        await runner.run(flush_log, final=True)
+        return_val = None
+        error = False
+        message = None
+        faasr_payload.load_state(reset_obj.BaseWorkflow, reset_obj.Overwritten)
+        log_sender = S3LogSender.get_log_sender()
+        if log_sender:
+            log_sender.faasr_payload = faasr_payload
+        # the new action's LogLevel applies to the server's S3 log handler
+        log_level = get_action_log_level(faasr_payload)
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, S3LogHandler):
+                handler.setLevel(log_level)
+        runner.resize(get_max_concurrency(faasr_payload))
+        logger.debug(f"RPC server now serving {faasr_payload['FunctionInvoke']}")
         return Response(Success=True)
 
     @faasr_api.get("/faasr-get-return")
-    def faasr_get_return_handler():
+    async def faasr_get_return_handler():
         """
         Handler to get the return value from the FaaSr function
         """
-        flush_s3_log()
+        await runner.run(flush_log, final=True)
         return Result(FunctionResult=return_val, Error=error, Message=message)
 
 
+def put_shared_buffer(faasr_payload, shm_name, size, **kwargs):
+    """
+    Uploads a buffer the client placed in shared memory
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        shm_name: str -- name of the client's shared memory block
+        size: int -- number of bytes to upload
+        kwargs: remaining faasr_put_bytes arguments
+    """
+    shm = attach_shared_buffer(shm_name)
+    reader = BufferReader(shm.buf[:size])
+    try:
+        faasr_put_bytes(faasr_payload=faasr_payload, data=reader, **kwargs)
+    finally:
+        reader.close()
+        shm.close()
+
+
+def get_shared_buffer(faasr_payload, **kwargs):
+    """
+    Downloads a file into a new shared memory block; the client
+    becomes the owner of the block and unlinks it once read
+
+    Arguments:
+        faasr_payload: FaaSr payload dict
+        kwargs: faasr_get_bytes arguments
+    Returns:
+        dict -- {"shm_name": str, "size": int}
+    """
+    blocks = []
+
+    def allocate(size):
+        blocks.append(create_shared_buffer(size))
+        return blocks[-1].buf
+
+    try:
+        _, size = faasr_get_bytes(
+            faasr_payload=faasr_payload, allocate=allocate, **kwargs
+        )
+    except BaseException:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+        raise
+
+    shm = blocks[0]
+    untrack_shared_buffer(shm)
+    shm.close()
+    return {"shm_name": shm.name, "size": size}
+
+
 @faasr_api.get("/faasr-echo")
 def faasr_echo(message: str):
     """
@@ -146,37 +392,101 @@ def faasr_echo(message: str):
     return {"message": message}
 
 
-def wait_for_server_start(port):
+class _ReadySignalServer(uvicorn.Server):
+    """
+    uvicorn server that signals through a pipe once it accepts connections
     """
-    Polls the server until it's ready to accept requests
+
+    def __init__(self, config, ready_conn=None):
+        super().__init__(config)
+        self._ready_conn = ready_conn
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self._ready_conn is not None and self.started and not self.should_exit:
+            self._ready_conn.send(self.bound_port())
+            self._ready_conn.close()
+            self._ready_conn = None
+
+    def bound_port(self):
+        """
+        Returns the TCP port the server listens on (None for a unix domain socket)
+        """
+        for server in self.servers:
+            for sock in server.sockets:
+                address = sock.getsockname()
+                if isinstance(address, tuple):
+                    return address[1]
+        return None
+
+
+def wait_for_server_start(
+    port, ready_conn=None, timeout=SERVER_START_TIMEOUT, socket_path=None
+):
+    """
+    Waits until the server is ready to accept requests
+
     Arguments:
-        port: int -- port the server is running on
+        port: int -- port the server is running on (0 if it picks a free port,
+        which requires ready_conn)
+        ready_conn: Connection | None -- pipe the server signals readiness on;
+        if not given, the server is polled over HTTP
+        timeout: float -- seconds to wait before giving up
+        socket_path: str | None -- unix domain socket the server listens on
+    Returns:
+        int | None -- port the server listens on (None for a unix domain socket)
     """
-    while True:
+    if ready_conn is not None:
+        if not ready_conn.poll(timeout):
+            raise TimeoutError(f"RPC server did not start within {timeout}s")
         try:
-            r = requests.get(
-                f"http://127.0.0.1:{port}/faasr-echo", params={"message": "echo"}
-            )
-            message = r.json()["message"]
-            if message == "echo":
-                break
-        except Exception:
-            continue
+            return ready_conn.recv()
+        except EOFError:
+            raise RuntimeError("RPC server exited before it was ready")
+
+    client = RPCClient(port=port, socket_path=socket_path, timeout=1)
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+    try:
+        while True:
+            try:
+                r = client.get("/faasr-echo", params={"message": "echo"})
+                if r["message"] == "echo":
+                    return None if socket_path else port
+            except Exception:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"RPC server did not start within {timeout}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+    finally:
+        client.close()
 
 
 # starts a server listening on localhost
-def run_server(faasr_payload, port, start_time):
+def run_server(faasr_payload, port, start_time, ready_conn=None, socket_path=None):
     """
     Starts a FastAPI server to handle FaaSr requests
 
     Arguments:
         faasr_payload: FaaSr payload dict
-        port: int -- port to run the server on
+        port: int -- port to run the server on (0 picks a free port)
+        start_time: timestamp from start of FaaSr action
+        ready_conn: Connection | None -- pipe to signal readiness (and the
+        port the server listens on) on
+        socket_path: str | None -- listen on this unix domain socket instead of port
     """
     # since server runs as a seperate process, we need to re-add the s3 logger handler
     global_config.add_s3_log_handler(faasr_payload, start_time)
 
-    register_request_handler(faasr_payload)
-    config = uvicorn.Config(faasr_api, host="127.0.0.1", port=port)
-    server = uvicorn.Server(config)
-    server.run()
+    runner = BlockingRunner(get_max_concurrency(faasr_payload))
+    register_request_handler(faasr_payload, runner)
+    if socket_path:
+        config = uvicorn.Config(faasr_api, uds=socket_path)
+    else:
+        config = uvicorn.Config(faasr_api, host="127.0.0.1", port=port)
+    server = _ReadySignalServer(config, ready_conn=ready_conn)
+    try:
+        server.run()
+    finally:
+        runner.shutdown()
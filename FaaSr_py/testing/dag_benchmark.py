@@ -0,0 +1,188 @@
+import random
+import sys
+import time
+
+from FaaSr_py.helpers import graph_functions
+from FaaSr_py.helpers.graph_functions import (build_adjacency_graph,
+                                              find_cycles, validate_graph,
+                                              validate_json)
+from FaaSr_py.helpers.workflow_plan import WorkflowPlan
+
+NUM_RUNS = 3
+SIZES = [100, 1_000, 10_000, 100_000]
+
+# validation budget (ms) per 1000 actions, for every shape
+BUDGET_MS_PER_1K = 20
+
+
+def make_workflow(edges, num_actions):
+    """
+    Returns a workflow payload (compliant with the FaaSr schema) whose
+    actions a0 ... aN invoke each other along edges
+
+    Arguments:
+        edges: dict -- action index to the indices of the actions it invokes
+        num_actions: int -- number of actions
+    """
+    action_list = {
+        f"a{i}": {
+            "FunctionName": "f",
+            "FaaSServer": "gh",
+            "Type": "Python",
+            "Arguments": {},
+            "InvokeNext": [f"a{j}" for j in edges.get(i, [])],
+        }
+        for i in range(num_actions)
+    }
+    return {
+        "FunctionInvoke": "a0",
+        "WorkflowName": "dag_benchmark",
+        "DefaultDataStore": "s3",
+        "FunctionGitRepo": {"f": "user/functions"},
+        "ActionList": action_list,
+        "ComputeServers": {
+            "gh": {
+                "FaaSType": "GitHubActions",
+                "UserName": "user",
+                "ActionRepoName": "actions",
+                "Token": "GH_Token",
+                "Branch": "main",
+            }
+        },
+        "DataStores": {
+            "s3": {
+                "Endpoint": "https://s3.us-east-1.amazonaws.com",
+                "Bucket": "bucket",
+                "Region": "us-east-1",
+                "AccessKey": "S3_AccessKey",
+                "SecretKey": "S3_SecretKey",
+            }
+        },
+    }
+
+
+def chain(n):
+    """a0 -> a1 -> ... -> aN (deepest possible DFS)"""
+    return make_workflow({i: [i + 1] for i in range(n - 1)}, n)
+
+
+def fan_out(n):
+    """a0 invokes every other action"""
+    return make_workflow({0: list(range(1, n))}, n)
+
+
+def sweep(n):
+    """a0 fans out to a parameter sweep of n - 2 actions, which all fan in to aN"""
+    last = n - 1
+    edges = {0: list(range(1, last))}
+    edges.update({i: [last] for i in range(1, last)})
+    return make_workflow(edges, n)
+
+
+def random_dag(n, extra_edges=2, seed=0):
+    """
+    Every action is invoked by an earlier action, plus extra_edges more
+    edges per action to later actions
+    """
+    rng = random.Random(seed)
+    edges = {}
+    for i in range(1, n):
+        edges.setdefault(rng.randrange(i), []).append(i)
+    for i in range(n - 1):
+        children = set(edges.get(i, []))
+        children.update(rng.randrange(i + 1, n) for _ in range(extra_edges))
+        edges[i] = sorted(children)
+    return make_workflow(edges, n)
+
+
+SHAPES = {"chain": chain, "fan_out": fan_out, "sweep": sweep, "random": random_dag}
+
+
+def time_validation(workflow, num_runs=NUM_RUNS):
+    """
+    Returns the best time (ms) to build the graph and validate it,
+    and to build the whole WorkflowPlan
+    """
+    validate_ms, plan_ms = [], []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        adj_graph, ranks = build_adjacency_graph(workflow)
+        validate_graph(workflow, adj_graph, ranks)
+        validate_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        WorkflowPlan.build(workflow)
+        plan_ms.append((time.perf_counter() - start) * 1000)
+    return min(validate_ms), min(plan_ms)
+
+
+def time_schema_validation(workflow, num_runs=NUM_RUNS):
+    """
+    Returns the best time (ms) to validate workflow against the FaaSr schema
+    for the first time in a process, and again (memoized by content hash)
+    """
+    validate_json(workflow)  # compile the validator
+    first_ms, again_ms = [], []
+    for _ in range(num_runs):
+        graph_functions._validated_hashes.clear()
+        start = time.perf_counter()
+        validate_json(workflow)
+        first_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        validate_json(workflow)
+        again_ms.append((time.perf_counter() - start) * 1000)
+    return min(first_ms), min(again_ms)
+
+
+def check_cycle_reporting():
+    """
+    Checks that every cycle of a graph is found in one pass
+
+    Returns:
+        bool -- True if the cycles were all reported
+    """
+    # two separate cycles, one closed by a long chain
+    adj_graph = {i: [i + 1] for i in range(50_000)}
+    adj_graph[50_000] = [0]
+    adj_graph["x"] = ["y"]
+    adj_graph["y"] = ["x"]
+    cycles = find_cycles(adj_graph, list(adj_graph))
+    return len(cycles) == 2 and {len(cycle) for cycle in cycles} == {50_002, 3}
+
+
+def benchmark_dags(sizes=SIZES):
+    """
+    Reports validation time of each generated shape and size against the budget
+
+    Returns:
+        bool -- True if every workflow was validated within budget
+    """
+    ok = True
+    print(
+        f"{'shape':>8} {'actions':>8} {'validate ms':>12} {'plan ms':>9} "
+        f"{'schema ms':>10} {'memoized ms':>12}"
+    )
+    for name, make in SHAPES.items():
+        for n in sizes:
+            workflow = make(n)
+            validate_ms, plan_ms = time_validation(workflow)
+            schema_ms, memoized_ms = time_schema_validation(workflow)
+            print(
+                f"{name:>8} {n:>8} {validate_ms:>12.2f} {plan_ms:>9.2f} "
+                f"{schema_ms:>10.2f} {memoized_ms:>12.2f}"
+            )
+            budget_ms = max(n / 1000, 1) * BUDGET_MS_PER_1K
+            if validate_ms > budget_ms:
+                print(f"FAIL: {name} with {n} actions is over budget ({budget_ms} ms)")
+                ok = False
+
+    if not check_cycle_reporting():
+        print("FAIL: not every cycle was reported")
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    if not benchmark_dags():
+        sys.exit(1)
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+
+NUM_RUNS = 5
+TOP_MODULES = 15
+
+# cold-start budget (cumulative import time, ms) of each entry point
+IMPORT_BUDGETS_MS = {
+    # what every process pays, including the forked user process
+    "FaaSr_py": 100,
+    # Python user function process
+    "FaaSr_py.client.py_user_func_entry": 150,
+}
+
+# dependencies that must stay lazy in the entry points above
+HEAVY_MODULES = [
+    "boto3",
+    "botocore",
+    "fastapi",
+    "uvicorn",
+    "pydantic",
+    "jsonschema",
+    "requests",
+    "cryptography",
+]
+
+
+def parse_importtime(stderr):
+    """
+    Parses the output of python -X importtime
+
+    Arguments:
+        stderr: str -- stderr of the interpreter
+    Returns:
+        dict -- module name to (self us, cumulative us)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header
+        self_us, cumulative_us, name = fields
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def time_import(module):
+    """
+    Imports module in a fresh interpreter
+
+    Returns:
+        dict -- module name to (self us, cumulative us)
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise RuntimeError(f"failed to import {module}")
+    return parse_importtime(result.stderr)
+
+
+def benchmark_imports(budgets=IMPORT_BUDGETS_MS, num_runs=NUM_RUNS):
+    """
+    Reports the import cost of each entry point and checks it against its
+    budget (best of num_runs, so that the disk cache is warm)
+
+    Returns:
+        bool -- True if every entry point is within budget
+    """
+    ok = True
+    for entry, budget_ms in budgets.items():
+        runs = [time_import(entry) for _ in range(num_runs)]
+        modules = min(runs, key=lambda run: run[entry][1])
+        total_ms = modules[entry][1] / 1000
+
+        print(f"\n{entry}: {total_ms:.1f} ms (budget {budget_ms} ms)")
+        print(f"{'self ms':>9} {'cumul ms':>9}  module")
+        by_self = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, cumulative_us) in by_self[:TOP_MODULES]:
+            print(f"{self_us / 1000:>9.2f} {cumulative_us / 1000:>9.2f}  {name}")
+
+        loaded = [name for name in HEAVY_MODULES if name in modules]
+        if loaded:
+            print(f"FAIL: {entry} imports {', '.join(loaded)}")
+            ok = False
+        if total_ms > budget_ms:
+            print(f"FAIL: {entry} is over its import budget")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    if not benchmark_imports():
+        sys.exit(1)
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+from multiprocessing import Process
+
+import requests
+import uvicorn
+
+from FaaSr_py.client.rpc_client import RPCClient
+from FaaSr_py.server.faasr_server import faasr_api, wait_for_server_start
+
+NUM_CALLS = 2000
+PORT = 8765
+
+
+def serve(port=None, socket_path=None):
+    if socket_path:
+        uvicorn.run(faasr_api, uds=socket_path, log_level="warning")
+    else:
+        uvicorn.run(faasr_api, host="127.0.0.1", port=port, log_level="warning")
+
+
+def time_calls(call, num_calls=NUM_CALLS):
+    """
+    Returns the mean round trip time of call() in microseconds
+    """
+    call()  # warm up
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        call()
+    return (time.perf_counter() - start) / num_calls * 1e6
+
+
+def benchmark_rpc_round_trip():
+    """
+    Compares RPC round trip latency of a fresh requests call per RPC
+    (previous client stubs) with the keep-alive client over TCP and over a
+    unix domain socket
+    """
+    socket_path = os.path.join(tempfile.mkdtemp(), "faasr-rpc.sock")
+    servers = [
+        Process(target=serve, kwargs={"port": PORT}, daemon=True),
+        Process(target=serve, kwargs={"socket_path": socket_path}, daemon=True),
+    ]
+    for server in servers:
+        server.start()
+
+    try:
+        wait_for_server_start(PORT)
+        wait_for_server_start(PORT, socket_path=socket_path)
+
+        params = {"message": "echo"}
+        results = {}
+
+        results["requests (new connection per call)"] = time_calls(
+            lambda: requests.get(
+                f"http://127.0.0.1:{PORT}/faasr-echo", params=params
+            ).json()
+        )
+
+        tcp_client = RPCClient(port=PORT)
+        results["RPCClient keep-alive (TCP)"] = time_calls(
+            lambda: tcp_client.get("/faasr-echo", params=params)
+        )
+
+        uds_client = RPCClient(socket_path=socket_path)
+        results["RPCClient keep-alive (UDS)"] = time_calls(
+            lambda: uds_client.get("/faasr-echo", params=params)
+        )
+    finally:
+        for server in servers:
+            server.terminate()
+
+    print(f"\n--- RPC round trip ({NUM_CALLS} calls) ---")
+    for name, micros in results.items():
+        print(f"{name}: {micros:.1f} us/call")
+
+
+if __name__ == "__main__":
+    benchmark_rpc_round_trip()
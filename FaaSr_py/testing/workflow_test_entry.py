@@ -208,7 +208,12 @@ def main():
         else:
             raise RuntimeError("No start function (no node with zero predecessors)")
 
-        function_executor = Executor(faasr_payload)
+        # reuse one RPC server for every action in the workflow, fork every
+        # Python action (and rank) from one warm template process and run
+        # every R action in one persistent R session
+        function_executor = Executor(
+            faasr_payload, keep_server=True, warm_workers=True
+        )
 
         # track function results for conditional branches
         results = dict()
@@ -283,6 +288,8 @@ def main():
 
             func_q = new_q
 
+        function_executor.close()
+
         log_sender = S3LogSender.get_log_sender()
         log_sender.flush_log()
 
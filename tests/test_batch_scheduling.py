@@ -0,0 +1,163 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from FaaSr_py.helpers.batch_scheduling import (batch_call_resources,
+                                               submit_batch)
+
+PAYLOAD = {"DefaultDataStore": "s3"}
+
+
+def get_file(name, local=None):
+    return (
+        "faasr_get_file",
+        {"local_file": local or name, "remote_file": name, "remote_folder": "in"},
+    )
+
+
+def log(message):
+    return ("faasr_log", {"log_message": message})
+
+
+class Recorder:
+    """
+    Runs batch calls on a thread pool, recording when each one starts and ends
+    """
+
+    def __init__(self, calls, hooks=None):
+        self.calls = calls
+        self.hooks = hooks or {}
+        self.events = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8)
+
+    def _record(self, event, index):
+        with self._lock:
+            self.events.append((event, index))
+
+    def _run(self, index, wait_for):
+        for future in wait_for:
+            future.exception()
+        self._record("start", index)
+        self.hooks.get(index, lambda: time.sleep(0.01))()
+        self._record("end", index)
+        return index
+
+    def run(self):
+        futures = submit_batch(
+            PAYLOAD,
+            self.calls,
+            lambda i, wait_for: self._pool.submit(self._run, i, wait_for),
+        )
+        results = [future.result(timeout=10) for future in futures]
+        self._pool.shutdown()
+        return results
+
+    def ran_before(self, first, second):
+        return self.events.index(("end", first)) < self.events.index(("start", second))
+
+
+def test_resources():
+    assert batch_call_resources(PAYLOAD, *log("x")) == {("log",)}
+    assert batch_call_resources(PAYLOAD, *get_file("a.csv")) == {
+        ("local", "a.csv"),
+        ("remote", "s3", "in/a.csv"),
+    }
+    assert batch_call_resources(PAYLOAD, "faasr_rank", {}) == set()
+    assert batch_call_resources(PAYLOAD, "faasr_get_folder_list", {}) is None
+
+
+def test_results_keep_call_order():
+    calls = [get_file(f"{i}.csv") for i in range(20)]
+    assert Recorder(calls).run() == list(range(20))
+
+
+def test_independent_calls_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    calls = [get_file("a.csv"), get_file("b.csv")]
+    # only passes if both calls are running at the same time
+    Recorder(calls, hooks={0: barrier.wait, 1: barrier.wait}).run()
+
+
+def test_calls_on_the_same_file_keep_their_order():
+    calls = [
+        get_file("a.csv"),
+        get_file("b.csv"),
+        # same local file as the first call, different remote object
+        get_file("c.csv", local="a.csv"),
+        get_file("a.csv", local="d.csv"),
+    ]
+    recorder = Recorder(calls, hooks={0: lambda: time.sleep(0.1)})
+    recorder.run()
+    assert recorder.ran_before(0, 2)
+    assert recorder.ran_before(0, 3)
+    assert not recorder.ran_before(0, 1)
+
+
+def test_log_calls_keep_their_order():
+    calls = [log(f"message {i}") for i in range(10)]
+    recorder = Recorder(calls)
+    recorder.run()
+    for i in range(9):
+        assert recorder.ran_before(i, i + 1)
+
+
+def test_unknown_calls_are_barriers():
+    calls = [
+        get_file("a.csv"),
+        ("faasr_get_folder_list", {}),
+        get_file("b.csv"),
+    ]
+    recorder = Recorder(calls, hooks={0: lambda: time.sleep(0.05)})
+    recorder.run()
+    assert recorder.ran_before(0, 1)
+    assert recorder.ran_before(1, 2)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_inprocess_batch(concurrent):
+    from FaaSr_py.client.py_inprocess import InProcessBatch
+
+    class API:
+        faasr = PAYLOAD
+
+        def __init__(self):
+            self.logged = []
+
+        def faasr_log(self, log_message):
+            self.logged.append(log_message)
+            return True
+
+        def faasr_get_folder_list(self, server_name="", prefix=""):
+            return [prefix]
+
+    api = API()
+    batch = InProcessBatch(api, concurrent=concurrent)
+    for i in range(5):
+        batch.faasr_log(f"message {i}")
+    batch.faasr_get_folder_list(prefix="in")
+    assert batch.send() == [{}] * 5 + [{"folder_list": ["in"]}]
+    assert api.logged == [f"message {i}" for i in range(5)]
+
+
+def test_inprocess_batch_exits_after_running_every_call():
+    from FaaSr_py.client.py_inprocess import InProcessBatch
+
+    class API:
+        faasr = PAYLOAD
+        logged = []
+
+        def faasr_log(self, log_message):
+            if log_message == "fail":
+                raise SystemExit(1)
+            self.logged.append(log_message)
+            return True
+
+    batch = InProcessBatch(API())
+    batch.faasr_log("fail")
+    batch.faasr_log("after")
+    with pytest.raises(SystemExit):
+        batch.send()
+    assert API.logged == ["after"]
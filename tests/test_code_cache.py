@@ -0,0 +1,153 @@
+import io
+import os
+import subprocess
+import tarfile
+
+import pytest
+
+from FaaSr_py.helpers import code_cache
+from FaaSr_py.helpers.code_cache import (COMMITS_FIELD, extract_tar_stream,
+                                         get_git_repo_code,
+                                         get_github_tarball_code,
+                                         get_pinned_commit, pin_commit)
+
+SHA = "a" * 40
+
+
+def make_tarball(files):
+    """
+    Returns a gzipped tarball of files (path to content), under a top-level
+    directory as in GitHub's tarballs
+    """
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(f"owner-repo-abc123/{name}")
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    data.seek(0)
+    return data
+
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_cache, "CODE_CACHE_DIR", str(tmp_path / "code"))
+    monkeypatch.setattr(code_cache, "GIT_MIRROR_DIR", str(tmp_path / "git"))
+
+
+def listing(path):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), path)
+        for root, _, names in os.walk(path)
+        for name in names
+        if not name.endswith(".pyc")
+    )
+
+
+def test_pinned_commits():
+    payload = {}
+    assert get_pinned_commit(payload, "owner/repo") is None
+    pin_commit(payload, "owner/repo", SHA)
+    pin_commit(payload, "owner/other", "b" * 40)
+    assert get_pinned_commit(payload, "owner/repo") == SHA
+    assert payload[COMMITS_FIELD] == {"owner/repo": SHA, "owner/other": "b" * 40}
+
+
+def test_extract_only_the_subpath(tmp_path):
+    files = {
+        "README.md": b"",
+        "functions/f.py": b"",
+        "functions/lib/g.py": b"",
+        "functions_old/f.py": b"",
+    }
+    extract_tar_stream(make_tarball(files), str(tmp_path / "out"), "functions/")
+    assert listing(tmp_path / "out") == [
+        "owner-repo-abc123/functions/f.py",
+        "owner-repo-abc123/functions/lib/g.py",
+    ]
+
+
+def test_code_is_fetched_once_per_commit(tmp_path):
+    fetched = []
+
+    def fetch(path):
+        fetched.append(path)
+        with open(os.path.join(path, "f.py"), "w") as f:
+            f.write("def f():\n    pass\n")
+
+    first = code_cache._get_cached_code({}, "owner/repo/sha/repo", fetch)
+    second = code_cache._get_cached_code({}, "owner/repo/sha/repo", fetch)
+    assert first == second
+    assert len(fetched) == 1
+    assert listing(first) == ["f.py"]
+
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    def fetch(path):
+        open(os.path.join(path, "partial.py"), "w").close()
+        raise RuntimeError("connection reset")
+
+    with pytest.raises(RuntimeError):
+        code_cache._get_cached_code({}, "owner/repo/sha/repo", fetch)
+    assert listing(code_cache.CODE_CACHE_DIR) == []
+
+
+def test_github_code_at_the_pinned_commit(tmp_path, monkeypatch):
+    requested = []
+
+    class Response:
+        status_code = 200
+
+        def __init__(self):
+            self.raw = make_tarball({"functions/f.py": b"", "other.py": b""})
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+    class Client:
+        def get(self, path, **kwargs):
+            requested.append(path)
+            return Response()
+
+    monkeypatch.setattr(code_cache, "get_github_client", Client)
+    payload = {COMMITS_FIELD: {"owner/repo/functions": SHA}}
+    for dest in ("first", "second"):
+        get_github_tarball_code(payload, "owner/repo/functions", None, str(tmp_path / dest))
+        assert listing(tmp_path / dest) == ["owner-repo-abc123/functions/f.py"]
+    assert requested == [f"/repos/owner/repo/tarball/{SHA}"]
+
+
+def git(*args, cwd=None):
+    return subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def test_git_repo_code_through_the_mirror(tmp_path):
+    repo = tmp_path / "src"
+    git("init", "-q", str(repo))
+    (repo / "f.py").write_text("def f():\n    pass\n")
+    git("add", "f.py", cwd=repo)
+    git("commit", "-qm", "first", cwd=repo)
+    first_sha = git("rev-parse", "HEAD", cwd=repo)
+    (repo / "g.py").write_text("")
+    git("add", "g.py", cwd=repo)
+    git("commit", "-qm", "second", cwd=repo)
+
+    # the invocation runs the commit it pinned, not the latest one
+    payload = {}
+    pin_commit(payload, f"file://{repo}", first_sha)
+    get_git_repo_code(payload, f"file://{repo}", "owner/src", str(tmp_path / "first"))
+    assert listing(tmp_path / "first") == ["f.py"]
+
+    payload = {}
+    get_git_repo_code(payload, f"file://{repo}", "owner/src", str(tmp_path / "latest"))
+    assert listing(tmp_path / "latest") == ["f.py", "g.py"]
+    assert get_pinned_commit(payload, f"file://{repo}") == git("rev-parse", "HEAD", cwd=repo)
@@ -0,0 +1,15 @@
+import pytest
+
+from FaaSr_py.helpers.graph_functions import validate_json
+from FaaSr_py.testing.dag_benchmark import SHAPES, benchmark_dags
+
+
+@pytest.mark.parametrize("shape", sorted(SHAPES))
+def test_generated_workflows_pass_the_schema(shape):
+    validate_json(SHAPES[shape](10))
+
+
+def test_benchmark_runs(capsys):
+    assert benchmark_dags(sizes=[100])
+    rows = capsys.readouterr().out.splitlines()[1:]
+    assert len(rows) == len(SHAPES)
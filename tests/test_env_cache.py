@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+from FaaSr_py.helpers import env_cache
+from FaaSr_py.helpers.env_cache import EnvCache
+
+WORKFLOW = {
+    "CacheDataStore": "cache",
+    "DataStores": {"cache": {"Bucket": "bucket"}},
+    "PyPIPackageDownloads": {"f": ["requests"], "g": ["numpy"]},
+}
+
+
+class FakeStore:
+    """
+    Environment archives of the cache data store, as directories' file lists
+    """
+
+    def __init__(self):
+        self.archives = {}
+        self.downloads = []
+
+    def download(self, target_s3, key, dest):
+        self.downloads.append(key)
+        if key not in self.archives:
+            return False
+        os.makedirs(dest, exist_ok=True)
+        for name in self.archives[key]:
+            open(os.path.join(dest, name), "w").close()
+        return True
+
+    def upload(self, target_s3, key, src):
+        self.archives[key] = sorted(os.listdir(src))
+        return True
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    fake = FakeStore()
+    monkeypatch.setattr(env_cache, "PYTHON_ENV_DIR", str(tmp_path / "python"))
+    monkeypatch.setattr(env_cache, "R_LIB_DIR", str(tmp_path / "Rlibs"))
+    monkeypatch.setattr(env_cache, "download_archive", fake.download)
+    monkeypatch.setattr(env_cache, "upload_archive", fake.upload)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    return fake
+
+
+def python_cache(func_name="f"):
+    action = {"Type": "Python", "FunctionName": func_name}
+    return EnvCache.for_action(WORKFLOW, action)
+
+
+def install(cache, *packages):
+    for name in packages:
+        open(os.path.join(cache.env_dir, name), "w").close()
+
+
+def test_each_dependency_set_has_its_own_environment():
+    f_cache, g_cache = python_cache("f"), python_cache("g")
+    assert f_cache.key != g_cache.key
+    assert f_cache.env_dir == os.path.join(env_cache.PYTHON_ENV_DIR, f_cache.key)
+    assert EnvCache.for_action(WORKFLOW, {"Type": "Python", "FunctionName": "h"}) is None
+    assert EnvCache.for_action({}, {"Type": "Python", "FunctionName": "f"}) is None
+
+
+def test_miss_then_hit(store):
+    cache = python_cache()
+    assert not cache.restore()
+    cache.clear()
+    install(cache, "requests")
+    cache.save()
+    assert store.archives[cache.remote_key] == [f".faasr-env-{cache.key}", "requests"]
+    assert sys.path[0] == cache.env_dir
+
+    # a new container restores the archive
+    other = python_cache()
+    os.rename(cache.env_dir, cache.env_dir + ".old")
+    assert other.restore()
+    assert "requests" in os.listdir(other.env_dir)
+    # in the same container, the installed environment is used as is
+    assert other.restore()
+    assert store.downloads == [cache.remote_key] * 2
+
+
+def test_only_the_active_environment_is_importable():
+    f_cache, g_cache = python_cache("f"), python_cache("g")
+    f_cache.activate()
+    g_cache.activate()
+    assert g_cache.env_dir in sys.path
+    assert f_cache.env_dir not in sys.path
+
+
+def test_clear_empties_the_environment_directory():
+    cache = python_cache()
+    cache.clear()
+    install(cache, "stale")
+    cache.clear()
+    assert os.listdir(cache.env_dir) == []
+
+
+def test_clear_keeps_the_shared_r_library():
+    cache = EnvCache({"Bucket": "bucket"}, "R", "abc", env_cache.R_LIB_DIR)
+    os.makedirs(cache.env_dir)
+    install(cache, "other_package")
+    cache.clear()
+    assert os.listdir(cache.env_dir) == ["other_package"]
@@ -0,0 +1,103 @@
+import importlib.util
+import sys
+
+import pytest
+
+from FaaSr_py.helpers import function_index
+from FaaSr_py.helpers.function_index import (compile_tree, file_names,
+                                             locate_function, top_level_names)
+from FaaSr_py.helpers.py_func_helper import faasr_import_function_walk
+
+
+@pytest.fixture(autouse=True)
+def index_path(tmp_path, monkeypatch):
+    """
+    Keeps the on-disk function index of each test in its own directory
+    """
+    path = tmp_path / "cache" / "function_index.json"
+    monkeypatch.setattr(function_index, "FUNCTION_INDEX_PATH", str(path))
+    monkeypatch.setattr(function_index, "_index", None)
+    return path
+
+
+def write(path, source):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(source)
+    return path
+
+
+def test_top_level_names():
+    source = b"""
+import os
+from json import loads as parse
+x, (y, z) = 1, (2, 3)
+def f():
+    def inner():
+        pass
+class C:
+    pass
+g = decorate(f)
+"""
+    names = top_level_names(source)
+    assert names["defs"] == ["f", "C"]
+    assert names["assigns"] == ["x", "y", "z", "g"]
+    assert names["imports"] == ["os", "parse"]
+
+
+def test_definition_beats_assignment_and_import(tmp_path):
+    write(tmp_path / "a_imports.py", "from helpers import target\n")
+    write(tmp_path / "b_assigns.py", "target = print\n")
+    write(tmp_path / "sub" / "c_defines.py", "def target():\n    return 1\n")
+    assert locate_function("target", str(tmp_path)).endswith("c_defines.py")
+
+
+def test_unparsable_and_ignored_files_are_skipped(tmp_path):
+    write(tmp_path / "broken.py", "def target(:\n")
+    write(tmp_path / "test.py", "def target():\n    pass\n")
+    assert locate_function("target", str(tmp_path), ignore_files=["test.py"]) is None
+
+
+def test_index_is_saved_by_file_hash(tmp_path, index_path, monkeypatch):
+    path = write(tmp_path / "mod.py", "def f():\n    pass\n")
+    locate_function("f", str(tmp_path))
+    assert index_path.exists()
+
+    # a new process reads the saved index instead of parsing the file again
+    monkeypatch.setattr(function_index, "_index", None)
+    parsed = []
+
+    def counting_parse(source):
+        parsed.append(source)
+        return top_level_names(source)
+
+    monkeypatch.setattr(function_index, "top_level_names", counting_parse)
+    assert file_names(str(path))["defs"] == ["f"]
+    assert parsed == []
+    # a changed file has a new hash, so it is parsed again
+    write(tmp_path / "mod.py", "def g():\n    pass\n")
+    assert file_names(str(path))["defs"] == ["g"]
+    assert len(parsed) == 1
+
+
+def test_compile_tree_writes_hash_checked_bytecode(tmp_path):
+    path = write(tmp_path / "pkg" / "mod.py", "VALUE = 1\n")
+    compile_tree(str(tmp_path))
+    cfile = importlib.util.cache_from_source(str(path))
+    with open(cfile, "rb") as f:
+        header = f.read(8)
+    # flags of a checked hash-based pyc (PEP 552)
+    assert int.from_bytes(header[4:8], "little") == 0b11
+
+
+def test_import_function_walk_imports_only_the_defining_module(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    write(tmp_path / "fi_walk_other.py", "raise RuntimeError('must not be imported')\n")
+    write(tmp_path / "fi_walk_pkg" / "__init__.py", "")
+    write(tmp_path / "fi_walk_pkg" / "fi_walk_mod.py", "def my_func():\n    return 42\n")
+    try:
+        func = faasr_import_function_walk("my_func", str(tmp_path))
+        assert func() == 42
+        assert "fi_walk_other" not in sys.modules
+    finally:
+        for name in ("fi_walk_pkg", "fi_walk_pkg.fi_walk_mod", "fi_walk_other"):
+            sys.modules.pop(name, None)
@@ -0,0 +1,147 @@
+import io
+import time
+
+import pytest
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from FaaSr_py.helpers import github_client
+from FaaSr_py.helpers.github_client import MAX_RETRIES, GitHubClient
+
+
+def make_response(status, body=b"{}", **headers):
+    response = Response()
+    response.status_code = status
+    response._content = body
+    response.raw = io.BytesIO(body)
+    response.headers = CaseInsensitiveDict(
+        {name.replace("_", "-"): value for name, value in headers.items()}
+    )
+    return response
+
+
+class FakeSession:
+    """
+    Returns scripted responses, recording the headers of every request
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.requests.append((method, url, dict(headers)))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(github_client.time, "sleep", waits.append)
+    return waits
+
+
+def make_client(tmp_path, monkeypatch, *responses):
+    client = GitHubClient(cache_dir=str(tmp_path))
+    session = FakeSession(*responses)
+    monkeypatch.setattr(client, "_get_session", lambda: session)
+    return client, session
+
+
+def test_not_modified_is_served_from_the_cache(tmp_path, monkeypatch):
+    client, session = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(200, b'{"sha": "abc"}', ETag='"v1"'),
+        make_response(304, b"", ETag='"v1"'),
+    )
+    assert client.get("/repos/o/r", token="t", cache=True).json() == {"sha": "abc"}
+    response = client.get("/repos/o/r", token="t", cache=True)
+    assert response.status_code == 200
+    assert response.json() == {"sha": "abc"}
+    assert session.requests[1][2]["If-None-Match"] == '"v1"'
+    assert client.get_metrics()["NotModified"] == 1
+
+
+def test_cache_is_per_token(tmp_path, monkeypatch):
+    client, session = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(200, b"{}", ETag='"v1"'),
+        make_response(200, b"{}", ETag='"v2"'),
+    )
+    client.get("/repos/o/r", token="a", cache=True)
+    client.get("/repos/o/r", token="b", cache=True)
+    assert "If-None-Match" not in session.requests[1][2]
+
+
+def test_retry_after_is_honoured(tmp_path, monkeypatch, sleeps):
+    client, session = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(429, Retry_After="5"),
+        make_response(200),
+    )
+    assert client.get("/repos/o/r").status_code == 200
+    assert sleeps == [5.0]
+    assert client.get_metrics()["Retries"] == 1
+
+
+def test_server_errors_are_retried_for_get_only(tmp_path, monkeypatch, sleeps):
+    client, session = make_client(
+        tmp_path, monkeypatch, *[make_response(502) for _ in range(MAX_RETRIES + 1)]
+    )
+    assert client.get("/repos/o/r").status_code == 502
+    assert len(session.requests) == MAX_RETRIES + 1
+    assert sleeps == [1, 2, 4]
+
+    client, session = make_client(tmp_path, monkeypatch, make_response(502))
+    # a failed POST may have been carried out: it is not sent again
+    assert client.post("/repos/o/r/dispatches", json={}).status_code == 502
+    assert len(session.requests) == 1
+
+
+def test_rate_limit_reset_wait(tmp_path, monkeypatch, sleeps):
+    reset = str(int(time.time()) + 10)
+    client, _ = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(403, X_RateLimit_Remaining="0", X_RateLimit_Reset=reset),
+        make_response(200),
+    )
+    assert client.get("/repos/o/r").status_code == 200
+    assert 1 <= sleeps[0] <= 10
+
+
+def test_malformed_headers_are_not_retried(tmp_path, monkeypatch, sleeps):
+    client, session = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(429, Retry_After="soon"),
+        make_response(403, X_RateLimit_Remaining="0", X_RateLimit_Reset="later"),
+    )
+    assert client.get("/repos/o/r").status_code == 429
+    assert client.get("/repos/o/r").status_code == 403
+    assert sleeps == []
+    assert len(session.requests) == 2
+
+
+def test_low_quota_is_throttled(tmp_path, monkeypatch, sleeps):
+    reset = str(int(time.time()) + 100)
+    client, _ = make_client(
+        tmp_path,
+        monkeypatch,
+        make_response(
+            200,
+            X_RateLimit_Limit="5000",
+            X_RateLimit_Remaining="10",
+            X_RateLimit_Reset=reset,
+        ),
+        make_response(200),
+    )
+    client.get("/repos/o/r")
+    assert sleeps == []
+    assert client.get_metrics()["RateLimitRemaining"] == 10
+    client.get("/repos/o/r")
+    # the remaining requests are spread until the reset
+    assert len(sleeps) == 1 and 5 <= sleeps[0] <= 10
@@ -0,0 +1,105 @@
+import logging
+
+import pytest
+
+from FaaSr_py.helpers.graph_functions import (build_adjacency_graph,
+                                              expand_ranked_predecessors,
+                                              extract_rank, find_cycles,
+                                              reachable_from, validate_graph)
+
+
+def make_workflow(invoke_next):
+    """
+    Returns a workflow whose actions invoke each other as in invoke_next
+    (action name to its InvokeNext)
+    """
+    return {
+        "FunctionInvoke": next(iter(invoke_next)),
+        "ActionList": {
+            name: {"FunctionName": name, "FaaSServer": "gh", "InvokeNext": nxt}
+            for name, nxt in invoke_next.items()
+        },
+    }
+
+
+def validate(workflow):
+    adj_graph, ranks = build_adjacency_graph(workflow)
+    return validate_graph(workflow, adj_graph, ranks)
+
+
+def test_find_cycles_acyclic():
+    adj_graph = {"a": ["b", "c"], "b": ["d"], "c": ["d"]}
+    assert find_cycles(adj_graph, ["a", "b", "c", "d"]) == []
+
+
+def test_find_cycles_reports_every_cycle():
+    adj_graph = {"a": ["b"], "b": ["a"], "c": ["c"], "d": ["e"], "e": ["f"], "f": ["d"]}
+    cycles = find_cycles(adj_graph, list(adj_graph))
+    assert sorted(cycles) == [["a", "b", "a"], ["c", "c"], ["d", "e", "f", "d"]]
+
+
+def test_find_cycles_deep_chain_without_recursion():
+    n = 200_000
+    adj_graph = {i: [i + 1] for i in range(n)}
+    assert find_cycles(adj_graph, [0]) == []
+    adj_graph[n] = [0]
+    cycles = find_cycles(adj_graph, [0])
+    assert len(cycles) == 1 and len(cycles[0]) == n + 2
+
+
+def test_reachable_from():
+    adj_graph = {"a": ["b"], "b": ["c"], "x": ["a"]}
+    assert reachable_from(adj_graph, "a") == {"a", "b", "c"}
+
+
+def test_extract_rank():
+    assert extract_rank("sweep(4)") == ("sweep", 4)
+    assert extract_rank("plain") == ("plain", 1)
+
+
+def test_validate_graph_returns_predecessors():
+    workflow = make_workflow(
+        {"start": ["sweep(3)"], "sweep": ["join"], "join": [], "other": []}
+    )
+    # "other" is never invoked: it is reported as unreachable
+    with pytest.raises(SystemExit):
+        validate(workflow)
+
+    del workflow["ActionList"]["other"]
+    pre = validate(workflow)
+    assert pre["sweep"] == ["start"]
+    assert pre["join"] == ["sweep"]
+    _, ranks = build_adjacency_graph(workflow)
+    assert expand_ranked_predecessors(pre["join"], ranks) == [
+        "sweep.1",
+        "sweep.2",
+        "sweep.3",
+    ]
+
+
+def test_validate_graph_conditional_branches():
+    workflow = make_workflow(
+        {"start": [{"True": ["yes"], "False": ["no"]}], "yes": [], "no": []}
+    )
+    pre = validate(workflow)
+    assert pre["yes"] == ["start"] and pre["no"] == ["start"]
+
+
+def test_validate_graph_reports_every_problem(caplog):
+    workflow = make_workflow(
+        {"a": ["b"], "b": ["c"], "c": ["b"], "d": ["e"], "e": ["d"]}
+    )
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit):
+        validate(workflow)
+    messages = [r.getMessage() for r in caplog.records]
+    assert "Function loop found: b -> c -> b" in messages
+    assert "Function loop found: d -> e -> d" in messages
+    assert "Unreachable state found: d" in messages
+    assert "Unreachable state found: e" in messages
+
+
+def test_validate_graph_ranked_predecessor_of_ranked_action(caplog):
+    workflow = make_workflow({"a": ["b(2)"], "b": ["c(2)"], "c": []})
+    with caplog.at_level(logging.ERROR), pytest.raises(SystemExit):
+        validate(workflow)
+    assert any("cannot have predecessor with rank" in r.getMessage() for r in caplog.records)
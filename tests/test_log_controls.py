@@ -0,0 +1,74 @@
+import logging
+
+from FaaSr_py.config import log_controls
+from FaaSr_py.config.log_controls import (LogThrottle, get_action_log_level,
+                                          get_action_settings)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_payload(**settings):
+    return {"FunctionInvoke": "a", "ActionList": {"a": settings}}
+
+
+def test_action_log_level():
+    assert get_action_log_level(make_payload(LogLevel="warning")) == logging.WARNING
+    assert get_action_log_level(make_payload()) == logging.DEBUG
+    assert get_action_log_level(make_payload(LogLevel="bogus")) == logging.DEBUG
+
+
+def test_action_settings_of_unknown_action():
+    assert get_action_settings({"FunctionInvoke": "b", "ActionList": {}}) == {}
+    assert get_action_settings({}) == {}
+
+
+def test_repeated_messages_are_sampled():
+    throttle = LogThrottle(repeat_threshold=3, sample_every=5)
+    kept = [throttle.allow(f"processed item {i}") for i in range(23)]
+    # the first 3 similar messages, then one in every 5
+    assert kept[:3] == [True] * 3
+    assert sum(kept) == 3 + 4
+    assert kept[7] and kept[12] and not kept[8]
+
+
+def test_errors_are_never_dropped():
+    throttle = LogThrottle(rate=1, burst=1, repeat_threshold=0, sample_every=100)
+    assert all(throttle.allow("boom", levelno=logging.ERROR) for _ in range(50))
+
+
+def test_rate_limit_refills_over_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(log_controls.time, "monotonic", clock)
+    throttle = LogThrottle(rate=2, burst=2, repeat_threshold=1000)
+
+    assert [throttle.allow(f"message {c}") for c in "abc"] == [True, True, False]
+    clock.now += 0.5
+    assert throttle.allow("message d")
+    assert not throttle.allow("message e")
+
+
+def test_summaries_report_suppressed_messages(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(log_controls.time, "monotonic", clock)
+    throttle = LogThrottle(repeat_threshold=1, sample_every=1000)
+    for i in range(4):
+        throttle.allow(f"retrying upload {i}")
+
+    # not yet due, unless forced
+    assert throttle.pop_summaries() == []
+    clock.now += log_controls.SUMMARY_INTERVAL
+    summaries = throttle.pop_summaries()
+    assert len(summaries) == 1
+    assert "suppressed 3 similar messages" in summaries[0]
+    assert throttle.pop_summaries(force=True) == []
+
+
+def test_from_payload_reads_action_settings():
+    throttle = LogThrottle.from_payload(make_payload(LogRateLimit=1, LogBurst=3))
+    assert [throttle.allow(f"m{c}") for c in "abcd"] == [True, True, True, False]
@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+from FaaSr_py.config.debug_config import global_config
+from FaaSr_py.engine import faasr_payload
+from FaaSr_py.engine.faasr_payload import FaaSrPayload
+from FaaSr_py.helpers import trigger_payload
+from FaaSr_py.helpers.canonical_json import canonical_dumps
+from FaaSr_py.helpers.trigger_payload import (DATA_FIELD, ENCODED_FIELD,
+                                              MERGE_FIELD,
+                                              decode_trigger_payload,
+                                              encode_trigger_payload,
+                                              merge_trigger_payload)
+
+BASE = {
+    "FunctionInvoke": "start",
+    "DefaultDataStore": "s3",
+    "DataStores": {"s3": {"AccessKey": "S3_AccessKey", "Bucket": "bucket"}},
+    "ActionList": {
+        f"a{i}": {"FunctionName": "f", "FaaSServer": "gh", "InvokeNext": [f"a{i + 1}"]}
+        for i in range(100)
+    },
+}
+
+
+def make_overwritten():
+    action_list = json.loads(json.dumps(BASE["ActionList"]))
+    action_list["a1"]["Arguments"] = {"x": 1}
+    return {
+        "FunctionInvoke": "a1",
+        "InvocationID": "1234",
+        "DataStores": BASE["DataStores"],
+        "ActionList": action_list,
+        "WorkflowPlan": {"Key": "FaaSrLog/1234/plan.json.gz", "Hash": "abc"},
+    }
+
+
+def test_only_fields_that_differ_from_the_base_are_sent():
+    payload = encode_trigger_payload(make_overwritten(), BASE)
+    assert sorted(payload) == [
+        "ActionList",
+        MERGE_FIELD,
+        "FunctionInvoke",
+        "InvocationID",
+        "WorkflowPlan",
+    ]
+    # only the changed entry of ActionList
+    assert payload["ActionList"] == {"a1": make_overwritten()["ActionList"]["a1"]}
+    assert payload[MERGE_FIELD] == ["ActionList"]
+    assert decode_trigger_payload(payload) == payload
+
+
+def test_changed_maps_are_merged_with_the_base():
+    overwritten = make_overwritten()
+    overwritten["DataStores"] = {**BASE["DataStores"], "other": {"Bucket": "b2"}}
+    payload = json.loads(canonical_dumps(encode_trigger_payload(overwritten, BASE)))
+    assert payload["DataStores"] == {"other": {"Bucket": "b2"}}
+
+    decoded = decode_trigger_payload(payload)
+    merge_trigger_payload(decoded, BASE, decoded.pop(MERGE_FIELD))
+    assert decoded == overwritten
+
+
+def test_maps_with_removed_entries_are_sent_whole():
+    overwritten = make_overwritten()
+    del overwritten["ActionList"]["a99"]
+    payload = encode_trigger_payload(overwritten, BASE)
+    assert payload["ActionList"] == overwritten["ActionList"]
+    assert MERGE_FIELD not in payload
+
+
+def test_payload_merges_changed_maps(monkeypatch):
+    monkeypatch.setattr(global_config, "SKIP_SCHEMA_VALIDATE", True)
+    monkeypatch.setattr(faasr_payload, "pin_workflow_path", lambda url, token: url)
+    monkeypatch.setattr(
+        faasr_payload, "faasr_get_github_raw", lambda token, path: json.dumps(BASE)
+    )
+    overwritten = make_overwritten()
+    overwritten["DataStores"] = {**BASE["DataStores"], "other": {"Bucket": "b2"}}
+    payload = encode_trigger_payload(overwritten, BASE, compression=True)
+
+    faasr = FaaSrPayload("user/repo/main/workflow.json", json.loads(json.dumps(payload)))
+    assert faasr["ActionList"] == overwritten["ActionList"]
+    assert sorted(faasr["DataStores"]) == ["other", "s3"]
+    assert MERGE_FIELD not in faasr.overwritten
+    # secrets replaced in the base workflow are replaced in the merged entries
+    faasr.faasr_replace_values({"S3_AccessKey": "secret"})
+    assert faasr["DataStores"]["s3"]["AccessKey"] == "secret"
+
+
+def test_without_base_every_field_is_sent():
+    overwritten = make_overwritten()
+    assert encode_trigger_payload(overwritten) == overwritten
+
+
+def test_compressed_payload_round_trip():
+    overwritten = make_overwritten()
+    payload = encode_trigger_payload(overwritten, compression=True)
+    assert payload[ENCODED_FIELD] == "zlib"
+    assert len(canonical_dumps(payload)) < len(json.dumps(overwritten))
+
+    # the payload is sent as JSON and decoded by the next action
+    decoded = decode_trigger_payload(json.loads(canonical_dumps(payload)))
+    assert decoded == overwritten
+
+
+def test_small_payload_is_not_compressed():
+    payload = encode_trigger_payload({"FunctionInvoke": "next"}, BASE, compression=True)
+    assert payload == {"FunctionInvoke": "next"}
+
+
+def test_zstd_falls_back_to_zlib(monkeypatch):
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_zstandard(name, *args, **kwargs):
+        if name == "zstandard":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_zstandard)
+    payload = encode_trigger_payload(make_overwritten(), compression="zstd")
+    assert payload[ENCODED_FIELD] == "zlib"
+
+
+def test_encoding_is_canonical():
+    first = make_overwritten()
+    second = dict(reversed(list(first.items())))
+    first_payload = encode_trigger_payload(first, compression=True)
+    second_payload = encode_trigger_payload(second, compression=True)
+    assert canonical_dumps(first_payload) == canonical_dumps(second_payload)
+
+
+def test_plain_payloads_pass_through():
+    assert decode_trigger_payload(None) is None
+    assert decode_trigger_payload({"FunctionInvoke": "a"}) == {"FunctionInvoke": "a"}
+
+
+def test_unknown_encoding_exits():
+    with pytest.raises(SystemExit):
+        decode_trigger_payload({ENCODED_FIELD: "lz4", DATA_FIELD: ""})
+
+
+def test_size_is_logged(caplog):
+    with caplog.at_level("INFO", logger=trigger_payload.__name__):
+        encode_trigger_payload(make_overwritten(), compression=True)
+    assert any("saved" in r.getMessage() for r in caplog.records)
+
+
+def test_googlecloud_trigger_sends_the_encoded_payload(monkeypatch):
+    pytest.importorskip("cryptography")
+    from FaaSr_py.engine import scheduler
+    from FaaSr_py.helpers import gcp_auth
+
+    monkeypatch.setattr(gcp_auth, "refresh_gcp_access_token", lambda faasr, name: "t")
+    sent = {}
+
+    class Response:
+        status_code = 200
+
+    def post(url, json, **kwargs):
+        sent.update(json)
+        return Response()
+
+    monkeypatch.setattr(scheduler.requests, "post", post)
+    base = dict(BASE, ComputeServers={"gcp": {"Namespace": "ns", "Region": "r"}})
+    faasr = FaaSrPayload.__new__(FaaSrPayload)
+    faasr.url = "user/repo/sha/workflow.json"
+    faasr._raw_workflow = json.dumps(base)
+    faasr._raw_base = None
+    faasr.load_state(json.loads(json.dumps(base)), make_overwritten())
+
+    scheduler.Scheduler(faasr).invoke_googlecloud(base["ComputeServers"]["gcp"], "a1")
+    env = sent["overrides"]["containerOverrides"][0]["env"]
+    overwritten = json.loads(next(e["value"] for e in env if e["name"] == "OVERWRITTEN"))
+    assert overwritten == encode_trigger_payload(make_overwritten(), base)
+    assert "WorkflowPlan" in overwritten
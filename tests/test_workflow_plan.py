@@ -0,0 +1,136 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from FaaSr_py.engine.faasr_payload import FaaSrPayload
+from FaaSr_py.helpers import workflow_plan
+from FaaSr_py.helpers.workflow_plan import PLAN_FIELD, WorkflowPlan
+
+WORKFLOW = {
+    "FunctionInvoke": "start",
+    "FaaSrLog": "FaaSrLog",
+    "InvocationID": "1234",
+    "LoggingDataStore": "s3",
+    "DefaultDataStore": "s3",
+    "ComputeServers": {"gh": {"FaaSType": "GitHubActions"}},
+    "DataStores": {
+        "s3": {"Bucket": "bucket", "AccessKey": "S3_AccessKey", "Region": "us-east-1"}
+    },
+    "ActionList": {
+        "start": {"FaaSServer": "gh", "InvokeNext": ["sweep(2)"]},
+        "sweep": {"FaaSServer": "gh", "InvokeNext": [{"True": ["join"], "False": []}]},
+        "join": {"FaaSServer": "gh", "InvokeNext": []},
+    },
+}
+
+
+class FakeS3:
+    """
+    In-memory bucket, recording the config of every client created for it
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.configs = []
+
+    def client(self, config):
+        self.configs.append(config)
+        return self
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+@pytest.fixture(autouse=True)
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(workflow_plan, "get_s3_client", fake.client)
+    monkeypatch.setattr(workflow_plan, "_plans", {})
+    return fake
+
+
+def make_payload(overwritten):
+    # a snapshot field keeps the payload from fetching the workflow from GitHub
+    payload = FaaSrPayload("user/repo/main/workflow.json", {"WorkflowSnapshot": {}})
+    payload.load_state(json.loads(json.dumps(WORKFLOW)), overwritten)
+    payload._raw_workflow = json.dumps(WORKFLOW)
+    return payload
+
+
+def test_plan_round_trip():
+    plan = WorkflowPlan.build(WORKFLOW)
+    loaded = WorkflowPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert loaded.to_dict() == plan.to_dict()
+    assert loaded.order == ["start", "sweep", "join"]
+    assert loaded.next_actions("start") == [("sweep", 2)]
+    assert loaded.next_actions("sweep", True) == [("join", 1)]
+    assert loaded.next_actions("sweep", False) == []
+    assert loaded.has_conditionals("sweep")
+    assert loaded.real_predecessors("join") == ["sweep.1", "sweep.2"]
+
+
+def test_stored_plan_round_trip(s3):
+    plan = WorkflowPlan.build(WORKFLOW)
+    assert plan.write({"Bucket": "bucket"}, "log/plan.json.gz")
+    body = s3.objects[("bucket", "log/plan.json.gz")]
+    assert json.loads(gzip.decompress(body))["Hash"] == plan.hash
+
+    loaded = WorkflowPlan.read({"Bucket": "bucket"}, "log/plan.json.gz", plan.hash)
+    assert loaded.to_dict() == plan.to_dict()
+    assert WorkflowPlan.read({"Bucket": "bucket"}, "log/plan.json.gz", "other") is None
+    assert WorkflowPlan.read({"Bucket": "bucket"}, "missing", plan.hash) is None
+
+
+def test_plan_is_passed_on_by_reference(s3, monkeypatch):
+    first = make_payload({})
+    assert first._get_predecessors() == []
+    first._store_plan("s3", "FaaSrLog/1234")
+
+    location = first.overwritten[PLAN_FIELD]
+    assert location["Key"] == "FaaSrLog/1234/plan.json.gz"
+    assert location["Hash"] == first._plan.hash
+    # only the names of the secrets are passed on
+    assert location["Config"]["AccessKey"] == "S3_AccessKey"
+    assert "Adjacency" not in location
+
+    # the next action, in a new process, loads the plan instead of building it
+    monkeypatch.setattr(workflow_plan, "_plans", {})
+    monkeypatch.setattr(WorkflowPlan, "build", None)
+    second = make_payload({**first.overwritten, "FunctionInvoke": "join"})
+    second.faasr_replace_values({"S3_AccessKey": "secret"})
+    assert second._get_predecessors() == ["sweep.1", "sweep.2"]
+    assert s3.configs[-1]["AccessKey"] == "secret"
+
+
+def test_stale_plan_is_rebuilt_and_dropped(s3, monkeypatch):
+    first = make_payload({})
+    first._get_predecessors()
+    first._store_plan("s3", "FaaSrLog/1234")
+
+    monkeypatch.setattr(workflow_plan, "_plans", {})
+    action_list = json.loads(json.dumps(WORKFLOW["ActionList"]))
+    action_list["join"]["InvokeNext"] = ["sweep"]
+    second = make_payload(
+        {**first.overwritten, "FunctionInvoke": "start", "ActionList": action_list}
+    )
+    # the changed graph is validated (and has a cycle)
+    with pytest.raises(SystemExit):
+        second._get_predecessors()
+    assert PLAN_FIELD not in second.overwritten
+
+
+def test_unreadable_plan_is_rebuilt(s3, monkeypatch):
+    first = make_payload({})
+    first._get_predecessors()
+    first._store_plan("s3", "FaaSrLog/1234")
+
+    monkeypatch.setattr(workflow_plan, "_plans", {})
+    s3.objects.clear()
+    second = make_payload({**first.overwritten, "FunctionInvoke": "join"})
+    second.faasr_replace_values({})
+    assert second._get_predecessors() == ["sweep.1", "sweep.2"]